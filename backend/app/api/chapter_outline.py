@@ -29,6 +29,8 @@ class EnhancedChapterRequest(BaseModel):
     act_belonging: Optional[str] = Field(None, description="选择的幕次")
     additional_requirements: Optional[str] = Field(None, description="额外要求")
     generate_event_mappings: bool = Field(True, description="是否生成事件-章节映射")
+    windowed: Optional[bool] = Field(None, description="是否分窗口并发生成，默认章节数超过窗口大小时自动启用")
+    window_size: Optional[int] = Field(None, ge=1, description="每个窗口的章节数")
 
 
 @router.post("/chapter-outlines", response_model=ChapterOutlineResponse)
@@ -91,7 +93,9 @@ async def create_chapter_outlines(request: EnhancedChapterRequest):
             start_chapter=request.start_chapter,
             act_belonging=request.act_belonging,
             additional_requirements=request.additional_requirements,
-            generate_event_mappings=request.generate_event_mappings
+            generate_event_mappings=request.generate_event_mappings,
+            windowed=request.windowed,
+            window_size=request.window_size
         )
         
         # 6. 保存生成的章节大纲到数据库
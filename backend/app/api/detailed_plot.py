@@ -13,6 +13,7 @@ from pydantic import BaseModel, Field
 class CorrectionRequest(BaseModel):
     """修正请求模型"""
     correction_prompt: Optional[str] = Field(default="", description="用户修正要求")
+    correction_mode: Optional[str] = Field(default=None, description="修正模式：patch（局部补丁）/ full（全文重写），默认使用配置")
 
 from app.core.detailed_plot.detailed_plot_engine import DetailedPlotEngine
 from app.core.detailed_plot.detailed_plot_database import DetailedPlotDatabase
@@ -24,6 +25,8 @@ from app.core.scoring.intelligent_scoring_service import IntelligentScoringServi
 from app.core.evolution.evolution_service import evolution_service
 from app.core.correction.correction_service import correction_service
 from app.utils.file_writer import FileWriter
+from app.utils.story_memory import story_memory
+from app.utils.async_queue import task_queue
 from app.utils.logger import error_log, debug_log
 
 router = APIRouter()
@@ -77,6 +80,29 @@ async def create_detailed_plot(request: DetailedPlotRequest):
         raise HTTPException(status_code=500, detail=f"生成详细剧情失败: {str(e)}")
 
 
+async def run_detailed_plot_task(task_id: str, data: dict) -> dict:
+    """任务队列处理器：后台生成详细剧情"""
+    request = DetailedPlotRequest(**data)
+    task_queue.update_progress(task_id, 20, stage="generating", message=f"正在生成《{request.title}》的详细剧情")
+    detailed_plot = await detailed_plot_engine.generate_detailed_plot(request)
+    return {
+        "detailed_plot_id": detailed_plot.id,
+        "chapter_outline_id": detailed_plot.chapter_outline_id,
+        "title": detailed_plot.title,
+        "word_count": detailed_plot.word_count
+    }
+
+
+task_queue.register_handler("detailed_plot", run_detailed_plot_task)
+
+
+@router.post("/detailed-plots/tasks")
+async def submit_detailed_plot_task(request: DetailedPlotRequest):
+    """提交后台生成详细剧情的任务，通过 /api/v1/progress/tasks/{task_id}/stream 订阅进度"""
+    task_id = task_queue.submit_task("detailed_plot", request.dict())
+    return {"task_id": task_id, "status": "queued"}
+
+
 @router.get("/detailed-plots/{plot_outline_id}", response_model=DetailedPlotListResponse)
 async def get_detailed_plots_by_plot_outline(
     plot_outline_id: str,
@@ -232,6 +258,9 @@ async def update_detailed_plot(
         if not success:
             raise HTTPException(status_code=500, detail="更新详细剧情失败")
         
+        # 更新分层摘要记忆
+        await story_memory.record_detailed_plot(existing_plot, request.content)
+        
         # 更新标题（如果有变化）
         if request.title != existing_plot.title:
             title_success = detailed_plot_database.update_detailed_plot_title(
@@ -264,8 +293,8 @@ async def update_detailed_plot(
 
 
 @router.post("/detailed-plots/{detailed_plot_id}/logic-check")
-async def check_detailed_plot_logic(detailed_plot_id: str):
-    """对详细剧情进行逻辑检查"""
+async def check_detailed_plot_logic(detailed_plot_id: str, incremental: bool = True):
+    """对详细剧情进行逻辑检查（incremental为True且已有检查结果时只复查修改过的段落）"""
     try:
         # 获取详细剧情
         detailed_plot = detailed_plot_database.get_detailed_plot_by_id(detailed_plot_id)
@@ -275,7 +304,9 @@ async def check_detailed_plot_logic(detailed_plot_id: str):
         # 进行逻辑检查
         logic_result = await logic_service.check_logic_detailed(
             content=detailed_plot.content,
-            checked_by="manual"
+            checked_by="manual",
+            plot_outline_id=detailed_plot.plot_outline_id,
+            previous_result=detailed_plot.logic_check_result if incremental else None
         )
         
         # 更新详细剧情的逻辑检查结果
@@ -418,6 +449,9 @@ async def evolve_detailed_plot(detailed_plot_id: str, evolution_type: str = "gen
             if not success:
                 raise HTTPException(status_code=500, detail="更新进化内容失败")
             
+            # 更新分层摘要记忆
+            await story_memory.record_detailed_plot(detailed_plot, evolution_result["evolved_content"])
+            
             # 保存进化历史
             if "evolution_history" in evolution_result:
                 detailed_plot_database.save_evolution_history(evolution_result["evolution_history"])
@@ -514,7 +548,8 @@ async def correct_detailed_plot(detailed_plot_id: str, request: CorrectionReques
             detailed_plot_id=detailed_plot_id,
             issues=issues,
             user_prompt=request.correction_prompt,
-            corrected_by="manual"
+            corrected_by="manual",
+            mode=request.correction_mode
         )
         
         if correction_result["correction_status"] == "completed":
@@ -528,6 +563,9 @@ async def correct_detailed_plot(detailed_plot_id: str, request: CorrectionReques
             if not success:
                 raise HTTPException(status_code=500, detail="更新修正内容失败")
             
+            # 更新分层摘要记忆
+            await story_memory.record_detailed_plot(detailed_plot, correction_result["corrected_content"])
+            
             # 保存修正历史
             if "correction_history" in correction_result:
                 history_save_success = detailed_plot_database.save_correction_history(correction_result["correction_history"])
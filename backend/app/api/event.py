@@ -2,8 +2,10 @@
 事件相关API端点
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+import asyncio
 import time
 import uuid
 
@@ -16,6 +18,7 @@ from app.core.plot_engine.plot_database import PlotOutlineDatabase
 from app.core.world.database import WorldViewDatabase
 from app.core.character.database import CharacterDatabase
 from app.utils.llm_client import get_llm_client
+from app.utils.progress_events import format_sse
 
 router = APIRouter()
 
@@ -48,6 +51,7 @@ class EnhancedEventRequest(BaseModel):
     character_ids: Optional[List[str]] = None  # 指定角色ID列表
     story_tone: Optional[str] = None  # 故事基调
     narrative_structure: Optional[str] = None  # 叙事结构
+    sharded: Optional[bool] = None  # 是否按幕次/重要性级别分片并发生成，默认事件较多时自动启用
 
 
 class EventResponse(BaseModel):
@@ -56,6 +60,8 @@ class EventResponse(BaseModel):
     events: List[Event]
     message: str
     generation_time: float
+    partial: bool = False  # 部分分片重试后仍失败，事件数少于请求数量
+    failed_shards: List[Dict[str, Any]] = []
 
 
 class SimpleEventResponse(BaseModel):
@@ -212,6 +218,19 @@ async def delete_event(event_id: str, version: Optional[int] = None):
 
 # ==================== 新增：增强的事件API ====================
 
+def _failed_shards(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """分片生成中重试后仍失败的分片"""
+    return (result.get("shard_report") or {}).get("failures", [])
+
+
+def _partial_message(result: Dict[str, Any]) -> str:
+    """部分分片失败时附加到响应消息的说明"""
+    failed = _failed_shards(result)
+    if not failed:
+        return ""
+    return f"（{len(failed)}/{result['shard_report']['shards']} 个分片生成失败，事件数少于请求数量）"
+
+
 @router.post("/events/enhanced", response_model=EventResponse)
 async def create_enhanced_events(request: EnhancedEventRequest):
     """生成增强事件（支持重要性分级和章节关联）"""
@@ -266,7 +285,7 @@ async def create_enhanced_events(request: EnhancedEventRequest):
         }
         
         # 5. 生成增强事件
-        events = await event_generator.generate_enhanced_events(
+        result = await event_generator.generate_enhanced_events_with_report(
             plot_outline=plot_outline,
             world_view=world_view or {},
             characters=characters,
@@ -276,16 +295,20 @@ async def create_enhanced_events(request: EnhancedEventRequest):
             selected_act=request.selected_act,
             story_tone=request.story_tone or getattr(plot_outline, 'story_tone', ''),
             narrative_structure=request.narrative_structure or getattr(plot_outline, 'narrative_structure', ''),
-            save_to_database=True
+            save_to_database=True,
+            sharded=request.sharded
         )
         
+        events = result["events"]
         generation_time = time.time() - start_time
         
         return EventResponse(
             success=True,
             events=events,
-            message=f"成功生成{len(events)}个增强事件",
-            generation_time=generation_time
+            message=f"成功生成{len(events)}个增强事件" + _partial_message(result),
+            generation_time=generation_time,
+            partial=result["partial"],
+            failed_shards=_failed_shards(result)
         )
         
     except Exception as e:
@@ -381,7 +404,7 @@ async def generate_events_with_act_selection(request: EnhancedEventRequest):
         }
         
         # 5. 生成增强事件（支持幕次选择）
-        events = await event_generator.generate_enhanced_events(
+        result = await event_generator.generate_enhanced_events_with_report(
             plot_outline=plot_outline,
             world_view=world_view or {},
             characters=characters,
@@ -389,16 +412,20 @@ async def generate_events_with_act_selection(request: EnhancedEventRequest):
             event_requirements=request.event_requirements,
             generate_chapter_integration=request.generate_chapter_integration,
             selected_act=request.selected_act,
-            save_to_database=True
+            save_to_database=True,
+            sharded=request.sharded
         )
         
+        events = result["events"]
         generation_time = time.time() - start_time
         
         return EventResponse(
             success=True,
             events=events,
-            message=f"成功生成{len(events)}个事件（幕次选择模式）",
-            generation_time=generation_time
+            message=f"成功生成{len(events)}个事件（幕次选择模式）" + _partial_message(result),
+            generation_time=generation_time,
+            partial=result["partial"],
+            failed_shards=_failed_shards(result)
         )
         
     except Exception as e:
@@ -642,6 +669,20 @@ class EvolutionHistoryResponse(BaseModel):
     message: str = ""
 
 
+def _score_to_dict(score: EventScore) -> dict:
+    """将EventScore对象转换为字典"""
+    return {
+        "protagonist_involvement": score.protagonist_involvement,
+        "plot_coherence": score.plot_coherence,
+        "writing_quality": score.writing_quality,
+        "dramatic_tension": score.dramatic_tension,
+        "overall_quality": score.overall_quality,
+        "feedback": score.feedback,
+        "strengths": score.strengths,
+        "weaknesses": score.weaknesses
+    }
+
+
 @router.post("/events/{event_id}/score", response_model=EventScoreResponse)
 async def score_event(event_id: str):
     """对指定事件进行评分（自动获取最新版本）"""
@@ -658,16 +699,7 @@ async def score_event(event_id: str):
         score = await scoring_agent.score_event(latest_event)
         
         # 3. 将EventScore对象转换为字典
-        score_dict = {
-            "protagonist_involvement": score.protagonist_involvement,
-            "plot_coherence": score.plot_coherence,
-            "writing_quality": score.writing_quality,
-            "dramatic_tension": score.dramatic_tension,
-            "overall_quality": score.overall_quality,
-            "feedback": score.feedback,
-            "strengths": score.strengths,
-            "weaknesses": score.weaknesses
-        }
+        score_dict = _score_to_dict(score)
         
         return EventScoreResponse(
             success=True,
@@ -679,6 +711,84 @@ async def score_event(event_id: str):
         raise HTTPException(status_code=500, detail=f"事件评分失败: {str(e)}")
 
 
+@router.post("/events/plot/{plot_outline_id}/score-all")
+async def score_all_plot_events(plot_outline_id: str, max_concurrency: Optional[int] = Query(None, ge=1, le=16)):
+    """批量评分剧情大纲下的全部事件（SSE推送每个事件的评分进度）"""
+    events = event_database.get_events_by_plot_outline(plot_outline_id)
+    if not events:
+        raise HTTPException(status_code=404, detail="该剧情大纲下没有事件")
+    
+    topic = f"plot-scoring:{plot_outline_id}"
+    queue: asyncio.Queue = asyncio.Queue()
+    
+    def on_progress(completed: int, total: int, event, score: Optional[EventScore], error: Optional[str]):
+        queue.put_nowait({
+            "topic": topic,
+            "event": "progress",
+            "stage": "scoring",
+            "percent": round(completed * 100 / total, 1),
+            "message": f"{completed}/{total} {event.title}" + (f" 评分失败: {error}" if error else ""),
+            "partial": {
+                "event_id": event.id,
+                "title": event.title,
+                "overall_quality": score.overall_quality if score else None,
+                "error": error
+            }
+        })
+    
+    async def run_scoring():
+        try:
+            result = await scoring_agent.score_plot_events(
+                plot_outline_id, events=events, max_concurrency=max_concurrency, on_progress=on_progress
+            )
+            message = f"评分完成：成功 {len(result['scores'])} 个，失败 {len(result['failed'])} 个"
+            # 评分结果未能全部保存时推送failed事件，仍附带已完成的评分供客户端重试保存
+            save_failed = result["save_error"] is not None or result["saved"] != len(result["scores"])
+            if save_failed:
+                message += f"，评分结果保存失败（已保存 {result['saved']}/{len(result['scores'])} 条）"
+                if result["save_error"]:
+                    message += f": {result['save_error']}"
+            queue.put_nowait({
+                "topic": topic,
+                "event": "failed" if save_failed else "completed",
+                "stage": "saving" if save_failed else "saved",
+                "percent": 100,
+                "message": message,
+                "partial": {
+                    "scores": [
+                        {"event_id": event.id, "title": event.title, "score": _score_to_dict(score)}
+                        for event, score in result["scores"]
+                    ],
+                    "failed": result["failed"],
+                    "saved": result["saved"],
+                    "save_error": result["save_error"]
+                }
+            })
+        except Exception as e:
+            print(f"❌ 批量评分事件失败: {e}")
+            queue.put_nowait({"topic": topic, "event": "failed", "stage": "scoring", "message": str(e)})
+    
+    async def stream():
+        task = asyncio.create_task(run_scoring())
+        try:
+            yield format_sse({
+                "topic": topic, "event": "progress", "stage": "queued", "percent": 0,
+                "message": f"开始评分 {len(events)} 个事件"
+            })
+            while True:
+                payload = await queue.get()
+                yield format_sse(payload)
+                if payload["event"] != "progress":
+                    break
+        finally:
+            # 客户端断开时取消尚未完成的评分
+            if not task.done():
+                task.cancel()
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
 @router.get("/events/{event_id}/scores", response_model=List[EventScore])
 async def get_event_scores(event_id: str):
     """获取事件的所有评分历史"""
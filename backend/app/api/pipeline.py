@@ -0,0 +1,79 @@
+"""
+生成流水线API路由（阶段缓存与dry-run）
+"""
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.detailed_plot.detailed_plot_models import DetailedPlotRequest
+from app.utils.stage_cache import stage_cache
+from app.utils.artifact_store import artifact_store
+
+router = APIRouter()
+
+
+class PipelineDryRunRequest(BaseModel):
+    """自动生成流水线dry-run请求"""
+    core_concept: str = Field(..., description="核心概念")
+
+
+class ScoringDryRunRequest(BaseModel):
+    """评分dry-run请求"""
+    content: Dict[str, Any] = Field(..., description="待评分内容")
+    mode: Optional[str] = Field(default=None, description="评分模式，默认使用配置")
+
+
+class LogicCheckDryRunRequest(BaseModel):
+    """逻辑检查dry-run请求"""
+    content: str = Field(..., description="待检查内容")
+
+
+@router.post("/dry-run")
+async def dry_run_pipeline(request: PipelineDryRunRequest):
+    """预估自动生成流水线中哪些阶段会重新生成（不调用LLM）"""
+    try:
+        from app.core.automation.auto_generator import AutoGenerator
+        generator = AutoGenerator()
+        return await generator.dry_run(request.core_concept)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"dry-run失败: {str(e)}")
+
+
+@router.post("/detailed-plot/dry-run")
+async def dry_run_detailed_plot(request: DetailedPlotRequest):
+    """预估章节详细剧情是否需要重新生成"""
+    try:
+        from app.core.detailed_plot.detailed_plot_engine import DetailedPlotEngine
+        return await DetailedPlotEngine().preview_regeneration(request)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"dry-run失败: {str(e)}")
+
+
+@router.post("/scoring/dry-run")
+async def dry_run_scoring(request: ScoringDryRunRequest):
+    """预估评分是否需要重新调用LLM"""
+    info = stage_cache.lookup("scoring", {"content": request.content, "mode": request.mode or settings.SCORING_MODE})
+    info.pop("output", None)
+    return info
+
+
+@router.post("/logic-check/dry-run")
+async def dry_run_logic_check(request: LogicCheckDryRunRequest):
+    """预估逻辑检查是否需要重新调用LLM"""
+    info = stage_cache.lookup("logic_check", {"content": request.content})
+    info.pop("output", None)
+    return info
+
+
+@router.get("/cache/stats")
+async def get_stage_cache_stats():
+    """阶段缓存命中统计及产物存储占用"""
+    return {
+        "enabled": stage_cache.enabled,
+        "cache_dir": str(stage_cache.cache_dir),
+        **stage_cache.get_stats(),
+        "artifact_store": {"root": str(artifact_store.root), **artifact_store.get_stats()}
+    }
@@ -0,0 +1,98 @@
+"""
+进度推送API路由（Server-Sent Events）
+"""
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.automation.progress_manager import ProgressManager
+from app.utils.async_queue import task_queue, TaskStatus
+from app.utils.progress_events import progress_bus, task_topic, session_topic, format_sse
+
+router = APIRouter()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no"
+}
+
+
+def _task_snapshot_event(task_id: str, state: dict) -> dict:
+    """将任务状态转换为进度事件"""
+    status = state['status']
+    if status == TaskStatus.COMPLETED.value:
+        event = 'completed'
+    elif status == TaskStatus.FAILED.value:
+        event = 'failed'
+    else:
+        event = 'progress'
+    return {
+        'topic': task_topic(task_id),
+        'event': event,
+        'stage': state.get('stage') or status,
+        'percent': state.get('progress'),
+        'message': state.get('error'),
+        'partial': None,
+        'task_id': task_id,
+        'status': status
+    }
+
+
+async def _stream_task(task_id: str, initial_state: dict):
+    """任务进度事件流：先发送当前状态，之后推送实时事件直到任务结束"""
+    topic = task_topic(task_id)
+    snapshot = _task_snapshot_event(task_id, initial_state)
+    if snapshot['event'] != 'progress':
+        yield format_sse(snapshot)
+        return
+    # 总线保留了该任务最近一次事件时，订阅会先重放它作为当前状态，不再重复发送快照
+    if progress_bus.get_last_event(topic) is None:
+        yield format_sse(snapshot)
+    
+    async for event in progress_bus.subscribe(topic, settings.PROGRESS_STREAM_HEARTBEAT_SECONDS):
+        if event is None:
+            # 保活；任务可能在其他节点执行（持久化队列），空闲时核对一次最终状态
+            state = task_queue.get_task_status(task_id)
+            if state is None:
+                return
+            snapshot = _task_snapshot_event(task_id, state)
+            if snapshot['event'] != 'progress':
+                yield format_sse(snapshot)
+                return
+            yield ": keep-alive\n\n"
+            continue
+        yield format_sse(event)
+
+
+async def _stream_session(session_id: str):
+    """生成会话进度事件流"""
+    async for event in progress_bus.subscribe(session_topic(session_id), settings.PROGRESS_STREAM_HEARTBEAT_SECONDS):
+        if event is None:
+            yield ": keep-alive\n\n"
+            continue
+        yield format_sse(event)
+
+
+@router.get("/tasks/{task_id}/stream")
+async def stream_task_progress(task_id: str):
+    """订阅任务进度（SSE），任务完成或失败后关闭连接"""
+    state = task_queue.get_task_status(task_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return StreamingResponse(
+        _stream_task(task_id, state),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+@router.get("/sessions/{session_id}/stream")
+async def stream_session_progress(session_id: str):
+    """订阅自动生成会话的进度（SSE），生成完成或失败后关闭连接"""
+    if progress_bus.get_last_event(session_topic(session_id)) is None and not ProgressManager.session_exists(session_id):
+        raise HTTPException(status_code=404, detail="会话不存在")
+    return StreamingResponse(
+        _stream_session(session_id),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
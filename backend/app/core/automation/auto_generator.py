@@ -2,34 +2,67 @@
 完全自动化生成引擎
 """
 import asyncio
+import json
+import time
+import uuid
+from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from app.core.config import settings
 from app.core.world.service import WorldService
 from app.core.character.service import CharacterService
-from app.core.plot.llm_generator import PlotLLMGenerator
-from app.core.plot_engine import PlotEngine
-from app.core.plot.foreshadowing_system import ForeshadowingSystem
-from app.core.plot.chapter_generator import ChapterGenerator
+# 旧版剧情组件（app.core.plot 模块、PlotEngine）缺失时，依赖它们的阶段在执行时报错，dry-run等不受影响
+try:
+    from app.core.plot.llm_generator import PlotLLMGenerator
+    from app.core.plot.foreshadowing_system import ForeshadowingSystem
+    from app.core.plot.chapter_generator import ChapterGenerator
+except ImportError:
+    PlotLLMGenerator = ForeshadowingSystem = ChapterGenerator = None
+try:
+    from app.core.plot_engine import PlotEngine
+except ImportError:
+    PlotEngine = None
 from app.core.scoring.service import ScoringService
 from app.core.logic.service import LogicReflectionService
 from app.core.automation.decision_engine import IntelligentDecisionEngine
 from app.core.automation.rewrite_engine import AutoRewriteEngine
 from app.utils.file_writer import FileWriter
 from app.core.automation.progress_manager import ProgressManager, GenerationStage
+from app.core.automation.stage_scheduler import StageScheduler
+from app.core.automation.convergence import ConvergenceController
 from app.core.event_generator import EventGenerator
+from app.utils.llm_client import llm_usage_scope
+from app.utils.stage_cache import stage_cache
+from app.utils.artifact_store import artifact_store
 
 
 class AutoGenerator:
     """完全自动化生成引擎"""
     
+    # 各阶段完成后对应的进度阶段
+    STAGE_PROGRESS = {
+        "world_view": GenerationStage.WORLDVIEW_GENERATED,
+        "characters": GenerationStage.CHARACTERS_GENERATED,
+        "plot_outline": GenerationStage.PLOT_OUTLINE_GENERATED,
+        "chapters": GenerationStage.CHAPTERS_GENERATED,
+        "events": GenerationStage.EVENTS_GENERATED,
+        "foreshadowing_network": GenerationStage.FORESHADOWING_GENERATED
+    }
+    
+    WORLD_REQUIREMENTS = {
+        "请根据核心概念生成完整的世界观设定",
+        "包含力量体系、地理设定、历史背景、文化特色等",
+        "确保世界观逻辑自洽且富有想象力"
+    }
+    
     def __init__(self, session_id: str = None):
         self.world_service = WorldService()
         self.character_service = CharacterService()
-        self.plot_generator = PlotLLMGenerator()
-        self.plot_engine = PlotEngine()  # 新的事件驱动剧情引擎
-        self.foreshadowing_system = ForeshadowingSystem()
-        self.chapter_generator = ChapterGenerator()
+        self.plot_generator = PlotLLMGenerator() if PlotLLMGenerator else None
+        self.plot_engine = PlotEngine() if PlotEngine else None  # 新的事件驱动剧情引擎
+        self.foreshadowing_system = ForeshadowingSystem() if ForeshadowingSystem else None
+        self.chapter_generator = ChapterGenerator() if ChapterGenerator else None
         self.scoring_service = ScoringService()
         self.logic_service = LogicReflectionService()
         self.decision_engine = IntelligentDecisionEngine()
@@ -37,13 +70,18 @@ class AutoGenerator:
         self.file_writer = FileWriter()
         self.progress_manager = ProgressManager(session_id)
         self.event_generator = EventGenerator()
+        self.stage_cache = stage_cache
+        self.artifact_store = artifact_store
         
         # 配置参数
         self.max_iterations = 5
         self.min_score_threshold = 7.0
         self.auto_character_count = True
+        self.character_concurrency = 3  # 角色并发生成数量
         self.enable_chapter_generation = True
         self.target_chapter_count = 20
+        self.last_batch_report: Optional[Dict[str, Any]] = None
+        self.last_optimization_report: Optional[Dict[str, Any]] = None
     
     async def generate_novel(self, core_concept: str, 
                            auto_optimize: bool = True, resume: bool = False) -> Dict[str, Any]:
@@ -54,8 +92,8 @@ class AutoGenerator:
             print(f"📍 当前阶段: {self.progress_manager.get_current_stage()}")
         else:
             print(f"🚀 开始自动化生成小说: {core_concept}")
-            self.progress_manager.progress_data["core_concept"] = core_concept
-            self.progress_manager.save_progress()
+            self.progress_manager.set_field("core_concept", core_concept)
+        self.progress_manager.publish_progress(message=f"开始生成: {core_concept}")
         
         print("=" * 60)
         
@@ -88,44 +126,32 @@ class AutoGenerator:
             print(f"❌ 自动化生成失败: {e}")
             import traceback
             traceback.print_exc()
+            self.progress_manager.publish_progress(message=str(e), event="failed")
             return {"error": str(e), "core_concept": core_concept}
     
     async def _resume_generation(self, core_concept: str, auto_optimize: bool) -> Dict[str, Any]:
-        """恢复生成过程"""
+        """恢复生成过程：依赖图中已完成的节点不再执行，从未完成的节点继续"""
         print("🔄 从断点恢复生成...")
+        completed_nodes = self.progress_manager.get_completed_nodes()
+        if completed_nodes:
+            print(f"📍 已完成的阶段节点: {', '.join(completed_nodes)}")
         
-        # 获取已生成的内容
-        content = self.progress_manager.get_generated_content()
-        current_stage = self.progress_manager.get_current_stage()
-        
-        # 根据当前阶段决定从哪里继续
-        if current_stage == GenerationStage.WORLDVIEW_GENERATED:
-            # 从角色生成开始
-            print("📖 继续生成角色...")
-            content = await self._generate_characters(content, core_concept)
-        elif current_stage == GenerationStage.CHARACTERS_GENERATED:
-            # 从剧情大纲开始
-            print("📚 继续生成剧情大纲...")
-            content = await self._generate_plot_outline(content, core_concept)
-        elif current_stage == GenerationStage.PLOT_OUTLINE_GENERATED:
-            # 从伏笔网络开始
-            print("🔗 继续生成伏笔网络...")
-            content = await self._generate_foreshadowing(content, core_concept)
-        elif current_stage == GenerationStage.FORESHADOWING_GENERATED:
-            # 从反派生成开始
-            print("👹 继续生成反派...")
-            content = await self._generate_antagonists(content, core_concept)
-        elif current_stage == GenerationStage.ANTAGONISTS_GENERATED:
-            # 从章节生成开始
-            print("📖 继续生成章节...")
-            content = await self._generate_chapters(content, core_concept)
-        
-        # 继续后续步骤
-        if auto_optimize and not self.progress_manager.is_stage_completed(GenerationStage.OPTIMIZATION_COMPLETED):
-            print(f"\n🔄 继续优化循环...")
-            content = await self._auto_optimization_loop(content, core_concept)
-        
-        return content
+        # 已完成节点的完整输出从产物存储还原，不再调用LLM
+        return await self._generate_initial_content(core_concept, self._load_stage_results())
+    
+    def _load_stage_results(self) -> Dict[str, Any]:
+        """按进度日志中记录的内容哈希，从产物存储加载已完成节点的输出"""
+        results = {}
+        for node in self.progress_manager.get_completed_nodes():
+            digest = self.progress_manager.get_node_artifact(node)
+            output = self.artifact_store.get(digest) if digest else None
+            if output is None:
+                print(f"  ⚠️ 阶段 {node} 的产物不可用，将重新生成")
+                continue
+            results[node] = output
+        if results:
+            print(f"  ♻️ 从产物存储还原阶段: {', '.join(results)}")
+        return results
     
     def get_progress_info(self) -> Dict[str, Any]:
         """获取当前进度信息"""
@@ -135,60 +161,199 @@ class AutoGenerator:
         """清理进度文件"""
         self.progress_manager.cleanup()
     
-    async def _generate_initial_content(self, core_concept: str) -> Dict[str, Any]:
-        """生成初始内容"""
-        # 生成世界观
+    def _legacy_component(self, name: str):
+        """获取依赖旧版剧情组件的对象，组件缺失时给出明确错误"""
+        component = getattr(self, name)
+        if component is None:
+            raise RuntimeError(f"{name} 不可用：当前代码树缺少对应的旧版剧情组件")
+        return component
+    
+    def _build_stage_graph(self, core_concept: str) -> StageScheduler:
+        """
+        声明初始内容生成的阶段依赖图
+        
+        世界观 → 角色 → 剧情大纲 → {章节大纲, 事件序列, 伏笔网络}
+        章节大纲、事件序列、伏笔网络只依赖剧情大纲，三者并发执行。
+        每个阶段按输入哈希缓存，输入未变化时直接复用上次输出。
+        """
+        scheduler = StageScheduler(progress_manager=self.progress_manager)
+        scheduler.add_stage("world_view", self._stage_node("world_view", core_concept))
+        scheduler.add_stage("characters", self._stage_node("characters", core_concept),
+                            depends_on=["world_view"])
+        scheduler.add_stage("plot_outline", self._stage_node("plot_outline", core_concept),
+                            depends_on=["world_view", "characters"])
+        for stage in ("chapters", "events", "foreshadowing_network"):
+            scheduler.add_stage(stage, self._stage_node(stage, core_concept),
+                                depends_on=["world_view", "characters", "plot_outline"])
+        return scheduler
+    
+    def _stage_node(self, stage: str, core_concept: str):
+        """构建带输入哈希缓存的阶段执行函数"""
+        runners = {
+            "world_view": self._stage_world_view,
+            "characters": self._stage_characters,
+            "plot_outline": self._stage_plot_outline,
+            "chapters": self._stage_chapters,
+            "events": self._stage_events,
+            "foreshadowing_network": self._stage_foreshadowing
+        }
+        
+        async def run(results: Dict[str, Any]) -> Any:
+            inputs = await self._stage_inputs(stage, results, core_concept)
+            output = await self.stage_cache.memoize(stage, inputs, lambda: runners[stage](inputs))
+            # 完整输出按内容哈希保存，进度日志只记录哈希
+            digest = self.artifact_store.put(output)
+            if digest:
+                self.progress_manager.set_node_artifact(stage, digest)
+            self.progress_manager.update_stage(self.STAGE_PROGRESS[stage], {stage: output})
+            return output
+        
+        return run
+    
+    async def _stage_inputs(self, stage: str, results: Dict[str, Any], core_concept: str) -> Dict[str, Any]:
+        """阶段的prompt相关输入（用于生成和计算输入哈希）"""
+        if stage == "world_view":
+            return {"core_concept": core_concept, "requirements": self.WORLD_REQUIREMENTS}
+        
+        inputs = {"world_view": results["world_view"]}
+        if stage == "characters":
+            inputs.update(await self._character_plan(results["world_view"]))
+            return inputs
+        
+        inputs["characters"] = results["characters"]
+        if stage == "plot_outline":
+            inputs["requirements"] = {"core_concept": core_concept}
+            return inputs
+        
+        inputs["plot_outline"] = results["plot_outline"]
+        if stage == "events":
+            inputs["event_count"] = 20  # 生成20个事件
+        return inputs
+    
+    async def _character_plan(self, world_view: Dict[str, Any]) -> Dict[str, Any]:
+        """智能决定角色数量及每个角色的定位和生成要求"""
+        character_count = await self.decision_engine.determine_character_count(world_view)
+        character_types = ["主角", "重要配角", "反派", "导师", "盟友"]
+        role_hints = [character_types[i] if i < len(character_types) else "次要角色" for i in range(character_count)]
+        requirement_sets = [
+            [
+                f"请生成一个{char_type}",
+                "角色应该符合世界观的设定，有鲜明的性格特点",
+                "包含基础信息、内在特质、能力设定、社会关系、成长弧线",
+                f"这是第{i+1}个角色，请确保与已有角色有合理的关联",
+                "如果是反派角色，请确保与主角形成鲜明对比，有合理的动机"
+            ]
+            for i, char_type in enumerate(role_hints)
+        ]
+        return {"role_hints": role_hints, "requirement_sets": requirement_sets}
+    
+    async def _generate_initial_content(self, core_concept: str,
+                                        initial_results: Dict[str, Any] = None) -> Dict[str, Any]:
+        """按阶段依赖图生成初始内容"""
+        scheduler = self._build_stage_graph(core_concept)
+        results = await scheduler.run(initial_results)
+        
+        report = scheduler.get_report()
+        print(f"  ⏱️ 初始内容生成耗时 {report['wall_time']:.1f}s"
+              f"（串行 {report['sequential_time']:.1f}s，关键路径 {report['critical_path_time']:.1f}s: "
+              f"{' → '.join(report['critical_path'])}）")
+        
+        # 6. 详细剧情生成（手动交互）
+        print("  🎭 详细剧情生成需要手动交互")
+        print("  📝 请使用 generate_detailed_plot_for_chapter() 方法选择特定章节生成详细剧情")
+        
+        return {
+            "world_view": results["world_view"],
+            "characters": results["characters"],
+            "plot_outline": results["plot_outline"],
+            "chapters": results["chapters"],
+            "events": results["events"],
+            "foreshadowing_network": results["foreshadowing_network"],
+            "core_concept": core_concept,
+            "generation_time": datetime.now().isoformat(),
+            "stage_report": report
+        }
+    
+    async def dry_run(self, core_concept: str) -> Dict[str, Any]:
+        """
+        预估哪些阶段会重新生成（不调用LLM、不写入任何数据）
+        
+        按依赖顺序计算每个阶段的输入哈希：命中缓存的阶段以缓存输出作为下游输入，
+        上游需要重新生成时下游阶段也必然重新生成。
+        """
+        scheduler = self._build_stage_graph(core_concept)
+        available: Dict[str, Any] = {}
+        stages = []
+        
+        for stage in scheduler.topological_order():
+            missing = [dep for dep in scheduler.stages[stage].depends_on if dep not in available]
+            if missing:
+                stages.append({
+                    "stage": stage,
+                    "would_regenerate": True,
+                    "reason": f"上游阶段需要重新生成: {', '.join(missing)}"
+                })
+                continue
+            
+            inputs = await self._stage_inputs(stage, available, core_concept)
+            info = self.stage_cache.lookup(stage, inputs)
+            if not info["would_regenerate"]:
+                available[stage] = info["output"]
+            stages.append({
+                "stage": stage,
+                "input_hash": info["input_hash"],
+                "would_regenerate": info["would_regenerate"],
+                "cached_at": info["cached_at"],
+                "reason": "输入或模板已变化" if info["would_regenerate"] else "输入未变化，复用缓存"
+            })
+        
+        return {
+            "core_concept": core_concept,
+            "stages": stages,
+            "regenerate_count": sum(1 for item in stages if item["would_regenerate"]),
+            "reuse_count": sum(1 for item in stages if not item["would_regenerate"])
+        }
+    
+    async def _stage_world_view(self, inputs: Dict[str, Any]):
+        """阶段：生成世界观"""
         print("  📖 生成世界观...")
         world_view = await self.world_service.create_world_view(
-            core_concept=core_concept,
+            core_concept=inputs["core_concept"],
             description=None,
-            additional_requirements={
-                "请根据核心概念生成完整的世界观设定",
-                "包含力量体系、地理设定、历史背景、文化特色等",
-                "确保世界观逻辑自洽且富有想象力"
-            }
+            additional_requirements=inputs["requirements"]
         )
         print(f"  ✅ 世界观生成完成: {world_view.name}")
-        
-        # 更新进度
-        self.progress_manager.update_stage(GenerationStage.WORLDVIEW_GENERATED, {"world_view": world_view.dict()})
-        
-        # 智能决定角色数量
-        character_count = await self.decision_engine.determine_character_count(world_view.dict())
+        return world_view
+    
+    async def _stage_characters(self, inputs: Dict[str, Any]):
+        """阶段：生成角色（包括主角、配角、反派等）"""
+        role_hints = inputs["role_hints"]
+        character_count = len(role_hints)
         print(f"  👥 智能决定生成{character_count}个角色...")
         
-        # 生成角色（包括主角、配角、反派等）
-        characters = []
-        character_types = ["主角", "重要配角", "反派", "导师", "盟友"]
-        
-        for i in range(character_count):
-            char_type = character_types[i] if i < len(character_types) else "次要角色"
-            print(f"  👤 生成{char_type}...")
-            
-            character = await self.character_service.create_character(
-                world_view_id=world_view.id,
-                character_requirements=[
-                    f"请生成一个{char_type}",
-                    "角色应该符合世界观的设定，有鲜明的性格特点",
-                    "包含基础信息、内在特质、能力设定、社会关系、成长弧线",
-                    f"这是第{i+1}个角色，请确保与已有角色有合理的关联",
-                    "如果是反派角色，请确保与主角形成鲜明对比，有合理的动机"
-                ]
-            )
-            characters.append(character)
+        # 并发生成角色，之后对重名和主角定位冲突的角色重新生成
+        print(f"  👤 并发生成{character_count}个角色（并发数 {self.character_concurrency}）...")
+        characters = await self.character_service.create_characters_concurrently(
+            world_view_id=inputs["world_view"]["id"],
+            requirement_sets=inputs["requirement_sets"],
+            role_hints=role_hints,
+            max_concurrency=self.character_concurrency
+        )
+        for i, (char_type, character) in enumerate(zip(role_hints, characters)):
             print(f"  ✅ {char_type}生成完成: {character.name}")
-        
-        # 更新进度
-        self.progress_manager.update_stage(GenerationStage.CHARACTERS_GENERATED, {"characters": [char.dict() for char in characters]})
-        
-        # 按照新的流程：世界观 → 角色生成 → 剧情大纲 → 章节大纲 → 事件生成 → 剧情生成
-        
-        # 3. 生成剧情大纲
+            self.progress_manager.publish_progress(
+                message=f"{char_type}生成完成 ({i + 1}/{character_count})",
+                partial={"character_name": character.name, "character_type": char_type}
+            )
+        return characters
+    
+    async def _stage_plot_outline(self, inputs: Dict[str, Any]):
+        """阶段：生成剧情大纲"""
         print("  📚 生成剧情大纲...")
-        plot_outline = await self.plot_generator.generate_plot_outline(
-            world_view=world_view.dict(),
-            characters=[char.dict() for char in characters],
-            requirements={"core_concept": core_concept}
+        plot_outline = await self._legacy_component("plot_generator").generate_plot_outline(
+            world_view=inputs["world_view"],
+            characters=inputs["characters"],
+            requirements=inputs["requirements"]
         )
         print(f"  ✅ 剧情大纲生成完成: {plot_outline.title}")
         
@@ -196,31 +361,29 @@ class AutoGenerator:
         print("  💾 保存剧情大纲...")
         plot_outline_file = self.file_writer.write_plot_outline(plot_outline.dict())
         print(f"  ✅ 剧情大纲已保存到: {plot_outline_file}")
-        
-        # 更新进度
-        self.progress_manager.update_stage(GenerationStage.PLOT_OUTLINE_GENERATED, {"plot_outline": plot_outline.dict()})
-        
-        # 4. 生成章节大纲
+        return plot_outline
+    
+    async def _stage_chapters(self, inputs: Dict[str, Any]):
+        """阶段：生成章节大纲"""
         print("  📖 生成章节大纲...")
-        chapters = await self.chapter_generator.generate_chapter_series(
-            plot_outline=plot_outline.dict(),
-            world_view=world_view.dict(),
-            characters=[char.dict() for char in characters],
-            foreshadowing_network=None,  # 暂时跳过伏笔网络
-            world_view_id=world_view.id
+        chapters = await self._legacy_component("chapter_generator").generate_chapter_series(
+            plot_outline=inputs["plot_outline"],
+            world_view=inputs["world_view"],
+            characters=inputs["characters"],
+            foreshadowing_network=None,  # 与伏笔网络并行生成，不互相依赖
+            world_view_id=inputs["world_view"]["id"]
         )
         print(f"  ✅ 章节大纲生成完成: {len(chapters)}章")
-        
-        # 更新进度
-        self.progress_manager.update_stage(GenerationStage.CHAPTERS_GENERATED, {"chapters": [chapter.dict() for chapter in chapters]})
-        
-        # 5. 生成事件序列
+        return chapters
+    
+    async def _stage_events(self, inputs: Dict[str, Any]):
+        """阶段：生成事件序列"""
         print("  📅 生成事件序列...")
         events = await self.event_generator.generate_event_sequence(
-            world_view=world_view.dict(),
-            characters=[char.dict() for char in characters],
-            plot_outline=plot_outline.dict(),
-            event_count=20  # 生成20个事件
+            world_view=inputs["world_view"],
+            characters=inputs["characters"],
+            plot_outline=inputs["plot_outline"],
+            event_count=inputs["event_count"]
         )
         print(f"  ✅ 事件序列生成完成: {len(events)}个事件")
         
@@ -228,42 +391,24 @@ class AutoGenerator:
         print("  💾 保存事件序列...")
         events_file = self.file_writer.write_events_sequence(events)
         print(f"  ✅ 事件序列已保存到: {events_file}")
-        
-        # 更新进度
-        self.progress_manager.update_stage(GenerationStage.EVENTS_GENERATED, {"events": [event.dict() for event in events]})
-        
-        # 6. 详细剧情生成（手动交互）
-        print("  🎭 详细剧情生成需要手动交互")
-        print("  📝 请使用 generate_detailed_plot_for_chapter() 方法选择特定章节生成详细剧情")
-        
-        # 生成伏笔网络（基于剧情大纲）
+        return events
+    
+    async def _stage_foreshadowing(self, inputs: Dict[str, Any]):
+        """阶段：生成伏笔网络（基于剧情大纲）"""
         print("  🔮 生成伏笔网络...")
-        foreshadowing_network = await self.foreshadowing_system.create_foreshadowing_network(
-            plot_outline=plot_outline.dict(),
-            characters=[char.dict() for char in characters],
-            world_view=world_view.dict()
+        foreshadowing_network = await self._legacy_component("foreshadowing_system").create_foreshadowing_network(
+            plot_outline=inputs["plot_outline"],
+            characters=inputs["characters"],
+            world_view=inputs["world_view"]
         )
         print(f"  ✅ 伏笔网络生成完成: {len(foreshadowing_network.setups)}个伏笔")
-        
-        # 更新进度
-        self.progress_manager.update_stage(GenerationStage.FORESHADOWING_GENERATED, {"foreshadowing_network": foreshadowing_network.dict()})
-        
-        return {
-            "world_view": world_view.dict(),
-            "characters": [char.dict() for char in characters],
-            "plot_outline": plot_outline.dict(),
-            "chapters": [chapter.dict() for chapter in chapters],
-            "events": [event.dict() for event in events],
-            "foreshadowing_network": foreshadowing_network.__dict__,
-            "core_concept": core_concept,
-            "generation_time": datetime.now().isoformat()
-        }
+        return foreshadowing_network
     
     async def _auto_optimization_loop(self, content: Dict[str, Any], 
                                     core_concept: str) -> Dict[str, Any]:
-        """自动优化循环"""
+        """自动优化循环：收敛控制器按预期收益和token预算决定是否继续"""
         iteration = 0
-        previous_scores = None
+        controller = ConvergenceController(max_iterations=self.max_iterations)
         
         while iteration < self.max_iterations:
             iteration += 1
@@ -271,8 +416,17 @@ class AutoGenerator:
             
             # 评分
             print("    ⭐ 进行内容评分...")
-            scores = await self.scoring_service.score_content(content)
+            with llm_usage_scope() as usage:
+                scores = await self.scoring_service.score_content(content)
+            if "error" in scores:
+                print(f"    ❌ 评分失败，停止优化: {scores['error']}")
+                break
+            controller.record_scores(iteration, scores, usage.total_tokens)
             print(f"    📊 当前评分: {scores['total_score']:.1f}/10")
+            self.progress_manager.publish_progress(
+                message=f"第{iteration}轮优化评分: {scores['total_score']:.1f}/10",
+                partial={"iteration": iteration, "total_score": scores['total_score']}
+            )
             
             # 决策
             print("    🧠 智能决策分析...")
@@ -295,16 +449,25 @@ class AutoGenerator:
                 print(f"    ✅ 内容质量已达标，无需重写")
                 break
             
+            # 预期收益不值得再花一轮token时提前停止
+            worth_continuing, reason = controller.should_continue(iteration)
+            print(f"    📉 收敛判断: {reason}")
+            if not worth_continuing:
+                break
+            
             # 执行重写
             print(f"    🔧 执行重写: {decision.strategy.value}")
-            content = await self.rewrite_engine.rewrite_content(content, decision)
-            
-            # 更新历史分数
-            previous_scores = scores
+            with llm_usage_scope() as usage:
+                content = await self.rewrite_engine.rewrite_content(content, decision)
+            controller.record_rewrite(usage.total_tokens)
             
             print(f"    ✅ 第{iteration}轮优化完成")
         
-        print(f"\n  🎉 自动优化完成，共进行了{iteration}轮优化")
+        report = controller.get_report()
+        self.last_optimization_report = report
+        content["optimization_report"] = report
+        print(f"\n  🎉 自动优化完成，共进行了{iteration}轮优化，消耗{report['tokens_spent']}个token，"
+              f"相比固定{self.max_iterations}轮约节省{report['tokens_saved_estimate']}个token")
         return content
     
     async def _generate_chapters(self, content: Dict[str, Any], 
@@ -320,7 +483,7 @@ class AutoGenerator:
                 return content
             
             # 基于剧情段落生成章节
-            chapters = await self.chapter_generator.generate_chapter_series(
+            chapters = await self._legacy_component("chapter_generator").generate_chapter_series(
                 plot_outline=plot_outline,
                 world_view=content.get("world_view", {}),
                 characters=content.get("characters", []),
@@ -343,11 +506,15 @@ class AutoGenerator:
                 file_path = self.file_writer.write_novel_chapter(chapter_dict)
                 chapter_files.append(file_path)
                 print(f"  ✅ 第{chapter.chapter_number}章已保存: {file_path}")
+                self.progress_manager.publish_progress(
+                    message=f"第{chapter.chapter_number}章已保存",
+                    partial={"chapter_number": chapter.chapter_number, "title": chapter.title}
+                )
             
             # 更新内容
             content["chapters"] = [chapter.__dict__ for chapter in chapters]
             content["chapter_files"] = chapter_files
-            content["chapter_summary"] = self.chapter_generator.get_chapter_summary(chapters)
+            content["chapter_summary"] = self._legacy_component("chapter_generator").get_chapter_summary(chapters)
             
             print(f"🎉 章节生成完成: 共{len(chapters)}章，{sum(c.word_count for c in chapters)}字")
             return content
@@ -418,6 +585,12 @@ class AutoGenerator:
         except Exception as e:
             print(f"    ❌ 保存文件失败: {e}")
         
+        self.progress_manager.publish_progress(
+            message="生成完成",
+            partial={"total_score": final_scores.get("total_score")} if isinstance(final_scores, dict) else None,
+            event="completed"
+        )
+        
         # 返回最终结果
         return {
             "content": content,
@@ -434,38 +607,130 @@ class AutoGenerator:
         }
     
     async def batch_generate(self, core_concepts: List[str], 
-                           auto_optimize: bool = True) -> List[Dict[str, Any]]:
-        """批量生成多个小说"""
-        print(f"🚀 开始批量生成{len(core_concepts)}个小说...")
-        print("=" * 60)
+                           auto_optimize: bool = True,
+                           max_concurrency: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        批量生成多个小说
         
-        results = []
+        每个核心概念使用独立的生成器实例和进度会话（progress_<session_id>.json），
+        按 max_concurrency 并发执行，单个小说失败不影响其他小说。
+        汇总报告（吞吐量、token用量、失败数）保存在 self.last_batch_report 中并写入输出目录。
         
-        for i, concept in enumerate(core_concepts, 1):
-            print(f"\n📖 生成第{i}/{len(core_concepts)}个小说: {concept}")
-            print("-" * 40)
-            
-            try:
-                result = await self.generate_novel(concept, auto_optimize)
-                results.append(result)
-                print(f"✅ 第{i}个小说生成完成")
+        Args:
+            core_concepts: 核心概念列表
+            auto_optimize: 是否进行自动优化
+            max_concurrency: 同时生成的小说数量，默认取 settings.AUTO_BATCH_CONCURRENCY
+        """
+        concurrency = max(1, max_concurrency or settings.AUTO_BATCH_CONCURRENCY)
+        batch_id = datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{uuid.uuid4().hex[:6]}"
+        total = len(core_concepts)
+        print(f"🚀 开始批量生成{total}个小说（批次 {batch_id}，并发数 {concurrency}）...")
+        print("=" * 60)
+        
+        semaphore = asyncio.Semaphore(concurrency)
+        started_at = time.perf_counter()
+        
+        async def run_one(index: int, concept: str) -> Dict[str, Any]:
+            session_id = f"batch_{batch_id}_{index:03d}"
+            async with semaphore:
+                print(f"\n📖 生成第{index}/{total}个小说: {concept}（会话 {session_id}）")
+                novel_started = time.perf_counter()
+                with llm_usage_scope() as usage:
+                    try:
+                        generator = self._create_batch_worker(session_id)
+                        result = await generator.generate_novel(concept, auto_optimize)
+                    except Exception as e:
+                        result = {"error": str(e), "core_concept": concept}
                 
-            except Exception as e:
-                error_result = {
-                    "error": str(e),
-                    "core_concept": concept,
-                    "generation_info": {
+                if "error" in result:
+                    result.setdefault("generation_info", {}).update({
                         "core_concept": concept,
                         "generation_time": datetime.now().isoformat(),
                         "status": "failed"
-                    }
+                    })
+                    print(f"❌ 第{index}个小说生成失败: {result['error']}")
+                else:
+                    print(f"✅ 第{index}个小说生成完成")
+                
+                result["batch_info"] = {
+                    "batch_id": batch_id,
+                    "session_id": session_id,
+                    "duration": round(time.perf_counter() - novel_started, 2),
+                    "llm_usage": usage.to_dict()
                 }
-                results.append(error_result)
-                print(f"❌ 第{i}个小说生成失败: {e}")
+                return result
+        
+        results = list(await asyncio.gather(
+            *(run_one(i, concept) for i, concept in enumerate(core_concepts, 1))
+        ))
         
-        print(f"\n🎉 批量生成完成，成功{len([r for r in results if 'error' not in r])}个，失败{len([r for r in results if 'error' in r])}个")
+        self.last_batch_report = self._build_batch_report(batch_id, results, time.perf_counter() - started_at)
+        report = self.last_batch_report
+        print(f"\n🎉 批量生成完成，成功{report['succeeded']}个，失败{report['failed']}个，"
+              f"耗时{report['wall_time']:.0f}s，{report['novels_per_hour']:.2f}本/小时，"
+              f"共消耗{report['total_tokens']}个token")
         return results
     
+    def _create_batch_worker(self, session_id: str) -> "AutoGenerator":
+        """为批量生成中的单个小说创建独立的生成器（沿用当前实例的配置参数）"""
+        generator = AutoGenerator(session_id)
+        generator.max_iterations = self.max_iterations
+        generator.min_score_threshold = self.min_score_threshold
+        generator.auto_character_count = self.auto_character_count
+        generator.character_concurrency = self.character_concurrency
+        generator.enable_chapter_generation = self.enable_chapter_generation
+        generator.target_chapter_count = self.target_chapter_count
+        return generator
+    
+    def _build_batch_report(self, batch_id: str, results: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+        """汇总批量生成的吞吐量报告并写入输出目录"""
+        failures = [
+            {
+                "core_concept": r.get("core_concept") or r.get("generation_info", {}).get("core_concept"),
+                "session_id": r["batch_info"]["session_id"],
+                "error": r["error"]
+            }
+            for r in results if "error" in r
+        ]
+        succeeded = len(results) - len(failures)
+        usages = [r["batch_info"]["llm_usage"] for r in results]
+        total_tokens = sum(u["total_tokens"] for u in usages)
+        
+        report = {
+            "batch_id": batch_id,
+            "total": len(results),
+            "succeeded": succeeded,
+            "failed": len(failures),
+            "wall_time": round(wall_time, 2),
+            "novels_per_hour": round(succeeded / wall_time * 3600, 2) if wall_time > 0 else 0.0,
+            "llm_calls": sum(u["calls"] for u in usages),
+            "prompt_tokens": sum(u["prompt_tokens"] for u in usages),
+            "completion_tokens": sum(u["completion_tokens"] for u in usages),
+            "total_tokens": total_tokens,
+            "tokens_per_novel": round(total_tokens / len(results)) if results else 0,
+            "novels": [
+                {
+                    "session_id": r["batch_info"]["session_id"],
+                    "status": "failed" if "error" in r else "completed",
+                    "duration": r["batch_info"]["duration"],
+                    "total_tokens": r["batch_info"]["llm_usage"]["total_tokens"]
+                }
+                for r in results
+            ],
+            "failures": failures
+        }
+        
+        try:
+            report_file = Path(settings.NOVEL_OUTPUT_DIR) / f"batch_report_{batch_id}.json"
+            report_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(report_file, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"📊 批量生成报告已保存: {report_file}")
+        except Exception as e:
+            print(f"⚠️ 保存批量生成报告失败: {e}")
+        
+        return report
+    
     async def generate_detailed_plot_for_chapter(self, chapter_index: int, 
                                               selected_events: List[str] = None) -> Dict[str, Any]:
         """
@@ -519,7 +784,7 @@ class AutoGenerator:
             filtered_events = [event for event in events if event['id'] in selected_events]
             
             # 使用剧情引擎生成详细剧情
-            detailed_plot = await self.plot_engine.generate_plot(
+            detailed_plot = await self._legacy_component("plot_engine").generate_plot(
                 world_view=world_view,
                 characters=characters,
                 events=filtered_events,
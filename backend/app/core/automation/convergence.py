@@ -0,0 +1,164 @@
+"""
+优化收敛控制器
+
+记录每轮优化的各维度评分变化和token消耗，预测再优化一轮的边际收益：
+预计每千token带来的加权分数提升低于阈值、或剩余预算不足以完成下一轮时停止，
+并估算相对固定轮数优化节省的token。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+# 首轮只知道评分消耗时，按评分消耗的倍数估算一轮（重写 + 重新评分）的消耗
+FIRST_ROUND_COST_MULTIPLIER = 3
+# 还没有分数变化时，假设下一轮能补上剩余提升空间的比例
+PRIOR_GAIN_RATIO = 0.25
+
+
+@dataclass
+class IterationRecord:
+    """单轮优化记录"""
+    iteration: int
+    total_score: float
+    scores: Dict[str, float]
+    scoring_tokens: int
+    rewrite_tokens: int = 0
+    deltas: Dict[str, float] = field(default_factory=dict)
+    
+    @property
+    def tokens(self) -> int:
+        return self.scoring_tokens + self.rewrite_tokens
+
+
+class ConvergenceController:
+    """按预期收益和token预算决定是否继续优化"""
+    
+    def __init__(self, max_iterations: int = 5, token_budget: Optional[int] = None,
+                 min_gain_per_1k_tokens: Optional[float] = None,
+                 weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            max_iterations: 最大优化轮数（固定轮数基线）
+            token_budget: 单本小说优化阶段的token预算，0表示不限制
+            min_gain_per_1k_tokens: 每千token的最低预期加权分数提升
+            weights: 各维度权重，默认使用评分权重
+        """
+        self.max_iterations = max_iterations
+        self.token_budget = settings.OPTIMIZATION_TOKEN_BUDGET if token_budget is None else token_budget
+        self.min_gain_per_1k_tokens = (settings.OPTIMIZATION_MIN_GAIN_PER_1K_TOKENS
+                                       if min_gain_per_1k_tokens is None else min_gain_per_1k_tokens)
+        self.weights = weights or settings.SCORING_WEIGHTS
+        self.history: List[IterationRecord] = []
+        self.stop_reason: Optional[str] = None
+    
+    @property
+    def tokens_spent(self) -> int:
+        return sum(record.tokens for record in self.history)
+    
+    def record_scores(self, iteration: int, scores: Dict[str, Any], tokens: int):
+        """记录一轮评分结果及评分消耗的token"""
+        dimension_scores = scores.get('scores', {})
+        record = IterationRecord(
+            iteration=iteration,
+            total_score=scores.get('total_score', 0.0),
+            scores=dict(dimension_scores),
+            scoring_tokens=tokens
+        )
+        if self.history:
+            previous = self.history[-1].scores
+            record.deltas = {
+                dimension: score - previous[dimension]
+                for dimension, score in dimension_scores.items() if dimension in previous
+            }
+        self.history.append(record)
+    
+    def record_rewrite(self, tokens: int):
+        """记录本轮重写消耗的token"""
+        if self.history:
+            self.history[-1].rewrite_tokens += tokens
+    
+    def predict_gain(self) -> float:
+        """
+        预测再优化一轮的加权总分提升
+        
+        各维度按最近两次变化的衰减比外推（收益递减），只有一次变化时按同样幅度外推，
+        还没有变化时按剩余提升空间的固定比例估计；预测值不超过该维度的剩余空间。
+        """
+        if not self.history:
+            return 0.0
+        current = self.history[-1].scores
+        gain = 0.0
+        for dimension, score in current.items():
+            headroom = max(0.0, 10.0 - score)
+            deltas = [record.deltas[dimension] for record in self.history if dimension in record.deltas]
+            if not deltas:
+                predicted = headroom * PRIOR_GAIN_RATIO
+            elif deltas[-1] <= 0:
+                predicted = 0.0
+            elif len(deltas) >= 2 and deltas[-2] > 0:
+                predicted = deltas[-1] * min(1.0, deltas[-1] / deltas[-2])
+            else:
+                predicted = deltas[-1]
+            gain += self.weights.get(dimension, 0.0) * min(predicted, headroom)
+        return gain
+    
+    def estimate_round_cost(self) -> int:
+        """估算下一轮（重写 + 重新评分）的token消耗"""
+        completed = [record for record in self.history if record.rewrite_tokens > 0]
+        if completed:
+            # 一轮 = 本轮重写 + 下一轮评分，评分消耗取最近一次
+            rewrite = sum(record.rewrite_tokens for record in completed) / len(completed)
+            return int(rewrite + self.history[-1].scoring_tokens)
+        if self.history:
+            return self.history[-1].scoring_tokens * FIRST_ROUND_COST_MULTIPLIER
+        return 0
+    
+    def should_continue(self, iteration: int) -> Tuple[bool, str]:
+        """判断是否值得再优化一轮，返回 (是否继续, 原因)"""
+        if iteration >= self.max_iterations:
+            return self._stop(f"达到最大轮数{self.max_iterations}")
+        
+        gain = self.predict_gain()
+        cost = self.estimate_round_cost()
+        if self.token_budget and self.tokens_spent + cost > self.token_budget:
+            return self._stop(f"剩余预算不足（已用{self.tokens_spent}，下一轮约{cost}，预算{self.token_budget}）")
+        
+        if cost > 0:
+            gain_per_1k = gain / (cost / 1000)
+            if gain_per_1k < self.min_gain_per_1k_tokens:
+                return self._stop(f"预期收益过低（每千token约+{gain_per_1k:.3f}分，阈值{self.min_gain_per_1k_tokens}）")
+            return True, f"预期提升+{gain:.2f}分，约消耗{cost}个token"
+        
+        if gain <= 0:
+            return self._stop("分数不再提升")
+        return True, f"预期提升+{gain:.2f}分"
+    
+    def _stop(self, reason: str) -> Tuple[bool, str]:
+        self.stop_reason = reason
+        return False, reason
+    
+    def get_report(self) -> Dict[str, Any]:
+        """优化报告：各轮分数变化、token消耗及相对固定轮数的节省"""
+        rounds = len(self.history)
+        # 固定轮数基线：未执行的轮次按估算的每轮消耗补齐
+        baseline = self.tokens_spent + max(0, self.max_iterations - rounds) * self.estimate_round_cost()
+        return {
+            "iterations": rounds,
+            "max_iterations": self.max_iterations,
+            "stop_reason": self.stop_reason,
+            "tokens_spent": self.tokens_spent,
+            "token_budget": self.token_budget,
+            "baseline_tokens_estimate": baseline,
+            "tokens_saved_estimate": baseline - self.tokens_spent,
+            "history": [
+                {
+                    "iteration": record.iteration,
+                    "total_score": round(record.total_score, 2),
+                    "deltas": {dimension: round(delta, 2) for dimension, delta in record.deltas.items()},
+                    "tokens": record.tokens
+                }
+                for record in self.history
+            ]
+        }
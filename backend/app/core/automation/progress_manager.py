@@ -1,14 +1,22 @@
 """
-进度管理器 - 支持断点续传
+进度管理器 - 支持断点续传，阶段变化实时推送到进度事件总线
+
+每个会话的进度由快照文件 progress_<session_id>.json 和追加日志
+progress_<session_id>.journal.jsonl 组成：每次更新只向日志追加一行并fsync，
+日志累积到一定条数后压缩进快照。加载时以快照为基础按序号重放日志。
 """
 import json
 import os
+import threading
+import uuid
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 from enum import Enum
 
 from app.core.config import settings
+from app.utils.json_utils import dump_json, json_default, to_plain
+from app.utils.progress_events import progress_bus, session_topic
 
 
 class GenerationStage(str, Enum):
@@ -29,22 +37,140 @@ class GenerationStage(str, Enum):
 class ProgressManager:
     """进度管理器"""
     
+    JOURNAL_SUFFIX = ".journal.jsonl"
+    
     def __init__(self, session_id: str = None):
-        # 使用固定的session文件，方便断点续传
-        self.session_id = session_id or "current_session"
-        self.progress_file = Path(settings.NOVEL_OUTPUT_DIR) / f"progress_{self.session_id}.json"
+        # 默认生成唯一的会话ID，并发会话互不覆盖；传入已有ID时恢复该会话
+        self.session_id = session_id or self.new_session_id()
+        output_dir = Path(settings.NOVEL_OUTPUT_DIR)
+        self.progress_file = output_dir / f"progress_{self.session_id}.json"
+        self.journal_file = output_dir / f"progress_{self.session_id}{self.JOURNAL_SUFFIX}"
+        self.compact_every = settings.PROGRESS_JOURNAL_COMPACT_EVERY
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._journal_entries = 0
+        self._journal_damaged = False
         self.progress_data = self._load_progress()
+        if self._journal_damaged:
+            # 日志末尾有不完整的记录（写入时崩溃），立即压缩，避免后续追加接在残行之后
+            self.save_progress()
+    
+    @staticmethod
+    def new_session_id() -> str:
+        """生成唯一的会话ID"""
+        return f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    
+    @classmethod
+    def list_sessions(cls) -> List[str]:
+        """列出输出目录中存在进度记录的会话ID"""
+        output_dir = Path(settings.NOVEL_OUTPUT_DIR)
+        if not output_dir.exists():
+            return []
+        
+        session_ids = set()
+        for path in output_dir.glob("progress_*"):
+            name = path.name[len("progress_"):]
+            for suffix in (cls.JOURNAL_SUFFIX, ".json"):
+                if name.endswith(suffix):
+                    session_ids.add(name[:-len(suffix)])
+                    break
+        return sorted(session_ids)
+    
+    @classmethod
+    def session_exists(cls, session_id: str) -> bool:
+        """会话是否存在进度记录（快照或日志文件）"""
+        output_dir = Path(settings.NOVEL_OUTPUT_DIR)
+        return (output_dir / f"progress_{session_id}.json").exists() or \
+            (output_dir / f"progress_{session_id}{cls.JOURNAL_SUFFIX}").exists()
     
     def _load_progress(self) -> Dict[str, Any]:
-        """加载进度数据"""
+        """加载进度数据：读取快照后重放快照之后追加的日志"""
+        data = None
         if self.progress_file.exists():
             try:
                 with open(self.progress_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    data = json.load(f)
             except Exception as e:
                 print(f"加载进度文件失败: {e}")
-                return self._create_empty_progress()
-        return self._create_empty_progress()
+        if data is None:
+            data = self._create_empty_progress()
+        self._seq = data.get("journal_seq", 0)
+        
+        if self.journal_file.exists():
+            try:
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            entry = json.loads(line)
+                        except json.JSONDecodeError:
+                            print(f"⚠️ 忽略进度日志中不完整的记录: {self.journal_file}")
+                            self._journal_damaged = True
+                            break
+                        self._journal_entries += 1
+                        # 快照已包含的记录（压缩后截断日志前崩溃）按序号跳过
+                        if entry["seq"] <= self._seq:
+                            continue
+                        self._apply_entry(data, entry)
+                        self._seq = entry["seq"]
+            except Exception as e:
+                print(f"读取进度日志失败: {e}")
+        return data
+    
+    def _apply_entry(self, data: Dict[str, Any], entry: Dict[str, Any]):
+        """将一条日志记录应用到进度数据"""
+        target = data
+        for key in entry["path"][:-1]:
+            target = target.setdefault(key, {})
+        last_key = entry["path"][-1]
+        if entry["op"] == "append":
+            target.setdefault(last_key, []).append(entry["value"])
+        else:
+            target[last_key] = entry["value"]
+        data["last_update"] = entry["ts"]
+    
+    def _record(self, op: str, path: List[Any], value: Any):
+        """
+        记录一次更新：应用到内存并向日志追加一行（O(1)，不重写整个文件）
+        
+        Args:
+            op: set（赋值）或 append（追加到列表）
+            path: 字段路径，如 ["generated_content", "世界观已生成"]
+            value: 新值
+        """
+        with self._lock:
+            self._seq += 1
+            entry = {
+                "seq": self._seq,
+                "op": op,
+                "path": [getattr(key, "value", key) for key in path],
+                "value": to_plain(value),
+                "ts": datetime.now().isoformat()
+            }
+            self._apply_entry(self.progress_data, entry)
+            self._append_journal(dump_json(entry) + "\n")
+        
+        if self._journal_entries >= self.compact_every:
+            self.save_progress()
+    
+    def _append_journal(self, line: str):
+        """以追加模式写入一行并fsync，单次write保证记录不与其他写入交错"""
+        try:
+            self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.journal_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._journal_entries += 1
+        except Exception as e:
+            print(f"写入进度日志失败: {e}")
+    
+    def set_field(self, key: str, value: Any):
+        """设置进度数据中的顶层字段（如 core_concept）"""
+        self._record("set", [key], value)
     
     def _create_empty_progress(self) -> Dict[str, Any]:
         """创建空的进度数据"""
@@ -53,6 +179,8 @@ class ProgressManager:
             "core_concept": "",
             "current_stage": GenerationStage.INITIALIZING,
             "completed_stages": [],
+            "completed_nodes": {},
+            "node_artifacts": {},
             "generated_content": {},
             "files_created": {},
             "errors": [],
@@ -62,30 +190,87 @@ class ProgressManager:
         }
     
     def save_progress(self):
-        """保存进度"""
-        self.progress_data["last_update"] = datetime.now().isoformat()
-        try:
-            with open(self.progress_file, 'w', encoding='utf-8') as f:
-                json.dump(self.progress_data, f, ensure_ascii=False, indent=2)
-        except Exception as e:
-            print(f"保存进度失败: {e}")
+        """压缩进度：将当前状态原子写入快照并清空日志"""
+        with self._lock:
+            self.progress_data["journal_seq"] = self._seq
+            tmp_file = self.progress_file.with_suffix(".json.tmp")
+            try:
+                self.progress_file.parent.mkdir(parents=True, exist_ok=True)
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.progress_data, f, ensure_ascii=False, indent=2, default=json_default)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_file, self.progress_file)
+                # 快照已包含全部记录，截断日志
+                with open(self.journal_file, 'w', encoding='utf-8'):
+                    pass
+                self._journal_entries = 0
+                self._journal_damaged = False
+            except Exception as e:
+                print(f"保存进度失败: {e}")
     
     def update_stage(self, stage: GenerationStage, content: Dict[str, Any] = None):
         """更新当前阶段"""
         if stage not in self.progress_data["completed_stages"]:
-            self.progress_data["completed_stages"].append(stage)
+            self._record("append", ["completed_stages"], stage)
         
-        self.progress_data["current_stage"] = stage
+        self._record("set", ["current_stage"], stage)
         
         # 只记录阶段的基本信息，不记录具体内容
         if content:
             # 只记录文件名和数量等基本信息
             stage_info = self._extract_stage_info(stage, content)
-            self.progress_data["generated_content"][stage] = stage_info
+            self._record("set", ["generated_content", stage], stage_info)
         
-        self.save_progress()
+        self.publish_progress(
+            message=f"阶段完成: {stage.value}",
+            partial=self.progress_data["generated_content"].get(stage.value)
+        )
         print(f"✅ 阶段完成: {stage}")
     
+    def publish_progress(self, message: str = None, partial: Any = None, event: str = "progress"):
+        """
+        推送会话进度事件（主题 session:<session_id>）
+        
+        Args:
+            message: 进度说明
+            partial: 部分输出，如刚生成的角色名、章节标题
+            event: 事件类型，progress / completed / failed
+        """
+        stage = self.progress_data.get("current_stage")
+        progress_bus.publish(
+            session_topic(self.session_id),
+            event=event,
+            stage=getattr(stage, "value", stage),
+            percent=round(self.get_progress_percentage(), 1),
+            message=message,
+            partial=partial,
+            session_id=self.session_id
+        )
+    
+    def mark_node_completed(self, node: str, duration: float = None):
+        """记录依赖图中的阶段节点已完成"""
+        self._record("set", ["completed_nodes", node], {
+            "timestamp": datetime.now().isoformat(),
+            "duration": round(duration, 3) if duration is not None else None
+        })
+    
+    def set_node_artifact(self, node: str, digest: str):
+        """记录阶段节点完整输出在产物存储中的内容哈希"""
+        self._record("set", ["node_artifacts", node], digest)
+    
+    def get_node_artifact(self, node: str) -> Optional[str]:
+        """获取阶段节点输出的内容哈希"""
+        return self.progress_data.get("node_artifacts", {}).get(node)
+    
+    def get_completed_nodes(self) -> List[str]:
+        """获取已完成的阶段节点"""
+        return list(self.progress_data.get("completed_nodes", {}).keys())
+    
+    def is_node_completed(self, node: str) -> bool:
+        """检查阶段节点是否已完成"""
+        return node in self.progress_data.get("completed_nodes", {})
+    
     def _extract_stage_info(self, stage: GenerationStage, content: Dict[str, Any]) -> Dict[str, Any]:
         """提取阶段的基本信息，不保存完整内容"""
         stage_info = {
@@ -193,10 +378,7 @@ class ProgressManager:
     
     def add_file(self, file_type: str, file_path: str):
         """添加生成的文件"""
-        if file_type not in self.progress_data["files_created"]:
-            self.progress_data["files_created"][file_type] = []
-        self.progress_data["files_created"][file_type].append(file_path)
-        self.save_progress()
+        self._record("append", ["files_created", file_type], file_path)
     
     def add_error(self, error: str, stage: str = None):
         """添加错误信息"""
@@ -205,8 +387,8 @@ class ProgressManager:
             "stage": stage or self.progress_data["current_stage"],
             "timestamp": datetime.now().isoformat()
         }
-        self.progress_data["errors"].append(error_info)
-        self.save_progress()
+        self._record("append", ["errors"], error_info)
+        self.publish_progress(message=f"错误: {error}")
     
     def get_completed_stages(self) -> List[GenerationStage]:
         """获取已完成的阶段"""
@@ -219,7 +401,7 @@ class ProgressManager:
     def get_generated_content(self, stage: GenerationStage = None) -> Dict[str, Any]:
         """获取生成的内容"""
         if stage:
-            return self.progress_data["generated_content"].get(stage, {})
+            return self.progress_data["generated_content"].get(stage.value, {})
         return self.progress_data["generated_content"]
     
     def is_stage_completed(self, stage: GenerationStage) -> bool:
@@ -240,8 +422,10 @@ class ProgressManager:
         """获取恢复信息"""
         return {
             "session_id": self.session_id,
+            "core_concept": self.progress_data.get("core_concept", ""),
             "current_stage": self.get_current_stage(),
             "completed_stages": [stage.value for stage in self.get_completed_stages()],
+            "completed_nodes": self.get_completed_nodes(),
             "progress_percentage": self.get_progress_percentage(),
             "can_resume": self.can_resume(),
             "files_created": self.progress_data["files_created"],
@@ -249,13 +433,14 @@ class ProgressManager:
         }
     
     def cleanup(self):
-        """清理进度文件"""
-        if self.progress_file.exists():
-            try:
-                os.remove(self.progress_file)
-                print(f"✅ 进度文件已清理: {self.progress_file}")
-            except Exception as e:
-                print(f"清理进度文件失败: {e}")
+        """清理进度文件（快照和日志）"""
+        for path in (self.progress_file, self.journal_file):
+            if path.exists():
+                try:
+                    os.remove(path)
+                    print(f"✅ 进度文件已清理: {path}")
+                except Exception as e:
+                    print(f"清理进度文件失败: {e}")
     
     def get_next_stage(self) -> Optional[GenerationStage]:
         """获取下一个需要执行的阶段"""
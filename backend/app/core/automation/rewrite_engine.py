@@ -9,7 +9,11 @@ from app.core.config import settings
 from app.utils import llm_client
 from app.core.world.service import WorldService
 from app.core.character.service import CharacterService
-from app.core.plot.llm_generator import PlotLLMGenerator
+try:
+    from app.core.plot.llm_generator import PlotLLMGenerator
+except ImportError:
+    # 旧版剧情模块（app.core.plot）缺失时不支持重新生成剧情
+    PlotLLMGenerator = None
 from app.core.automation.decision_engine import RewriteStrategy, DecisionResult
 from app.utils.prompt_manager import prompt_manager
 
@@ -22,7 +26,7 @@ class AutoRewriteEngine:
         
         self.world_service = WorldService()
         self.character_service = CharacterService()
-        self.plot_generator = PlotLLMGenerator()
+        self.plot_generator = PlotLLMGenerator() if PlotLLMGenerator else None
     
     async def rewrite_content(self, content: Dict[str, Any], 
                             decision: DecisionResult) -> Dict[str, Any]:
@@ -297,6 +301,8 @@ class AutoRewriteEngine:
         
         if 'plot' in content:
             # 重新生成剧情
+            if self.plot_generator is None:
+                raise RuntimeError("plot_generator 不可用：缺少旧版剧情模块 app.core.plot")
             new_plot = await self.plot_generator.generate_plot_outline(
                 world_view=content['world_view'],
                 characters=content['characters'],
@@ -0,0 +1,165 @@
+"""
+阶段依赖图调度器
+
+生成流程声明为有向无环图：每个阶段声明其依赖的阶段，调度器在依赖全部完成后
+立即启动该阶段，互不依赖的阶段并发执行（LLM请求数量由全局限流器约束），
+整体耗时接近关键路径。阶段完成情况记录到 ProgressManager，供断点续传使用。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+@dataclass
+class StageNode:
+    """生成阶段节点"""
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]  # 接收已完成阶段的结果字典
+    depends_on: List[str] = field(default_factory=list)
+
+
+class StageScheduler:
+    """按依赖关系并发执行生成阶段"""
+    
+    def __init__(self, progress_manager=None, max_concurrency: Optional[int] = None):
+        """
+        Args:
+            progress_manager: 进度管理器，阶段完成时记录节点状态
+            max_concurrency: 同时执行的阶段数上限，None表示不限制
+        """
+        self.progress_manager = progress_manager
+        self.max_concurrency = max_concurrency
+        self.stages: Dict[str, StageNode] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+        self.skipped: List[str] = []
+        self.wall_time = 0.0
+    
+    def add_stage(self, name: str, run: Callable[[Dict[str, Any]], Awaitable[Any]],
+                  depends_on: Optional[List[str]] = None) -> "StageScheduler":
+        """添加阶段"""
+        if name in self.stages:
+            raise ValueError(f"阶段重复定义: {name}")
+        self.stages[name] = StageNode(name=name, run=run, depends_on=list(depends_on or []))
+        return self
+    
+    def validate(self):
+        """校验依赖存在且无环"""
+        for node in self.stages.values():
+            for dep in node.depends_on:
+                if dep not in self.stages:
+                    raise ValueError(f"阶段 {node.name} 依赖未定义的阶段: {dep}")
+        self.topological_order()
+    
+    def topological_order(self) -> List[str]:
+        """返回拓扑序，存在环时抛出ValueError"""
+        indegree = {name: len(node.depends_on) for name, node in self.stages.items()}
+        order = [name for name, degree in indegree.items() if degree == 0]
+        for name in order:
+            for other in self.stages.values():
+                if name in other.depends_on:
+                    indegree[other.name] -= 1
+                    if indegree[other.name] == 0:
+                        order.append(other.name)
+        if len(order) != len(self.stages):
+            cyclic = [name for name in self.stages if name not in order]
+            raise ValueError(f"阶段依赖存在环: {', '.join(cyclic)}")
+        return order
+    
+    async def run(self, initial_results: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        执行全部阶段
+        
+        Args:
+            initial_results: 已有的阶段结果（断点续传时传入），对应阶段不再执行
+        
+        Returns:
+            {阶段名: 结果} 字典
+        """
+        self.validate()
+        results: Dict[str, Any] = {}
+        for name, value in (initial_results or {}).items():
+            if name in self.stages:
+                results[name] = value
+                self.skipped.append(name)
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+        running: Dict[asyncio.Task, str] = {}
+        started_at = time.perf_counter()
+        
+        try:
+            while len(results) < len(self.stages):
+                for node in self.stages.values():
+                    if node.name in results or node.name in running.values():
+                        continue
+                    if all(dep in results for dep in node.depends_on):
+                        inputs = {dep: results[dep] for dep in node.depends_on}
+                        task = asyncio.create_task(self._run_stage(node, inputs, semaphore))
+                        running[task] = node.name
+                
+                if not running:
+                    raise RuntimeError("没有可执行的阶段，依赖关系无法满足")
+                
+                done, _ = await asyncio.wait(running.keys(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = running.pop(task)
+                    # 任一阶段失败则终止整个流程
+                    results[name] = task.result()
+                    if self.progress_manager is not None:
+                        self.progress_manager.mark_node_completed(name, self.timings[name]['duration'])
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            self.wall_time = time.perf_counter() - started_at
+        
+        return results
+    
+    async def _run_stage(self, node: StageNode, inputs: Dict[str, Any],
+                         semaphore: Optional[asyncio.Semaphore]) -> Any:
+        """执行单个阶段并记录耗时"""
+        if semaphore is not None:
+            async with semaphore:
+                return await self._timed_run(node, inputs)
+        return await self._timed_run(node, inputs)
+    
+    async def _timed_run(self, node: StageNode, inputs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        result = await node.run(inputs)
+        end = time.perf_counter()
+        self.timings[node.name] = {'start': start, 'end': end, 'duration': end - start}
+        return result
+    
+    def get_critical_path(self) -> List[str]:
+        """按实际耗时计算关键路径"""
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+        for name in self.topological_order():
+            node = self.stages[name]
+            duration = self.timings.get(name, {}).get('duration', 0.0)
+            best = max(node.depends_on, key=lambda dep: finish[dep], default=None)
+            finish[name] = (finish[best] if best else 0.0) + duration
+            previous[name] = best
+        
+        if not finish:
+            return []
+        path = []
+        current = max(finish, key=finish.get)
+        while current:
+            path.append(current)
+            current = previous[current]
+        return list(reversed(path))
+    
+    def get_report(self) -> Dict[str, Any]:
+        """调度报告：各阶段耗时、墙钟时间、关键路径耗时及串行耗时"""
+        critical_path = self.get_critical_path()
+        durations = {name: round(timing['duration'], 3) for name, timing in self.timings.items()}
+        return {
+            'stage_durations': durations,
+            'skipped_stages': list(self.skipped),
+            'wall_time': round(self.wall_time, 3),
+            'sequential_time': round(sum(durations.values()), 3),
+            'critical_path': critical_path,
+            'critical_path_time': round(sum(durations.get(name, 0.0) for name in critical_path), 3)
+        }
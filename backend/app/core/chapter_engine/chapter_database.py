@@ -9,6 +9,7 @@ from datetime import datetime
 
 from app.core.chapter_engine.chapter_models_simplified import ChapterOutline, Scene
 from app.core.config import settings
+from app.utils.entity_loader import invalidate_entity
 
 
 class ChapterOutlineDatabase:
@@ -55,6 +56,7 @@ class ChapterOutlineDatabase:
     
     def save_chapter_outline(self, chapter_outline: ChapterOutline) -> bool:
         """保存章节大纲到数据库"""
+        invalidate_entity("chapter_outlines", chapter_outline.id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -155,6 +157,24 @@ class ChapterOutlineDatabase:
             print(f"❌ 获取章节大纲失败: {e}")
             return None
     
+    def get_chapter_outlines_by_ids(self, chapter_ids: List[str]) -> Dict[str, ChapterOutline]:
+        """批量获取章节大纲，返回以ID为键的字典"""
+        if not chapter_ids:
+            return {}
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT * FROM chapter_outlines WHERE id = ANY(%s)
+                    """, (list(chapter_ids),))
+                    
+                    rows = cursor.fetchall()
+                    return {row['id']: self._row_to_chapter_outline(dict(row)) for row in rows}
+                    
+        except Exception as e:
+            print(f"❌ 批量获取章节大纲失败: {e}")
+            return {}
+    
     def get_all_chapter_outlines(self, limit: int = 100, offset: int = 0) -> List[ChapterOutline]:
         """获取所有章节大纲列表"""
         try:
@@ -304,6 +324,7 @@ class ChapterOutlineDatabase:
     
     def update_chapter_outline(self, chapter_id: str, chapter_outline: ChapterOutline) -> bool:
         """更新章节大纲"""
+        invalidate_entity("chapter_outlines", chapter_id)
         try:
             # 先删除现有记录，再插入新记录
             self.delete_chapter_outline(chapter_id)
@@ -314,6 +335,7 @@ class ChapterOutlineDatabase:
     
     def delete_chapter_outline(self, chapter_id: str) -> bool:
         """删除章节大纲（检查是否有关联的详细剧情）"""
+        invalidate_entity("chapter_outlines", chapter_id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
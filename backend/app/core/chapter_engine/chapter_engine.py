@@ -1,14 +1,19 @@
 """
 章节大纲生成引擎 - 简化版（基于事件驱动）
 """
+import asyncio
 import json
 import uuid
 import time
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from app.core.config import settings
 from app.utils.llm_client import get_llm_client
 from app.utils.prompt_manager import PromptManager
+from app.utils.context_retrieval import select_chapter_outline_events
+from app.utils.story_memory import story_memory
+from .chapter_windows import plan_windows, assign_events, build_handoff
 from .chapter_models_simplified import (
     ChapterOutline, ChapterOutlineRequest, ChapterOutlineResponse,
     Scene, ChapterStatus, PlotFunction
@@ -68,8 +73,13 @@ class ChapterOutlineEngine:
                                                event_integration_mode: str = "auto",
                                                chapter_count: int = None, start_chapter: int = 1,
                                                act_belonging: str = None, additional_requirements: str = "",
-                                               generate_event_mappings: bool = True) -> ChapterOutlineResponse:
-        """生成增强的章节大纲（基于事件驱动）"""
+                                               generate_event_mappings: bool = True, windowed: Optional[bool] = None,
+                                               window_size: Optional[int] = None) -> ChapterOutlineResponse:
+        """
+        生成增强的章节大纲（基于事件驱动）
+        
+        windowed为None时，章节数超过窗口大小自动切换为分窗口并发生成。
+        """
         self._ensure_initialized()
         
         start_time = time.time()
@@ -124,68 +134,23 @@ class ChapterOutlineEngine:
                 else:
                     characters_list.append(char)
             
-            # 3. 构建prompt（事件驱动版，移除世界观和角色信息）
-            prompt = get_chapter_outline_prompt(
-                plot_outline=plot_outline_dict,
-                events=events_list,
-                chapter_count=chapter_count,
-                start_chapter=start_chapter,
-                act_belonging=act_belonging,
-                additional_requirements=additional_requirements
-            )
+            # 已写出详细剧情的章节的分层摘要，新章节接续其后
+            story_so_far = await story_memory.story_so_far(plot_outline_dict.get('id'))
             
-            print(f"📝 Prompt长度: {len(prompt)} 字符")
-            print(f"📝 完整Prompt内容:")
-            print("=" * 100)
-            print(prompt)
-            print("=" * 100)
-            
-            # 4. 调用LLM生成章节大纲
-            print("🤖 调用LLM生成章节大纲...")
-            content = await self.llm_client.generate_text(
-                prompt=prompt,
-                temperature=0.8,
-                max_tokens=50000
-            )
-            
-            print(f"📄 LLM响应长度: {len(content)} 字符")
-            
-            # 5. 解析JSON响应
-            try:
-                # 尝试直接解析JSON
-                batch_data = json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"❌ JSON解析失败: {e}")
-                print(f"📄 LLM响应内容: {content[:500]}...")
-                
-                # 尝试修复常见的JSON问题
-                fixed_content = content
-                
-                # 修复未终止的字符串
-                import re
-                # 查找未终止的字符串并截断
-                fixed_content = re.sub(r'"[^"]*$', '"', fixed_content, flags=re.MULTILINE)
-                
-                # 尝试提取JSON部分
-                json_match = re.search(r'\{.*\}', fixed_content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    try:
-                        batch_data = json.loads(json_str)
-                        print("✅ 成功从响应中提取JSON")
-                    except json.JSONDecodeError as e2:
-                        print(f"❌ 提取的JSON仍然无效: {e2}")
-                        print(f"📄 尝试修复的JSON: {json_str[:200]}...")
-                        
-                        # 最后尝试：手动构建基本的章节结构
-                        print("🔄 尝试手动构建章节结构...")
-                        batch_data = self._build_fallback_chapters(chapter_count, start_chapter, act_belonging)
-                else:
-                    print("🔄 未找到JSON结构，使用备用方案...")
-                    batch_data = self._build_fallback_chapters(chapter_count, start_chapter, act_belonging)
-            
-            # 6. 解析章节数据
-            chapters_data = batch_data.get("chapters", [])
+            # 3-6. 生成章节数据（章节较多时分窗口并发生成）
+            if windowed is None:
+                windowed = chapter_count > (window_size or settings.CHAPTER_OUTLINE_WINDOW_SIZE)
+            failed_windows = []
+            if windowed:
+                chapters_data, failed_windows = await self._generate_windowed_chapters_data(
+                    plot_outline_dict, events_list, chapter_count, start_chapter,
+                    act_belonging, additional_requirements, window_size, story_so_far
+                )
+            else:
+                chapters_data = await self._generate_chapters_data(
+                    plot_outline_dict, events_list, chapter_count, start_chapter,
+                    act_belonging, additional_requirements, story_so_far=story_so_far
+                )
             if len(chapters_data) == 0:
                 raise ValueError("LLM未生成任何章节大纲")
             
@@ -243,10 +208,15 @@ class ChapterOutlineEngine:
             
             print(f"✅ 成功生成 {len(chapters)} 个章节大纲，耗时 {generation_time:.2f} 秒")
             
+            message = f"成功生成{len(chapters)}个章节大纲"
+            if failed_windows:
+                failed_ranges = "、".join(f"第{w['start_chapter']}-{w['end_chapter']}章" for w in failed_windows)
+                message += f"（{failed_ranges}生成失败，已使用占位章节，可重新生成）"
+            
             return ChapterOutlineResponse(
                 success=True,
                 chapters=chapters,
-                message=f"成功生成{len(chapters)}个章节大纲",
+                message=message,
                 generation_time=generation_time
             )
             
@@ -261,6 +231,141 @@ class ChapterOutlineEngine:
                 generation_time=generation_time
             )
     
+    async def _generate_chapters_data(self, plot_outline_dict: dict, events_list: List[Dict[str, Any]],
+                                      chapter_count: int, start_chapter: int, act_belonging: str = None,
+                                      additional_requirements: str = "", continuity: str = "",
+                                      max_tokens: int = 50000, story_so_far: str = "") -> List[Dict[str, Any]]:
+        """单次调用LLM生成一段章节的原始数据（JSON解析失败时使用备用章节结构）"""
+        # 构建prompt（事件驱动版，移除世界观和角色信息），事件较多时按与当前剧情段的相关度选取
+        prompt_events = select_chapter_outline_events(
+            plot_outline_dict, events_list, act_belonging, f"{additional_requirements} {continuity}"
+        )
+        prompt = get_chapter_outline_prompt(
+            plot_outline=plot_outline_dict,
+            events=prompt_events,
+            chapter_count=chapter_count,
+            start_chapter=start_chapter,
+            act_belonging=act_belonging,
+            additional_requirements=additional_requirements,
+            continuity=continuity,
+            story_so_far=story_so_far
+        )
+        
+        print(f"📝 Prompt长度: {len(prompt)} 字符")
+        if not continuity:
+            print(f"📝 完整Prompt内容:")
+            print("=" * 100)
+            print(prompt)
+            print("=" * 100)
+        
+        # 调用LLM生成章节大纲
+        print(f"🤖 调用LLM生成第{start_chapter}-{start_chapter + chapter_count - 1}章大纲...")
+        content = await self.llm_client.generate_text(
+            prompt=prompt,
+            temperature=0.8,
+            max_tokens=max_tokens
+        )
+        
+        print(f"📄 LLM响应长度: {len(content)} 字符")
+        
+        # 解析JSON响应
+        try:
+            # 尝试直接解析JSON
+            batch_data = json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON解析失败: {e}")
+            print(f"📄 LLM响应内容: {content[:500]}...")
+            
+            # 尝试修复常见的JSON问题
+            fixed_content = content
+            
+            # 修复未终止的字符串
+            import re
+            # 查找未终止的字符串并截断
+            fixed_content = re.sub(r'"[^"]*$', '"', fixed_content, flags=re.MULTILINE)
+            
+            # 尝试提取JSON部分
+            json_match = re.search(r'\{.*\}', fixed_content, re.DOTALL)
+            if json_match:
+                json_str = json_match.group()
+                try:
+                    batch_data = json.loads(json_str)
+                    print("✅ 成功从响应中提取JSON")
+                except json.JSONDecodeError as e2:
+                    print(f"❌ 提取的JSON仍然无效: {e2}")
+                    print(f"📄 尝试修复的JSON: {json_str[:200]}...")
+                    
+                    # 最后尝试：手动构建基本的章节结构
+                    print("🔄 尝试手动构建章节结构...")
+                    batch_data = self._build_fallback_chapters(chapter_count, start_chapter, act_belonging)
+            else:
+                print("🔄 未找到JSON结构，使用备用方案...")
+                batch_data = self._build_fallback_chapters(chapter_count, start_chapter, act_belonging)
+        
+        return batch_data.get("chapters", [])
+    
+    async def _generate_windowed_chapters_data(self, plot_outline_dict: dict, events_list: List[Dict[str, Any]],
+                                               chapter_count: int, start_chapter: int, act_belonging: str = None,
+                                               additional_requirements: str = "",
+                                               window_size: Optional[int] = None,
+                                               story_so_far: str = "") -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        按幕次或固定窗口切分章节范围，各窗口并发生成后按顺序合并
+        
+        单个窗口失败不影响其他窗口，失败窗口以占位章节补齐，保证章节编号连续；全部窗口失败时抛出异常。
+        
+        Returns:
+            (章节数据列表, 失败窗口列表)
+        """
+        window_size = window_size or settings.CHAPTER_OUTLINE_WINDOW_SIZE
+        windows = plan_windows(plot_outline_dict, chapter_count, start_chapter, window_size, act_belonging)
+        assign_events(windows, events_list)
+        print(f"🪟 分窗口生成 {chapter_count} 个章节：共 {len(windows)} 个窗口，每窗口最多 {window_size} 章")
+        
+        async def generate_window(window):
+            chapters_data = await self._generate_chapters_data(
+                plot_outline_dict,
+                window.events,
+                window.chapter_count,
+                window.start_chapter,
+                window.act_belonging,
+                additional_requirements,
+                continuity=build_handoff(windows, window.index),
+                max_tokens=settings.CHAPTER_OUTLINE_WINDOW_MAX_TOKENS,
+                story_so_far=story_so_far
+            )
+            # 模型多生成的章节截断，少生成的不补齐
+            chapters_data = chapters_data[:window.chapter_count]
+            if window.act_belonging:
+                for chapter_data in chapters_data:
+                    chapter_data["act_belonging"] = window.act_belonging
+            print(f"  ✅ 窗口{window.index + 1}/{len(windows)}（第{window.start_chapter}-{window.end_chapter}章）"
+                  f"生成 {len(chapters_data)} 章")
+            return chapters_data
+        
+        results = await asyncio.gather(*(generate_window(window) for window in windows), return_exceptions=True)
+        
+        failed_windows = []
+        for window, result in zip(windows, results):
+            if isinstance(result, BaseException):
+                print(f"  ❌ 窗口{window.index + 1}/{len(windows)}（第{window.start_chapter}-{window.end_chapter}章）生成失败: {result}")
+                failed_windows.append({
+                    "index": window.index,
+                    "start_chapter": window.start_chapter,
+                    "end_chapter": window.end_chapter,
+                    "error": str(result)
+                })
+        if len(failed_windows) == len(windows):
+            raise next(result for result in results if isinstance(result, BaseException))
+        
+        results = [
+            self._build_fallback_chapters(window.chapter_count, window.start_chapter, window.act_belonging)["chapters"]
+            if isinstance(result, BaseException) else result
+            for window, result in zip(windows, results)
+        ]
+        # 按窗口顺序合并，章节编号在转换时统一重新编排
+        return [chapter_data for chapters_data in results for chapter_data in chapters_data], failed_windows
+    
     def _validate_core_event(self, core_event_name: str, events_list: List[Dict[str, Any]]) -> str:
         """验证核心事件名称，返回事件名称而不是ID"""
         if not core_event_name or not events_list:
@@ -0,0 +1,169 @@
+"""
+章节大纲分窗口生成
+
+长篇小说按幕次或固定窗口切分章节范围，各窗口并发生成；窗口之间通过精简的
+衔接信息（上一窗口概要、未收束线索、核心事件）保持连贯，避免单次生成超出输出token上限。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+# 衔接信息中事件描述、线索的截断长度和数量
+HANDOFF_DESCRIPTION_LENGTH = 60
+HANDOFF_MAX_THREADS = 6
+
+
+@dataclass
+class ChapterWindow:
+    """章节窗口"""
+    index: int
+    start_chapter: int
+    chapter_count: int
+    act_belonging: Optional[str] = None
+    act_info: Dict[str, Any] = field(default_factory=dict)
+    # 窗口在整个章节范围内的位置比例 [start_ratio, end_ratio)
+    start_ratio: float = 0.0
+    end_ratio: float = 1.0
+    events: List[Dict[str, Any]] = field(default_factory=list)
+    
+    @property
+    def end_chapter(self) -> int:
+        return self.start_chapter + self.chapter_count - 1
+
+
+def _split_range(start: int, count: int, window_size: int) -> List[tuple]:
+    """将章节范围切分为不超过window_size的若干段，各段章节数尽量均匀"""
+    if count <= 0:
+        return []
+    parts = -(-count // window_size)
+    base, extra = divmod(count, parts)
+    ranges = []
+    for i in range(parts):
+        size = base + (1 if i < extra else 0)
+        ranges.append((start, size))
+        start += size
+    return ranges
+
+
+def plan_windows(plot_outline: Dict[str, Any], chapter_count: int, start_chapter: int,
+                 window_size: int, act_belonging: Optional[str] = None) -> List[ChapterWindow]:
+    """
+    规划章节窗口
+    
+    未指定幕次且剧情大纲有幕次结构时按幕次均分章节，每幕再按window_size切分；
+    否则直接按固定窗口切分。
+    """
+    acts = [] if act_belonging else list(plot_outline.get('acts') or [])
+    if len(acts) > chapter_count:
+        acts = []
+    
+    segments = []  # (起始章节, 章节数, 幕次名, 幕次信息)
+    if acts:
+        base, extra = divmod(chapter_count, len(acts))
+        act_start = start_chapter
+        for i, act in enumerate(acts):
+            act = act if isinstance(act, dict) else getattr(act, '__dict__', {})
+            act_count = base + (1 if i < extra else 0)
+            act_name = act.get('act_name') or f"第{act.get('act_number', i + 1)}幕"
+            for seg_start, seg_count in _split_range(act_start, act_count, window_size):
+                segments.append((seg_start, seg_count, act_name, act))
+            act_start += act_count
+    else:
+        for seg_start, seg_count in _split_range(start_chapter, chapter_count, window_size):
+            segments.append((seg_start, seg_count, act_belonging, {}))
+    
+    windows = []
+    for index, (seg_start, seg_count, act_name, act) in enumerate(segments):
+        windows.append(ChapterWindow(
+            index=index,
+            start_chapter=seg_start,
+            chapter_count=seg_count,
+            act_belonging=act_name,
+            act_info=act,
+            start_ratio=(seg_start - start_chapter) / chapter_count,
+            end_ratio=(seg_start - start_chapter + seg_count) / chapter_count
+        ))
+    return windows
+
+
+def assign_events(windows: List[ChapterWindow], events: List[Dict[str, Any]]):
+    """
+    按故事位置把事件分配到窗口
+    
+    事件有story_position时按该比例定位，否则按事件顺序均匀分布；
+    事件元数据标注了幕次时只在该幕次的窗口中选择。
+    """
+    if not windows:
+        return
+    total = len(events)
+    for i, event in enumerate(events):
+        position = event.get('story_position')
+        if position is None:
+            position = (i + 0.5) / total
+        position = min(max(float(position), 0.0), 0.999999)
+        
+        candidates = windows
+        event_act = (event.get('metadata') or {}).get('act_belonging')
+        if event_act:
+            candidates = [window for window in windows if window.act_belonging == event_act] or windows
+        
+        target = next((window for window in candidates if window.start_ratio <= position < window.end_ratio), None)
+        if target is None:
+            target = min(candidates, key=lambda window: min(abs(window.start_ratio - position),
+                                                           abs(window.end_ratio - position)))
+        target.events.append(event)
+
+
+def _brief(text: Any, length: int = HANDOFF_DESCRIPTION_LENGTH) -> str:
+    text = str(text or '').replace('\n', ' ').strip()
+    return text if len(text) <= length else text[:length] + "..."
+
+
+def build_handoff(windows: List[ChapterWindow], index: int) -> str:
+    """
+    生成窗口衔接信息：上一窗口概要、此前未收束的线索、本窗口核心事件及下一窗口开端
+    
+    各窗口并发生成，衔接信息来自规划（事件分配和幕次结构）而非其他窗口的生成结果。
+    """
+    window = windows[index]
+    lines = [f"### 分批生成衔接（第{index + 1}/{len(windows)}批，第{window.start_chapter}-{window.end_chapter}章）",
+             "其他批次的章节由其他生成任务负责，本批只生成上述章节，不要重复其他批次的核心事件。"]
+    
+    if index > 0:
+        previous = windows[index - 1]
+        if previous.events:
+            summary = "；".join(f"{event.get('title', '无标题')}（{_brief(event.get('description'))}）"
+                               for event in previous.events[-3:])
+            lines.append(f"- 前情提要（第{previous.start_chapter}-{previous.end_chapter}章）：{summary}")
+        else:
+            lines.append(f"- 前情提要：第{previous.start_chapter}-{previous.end_chapter}章已完成前序剧情")
+        if previous.act_belonging != window.act_belonging and previous.act_info.get('stage_result'):
+            lines.append(f"- 上一幕阶段结果：{_brief(previous.act_info['stage_result'], 120)}")
+    else:
+        lines.append("- 本批为故事开端，需要交代背景并引出主线")
+    
+    threads = []
+    for earlier in windows[:index]:
+        for event in earlier.events:
+            for element in event.get('foreshadowing_elements') or []:
+                if element and element not in threads:
+                    threads.append(element)
+    if threads:
+        lines.append(f"- 未收束线索（可在本批推进或回收）：{'；'.join(_brief(t, 40) for t in threads[-HANDOFF_MAX_THREADS:])}")
+    
+    if window.act_info.get('core_mission'):
+        lines.append(f"- 本幕核心任务：{_brief(window.act_info['core_mission'], 120)}")
+    if window.events:
+        lines.append(f"- 本批核心事件：{'、'.join(event.get('title', '无标题') for event in window.events)}")
+    
+    if index + 1 < len(windows):
+        following = windows[index + 1]
+        if following.events:
+            lines.append(f"- 后续衔接：第{following.start_chapter}章将从「{following.events[0].get('title', '无标题')}」展开，"
+                         f"本批结尾需为其做铺垫，但不要提前展开")
+        else:
+            lines.append(f"- 后续衔接：第{following.start_chapter}章起由下一批继续，本批结尾保留悬念")
+    else:
+        lines.append("- 本批为最后一批，需要收束主要线索")
+    
+    return "\n".join(lines)
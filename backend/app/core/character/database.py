@@ -6,6 +6,7 @@ from psycopg2.extras import RealDictCursor
 from typing import Dict, List, Any, Optional
 import json
 import logging
+from app.utils.entity_loader import invalidate_entity
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +27,7 @@ class CharacterDatabase:
     
     def insert_character(self, character_data: Dict[str, Any], created_by: str = "system") -> str:
         """插入角色数据（简化版）"""
+        invalidate_entity("characters_by_worldview", character_data.get('worldview_id'))
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -114,6 +116,36 @@ class CharacterDatabase:
             logger.error(f"获取角色列表失败: {e}")
             return []
     
+    def get_characters_by_worldview_ids(self, worldview_ids: List[str], limit: int = 50) -> Dict[str, List[Dict[str, Any]]]:
+        """批量获取多个世界观下的角色列表（每个世界观最多limit个），返回以世界观ID为键的字典"""
+        if not worldview_ids:
+            return {}
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT * FROM (
+                            SELECT c.*, ROW_NUMBER() OVER (
+                                PARTITION BY c.worldview_id ORDER BY c.created_at DESC
+                            ) AS _row_number
+                            FROM characters c
+                            WHERE c.worldview_id = ANY(%s) AND c.status = 'active'
+                        ) ranked
+                        WHERE ranked._row_number <= %s
+                        ORDER BY ranked.worldview_id, ranked._row_number
+                    """, (list(worldview_ids), limit))
+                    
+                    grouped: Dict[str, List[Dict[str, Any]]] = {wid: [] for wid in worldview_ids}
+                    for row in cursor.fetchall():
+                        character = dict(row)
+                        character.pop('_row_number', None)
+                        grouped.setdefault(character['worldview_id'], []).append(character)
+                    return grouped
+                    
+        except Exception as e:
+            logger.error(f"批量获取角色列表失败: {e}")
+            return {}
+    
     def search_characters(self, keyword: str, worldview_id: str = None, 
                          role_type: str = None, limit: int = 50) -> List[Dict[str, Any]]:
         """搜索角色"""
@@ -156,6 +188,7 @@ class CharacterDatabase:
     
     def update_character(self, character_id: str, updates: Dict[str, Any]) -> bool:
         """更新角色信息"""
+        invalidate_entity("characters_by_worldview")
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -204,6 +237,7 @@ class CharacterDatabase:
     
     def delete_character(self, character_id: str) -> bool:
         """删除角色（软删除）"""
+        invalidate_entity("characters_by_worldview")
         try:
             logger.info(f"尝试删除角色ID: {character_id}")
             with self.get_connection() as conn:
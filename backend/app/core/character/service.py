@@ -2,6 +2,7 @@
 角色管理服务层
 """
 import json
+import re
 import time
 import uuid
 import logging
@@ -124,6 +125,103 @@ class CharacterService:
             logger.error(f"创建角色失败: {e}")
             raise
     
+    async def create_characters_concurrently(self, world_view_id: str,
+                                             requirement_sets: List[List[str]],
+                                             role_hints: Optional[List[str]] = None,
+                                             max_concurrency: int = 3,
+                                             max_dedupe_rounds: int = 2) -> List[Character]:
+        """
+        并发创建多个角色，并对重名和角色定位冲突进行去重
+        
+        Args:
+            world_view_id: 世界观ID
+            requirement_sets: 每个角色的生成要求
+            role_hints: 每个角色期望的定位（如"主角"、"反派"），用于检测定位冲突
+            max_concurrency: 同时进行的生成数量
+            max_dedupe_rounds: 冲突角色重新生成的最大轮数
+        
+        Returns:
+            与 requirement_sets 顺序一致的角色列表
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        
+        async def generate(index: int, extra_requirements: List[str]) -> Character:
+            async with semaphore:
+                return await self.create_character(
+                    world_view_id=world_view_id,
+                    character_requirements=list(requirement_sets[index]) + extra_requirements
+                )
+        
+        characters = list(await asyncio.gather(
+            *(generate(i, []) for i in range(len(requirement_sets)))
+        ))
+        
+        for round_index in range(max_dedupe_rounds):
+            collisions = self._find_character_collisions(characters, role_hints)
+            if not collisions:
+                break
+            logger.info(f"第{round_index + 1}轮去重: 重新生成{len(collisions)}个冲突角色")
+            
+            taken_names = [c.name for i, c in enumerate(characters) if i not in collisions]
+            regenerated = await asyncio.gather(*(
+                generate(i, self._collision_requirements(collisions[i], taken_names))
+                for i in collisions
+            ), return_exceptions=True)
+            
+            for index, new_character in zip(collisions, regenerated):
+                if isinstance(new_character, Exception):
+                    logger.error(f"重新生成冲突角色失败，保留原角色: {new_character}")
+                    continue
+                await self.delete_character(characters[index].id)
+                characters[index] = new_character
+        else:
+            remaining = self._find_character_collisions(characters, role_hints)
+            if remaining:
+                logger.warning(f"去重后仍有{len(remaining)}个冲突角色: {list(remaining.values())}")
+        
+        return characters
+    
+    @staticmethod
+    def _normalize_character_name(name: str) -> str:
+        """规范化角色名，用于重名比较"""
+        return re.sub(r"[\s·・•.\-_]", "", name or "").lower()
+    
+    def _find_character_collisions(self, characters: List[Character],
+                                   role_hints: Optional[List[str]] = None) -> Dict[int, str]:
+        """
+        查找冲突角色（保留先出现的角色）
+        
+        Returns:
+            {角色下标: 冲突原因}，原因为 "name" 或 "role"
+        """
+        collisions: Dict[int, str] = {}
+        seen_names = set()
+        protagonist_seen = False
+        
+        for index, character in enumerate(characters):
+            name_key = self._normalize_character_name(character.name)
+            if name_key in seen_names:
+                collisions[index] = "name"
+                continue
+            seen_names.add(name_key)
+            
+            # 只有期望为主角的角色可以是主角，且只能有一个
+            is_protagonist = character.role_type == CharacterRoleType.PROTAGONIST
+            expected = role_hints[index] if role_hints and index < len(role_hints) else None
+            if is_protagonist and (protagonist_seen or (expected and expected != CharacterRoleType.PROTAGONIST.value)):
+                collisions[index] = "role"
+            protagonist_seen = protagonist_seen or is_protagonist
+        
+        return collisions
+    
+    @staticmethod
+    def _collision_requirements(reason: str, taken_names: List[str]) -> List[str]:
+        """为冲突角色追加的生成要求"""
+        requirements = [f"不要使用以下已存在的角色名: {'、'.join(taken_names)}"] if taken_names else []
+        if reason == "role":
+            requirements.append("该角色不是主角，故事中已经有主角")
+        return requirements
+    
     async def create_character_from_template(self, world_view_id: str, 
                                            template_id: str, 
                                            customizations: Optional[Dict[str, Any]] = None) -> Character:
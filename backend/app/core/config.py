@@ -44,6 +44,7 @@ class Settings(BaseSettings):
     
     # LLM 提供商选择
     LLM_PROVIDER: str = "alibaba"  # 可选: "azure", "alibaba"
+    LLM_MAX_CONCURRENCY: int = 4  # 同时进行的LLM请求上限（所有事件循环共享）
     
     # 兼容性配置 - 从现有环境变量映射
     OPENAI_API_KEY: Optional[str] = None
@@ -53,6 +54,13 @@ class Settings(BaseSettings):
     # 文件输出配置
     NOVEL_OUTPUT_DIR: str = "novel"
     OUTPUT_FORMAT: str = "markdown"
+    AUTO_BATCH_CONCURRENCY: int = 2  # 批量自动生成时同时进行的小说数量
+    CHAPTER_OUTLINE_WINDOW_SIZE: int = 10  # 章节大纲分窗口生成时每个窗口的章节数，章节数超过该值自动分窗口
+    CHAPTER_OUTLINE_WINDOW_MAX_TOKENS: int = 16000  # 每个章节窗口的输出token上限
+    STAGE_CACHE_ENABLED: bool = True  # 输入未变化的生成阶段直接复用上次输出
+    STAGE_CACHE_DIR: str = "stage_cache"  # 阶段缓存目录
+    ARTIFACT_STORE_DIR: str = "artifacts"  # 内容寻址的阶段产物存储目录（断点续传时还原完整输出）
+    STORY_MEMORY_DIR: str = "story_memory"  # 分层摘要记忆目录（每个剧情大纲一个文件）
     
     # 本地LLM配置
     LOCAL_LLM_ENABLED: bool = False
@@ -68,6 +76,42 @@ class Settings(BaseSettings):
         "innovation": 0.1,
         "user_preference": 0.05
     }
+    OPTIMIZATION_TOKEN_BUDGET: int = 200000  # 单本小说自动优化阶段的token预算，0表示不限制
+    OPTIMIZATION_MIN_GAIN_PER_1K_TOKENS: float = 0.02  # 每千token预期加权分数提升低于该值时停止优化
+    SCORING_MODE: str = "parallel"  # 评分模式: sequential（逐项）, parallel（并发）, fused（单次合并调用）
+    BEST_OF_N_TARGET_SCORE: float = 8.5  # best-of-N候选达到该分数（0-10）即取消其余候选，0表示不提前截断
+    BEST_OF_N_TOKEN_BUDGET: int = 150000  # 单次best-of-N生成+评分的token上限，0表示不限制
+    EVENT_SCORING_CONCURRENCY: int = 4  # 批量评分剧情事件时同时评分的事件数
+    EVENT_SHARD_SIZE: int = 8  # 增强事件分片生成时每个分片的事件数，事件总数超过该值自动分片
+    EVENT_SHARD_MAX_RETRIES: int = 2  # 单个事件分片失败后的重试次数
+    CORRECTION_MODE: str = "patch"  # 详细剧情修正模式: patch（局部补丁，失败时回退全文）, full（全文重写）
+    CORRECTION_PATCH_MAX_TOKENS: int = 4000  # 补丁模式的输出token上限
+    LOGIC_CHECK_CHUNK_THRESHOLD: int = 6000  # 逻辑检查内容超过该字数时自动分块并发检查
+    LOGIC_CHECK_CHUNK_CHARS: int = 3000  # 逻辑检查每块的目标字数
+    LOGIC_CHECK_CHUNK_OVERLAP: int = 1  # 相邻块重叠的段落数
+    LOGIC_CHECK_CHUNK_MAX_RETRIES: int = 2  # 单块检查失败后的重试次数
+    LOGIC_CHECK_CHUNK_MAX_TOKENS: int = 8000  # 每块检查的输出token上限
+    LOGIC_RECHECK_WINDOW: int = 1  # 增量逻辑复查时变化段落前后一并复查的段落数
+    LOGIC_RECHECK_MAX_CHANGED_RATIO: float = 0.5  # 需复查段落占比超过该值时执行完整逻辑检查
+    LOGIC_PRECHECK_ENABLED: bool = True  # 逻辑检查前执行本地规则预检（境界突破、法宝品级、灵根相性），结果作为LLM提示
+    LOGIC_PRECHECK_TRIVIAL_EDIT_CHARS: int = 120  # 增量复查时变化段落总字数不超过该值则跳过LLM，只用规则预检，0表示不跳过
+    DYNAMIC_PARSER_FUZZY_ENABLED: bool = True  # 枚举解析关键词未命中时先做本地模糊解析（归一化、同义词、相似度），仍未命中才调用LLM
+    DYNAMIC_PARSER_FUZZY_THRESHOLD: float = 0.65  # 相似度匹配的置信度阈值（0-1），低于该值交给LLM解析
+    CONTEXT_RETRIEVAL_ENABLED: bool = True  # 构建prompt时按与当前章节/事件的相关度（BM25）选取角色、地点和事件，关闭时按列表顺序截取
+    CONTEXT_RETRIEVAL_CHARACTERS: int = 8  # 详细剧情prompt中的角色数
+    CONTEXT_RETRIEVAL_LOCATIONS: int = 6  # 详细剧情prompt中的地点数
+    CONTEXT_RETRIEVAL_EVENTS: int = 10  # 详细剧情prompt中的事件数
+    CONTEXT_RETRIEVAL_CHAPTERS: int = 3  # 详细剧情prompt中按相关度选取的较早章节摘要数（最近几章已在前情提要中）
+    CONTEXT_RETRIEVAL_SCORING_CHARACTERS: int = 5  # 事件评分prompt中的相关角色数
+    CONTEXT_RETRIEVAL_CHAPTER_EVENTS: int = 20  # 章节大纲prompt中的事件数（每次生成或每个窗口）
+    CONTEXT_INDEX_MAX_SCOPES: int = 64  # 内存中保留检索索引的世界观/剧情大纲数量
+    STORY_MEMORY_ENABLED: bool = True  # 保存详细剧情时更新分层摘要（章节→幕次→全书），生成时以前情提要代替完整历史
+    STORY_MEMORY_SUMMARIZER: str = "llm"  # 摘要方式：llm（短摘要调用，按输入缓存）或 extract（本地抽取句子，不调用LLM）
+    STORY_MEMORY_CHAPTER_CHARS: int = 200  # 章节摘要字数上限
+    STORY_MEMORY_ACT_CHARS: int = 400  # 幕次滚动摘要字数上限
+    STORY_MEMORY_BOOK_CHARS: int = 600  # 全书滚动摘要字数上限
+    STORY_MEMORY_RECENT_CHAPTERS: int = 3  # 前情提要中逐章列出的最近章节数
+    STORY_MEMORY_MAX_TOKENS: int = 1000  # 单次摘要调用的输出token上限
     
     # 缓存配置
     CACHE_TTL: int = 3600  # 1小时
@@ -76,6 +120,24 @@ class Settings(BaseSettings):
     # 任务队列配置
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/2"
+    TASK_QUEUE_WORKERS: int = 4  # 异步任务队列的并发worker数量
+    TASK_QUEUE_TYPE_LIMITS: dict = {}  # 按任务类型的并发上限，如 {"detailed_plot": 2}
+    TASK_QUEUE_BACKEND: str = "memory"  # 可选: "memory", "postgres"（持久化、可多节点部署）
+    TASK_QUEUE_MAX_ATTEMPTS: int = 3  # 持久化队列的最大执行次数
+    TASK_QUEUE_LEASE_SECONDS: int = 120  # 任务租约时长，超时未心跳视为节点崩溃
+    TASK_QUEUE_HEARTBEAT_SECONDS: int = 30  # 心跳间隔
+    TASK_QUEUE_POLL_INTERVAL: float = 2.0  # 空闲worker轮询数据库的间隔
+    TASK_QUEUE_RETRY_DELAY_SECONDS: int = 30  # 失败重试的基础延迟（按执行次数递增）
+    TASK_QUEUE_RESULT_TTL_SECONDS: int = 3600  # 内存队列中已结束任务的保留时长
+    TASK_QUEUE_MAX_FINISHED_TASKS: int = 500  # 内存队列中最多保留的已结束任务数
+    TASK_QUEUE_RESULT_SPILL_BYTES: int = 64 * 1024  # 结果超过该大小时写入磁盘，内存只保留引用
+    TASK_QUEUE_SPILL_DIR: str = "task_results"  # 任务结果落盘目录
+    
+    # 进度推送配置
+    PROGRESS_STREAM_HEARTBEAT_SECONDS: int = 15  # SSE保活注释的发送间隔
+    PROGRESS_SUBSCRIBER_QUEUE_SIZE: int = 256  # 每个订阅者的缓冲事件数，溢出时丢弃最旧事件
+    PROGRESS_RETAINED_TOPICS: int = 1000  # 保留最近事件的主题数量（供晚到的订阅者获取当前状态）
+    PROGRESS_JOURNAL_COMPACT_EVERY: int = 200  # 进度日志累积多少条记录后压缩为快照
     
     # 文件存储配置
     UPLOAD_DIR: str = "uploads"
@@ -8,6 +8,8 @@ import uuid
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
+from app.core.config import settings
+from app.core.correction.patching import PatchError, PatchResult, split_paragraphs, parse_edits, apply_edits
 from app.utils.llm_client import get_llm_client
 from app.utils.prompt_manager import PromptManager
 from app.core.detailed_plot.detailed_plot_models import DetailedPlotStatus
@@ -27,7 +29,8 @@ class CorrectionService:
         detailed_plot_id: str, 
         issues: List[Dict[str, Any]],
         user_prompt: str = "",
-        corrected_by: str = "system"
+        corrected_by: str = "system",
+        mode: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         对详细剧情进行智能修正
@@ -38,6 +41,8 @@ class CorrectionService:
             issues: 问题清单列表
             user_prompt: 用户修正要求
             corrected_by: 修正者
+            mode: 修正模式，patch（局部补丁）或 full（全文重写），默认使用配置；
+                  补丁无法解析或锚点无法定位时回退到全文重写
             
         Returns:
             修正结果字典
@@ -45,24 +50,22 @@ class CorrectionService:
         try:
             debug_log("开始修正详细剧情", f"ID: {detailed_plot_id}")
             
-            # 获取修正prompt
-            prompt = self.prompt_manager.get_correction_prompt(
-                content=content, 
-                issues=issues,
-                user_prompt=user_prompt
-            )
+            mode = mode or settings.CORRECTION_MODE
+            issue_dicts = [issue if isinstance(issue, dict) else issue.dict() for issue in issues]
+            patch = None
+            correction_mode = "full"
+            if mode == "patch":
+                try:
+                    patch = await self._correct_with_patch(content, issue_dicts, user_prompt)
+                    correction_mode = "patch"
+                except PatchError as e:
+                    info_log("补丁修正失败，回退到全文重写", f"ID: {detailed_plot_id}, 原因: {str(e)}")
+                    correction_mode = "full_fallback"
             
-            # 调用LLM进行修正
-            response = await self.llm_client.generate_text(
-                prompt=prompt,
-                temperature=0.3,  # 使用较低的温度以确保修正的准确性
-                max_tokens=20000
-            )
-            
-            debug_log("LLM修正响应", f"长度: {len(response)}")
-            
-            # 直接使用LLM响应作为修正后的内容
-            corrected_content = response.strip()
+            if patch is not None:
+                corrected_content = patch.content
+            else:
+                corrected_content = await self._correct_full_text(content, issue_dicts, user_prompt)
             
             # 计算字数变化
             original_word_count = len(content)
@@ -71,15 +74,28 @@ class CorrectionService:
             
             # 构建修正详情
             corrections_made = []
-            for issue in issues:
-                issue_dict = issue if isinstance(issue, dict) else issue.dict()
+            for index, issue_dict in enumerate(issue_dicts, 1):
+                if patch is not None:
+                    edit_count = sum(1 for edit in patch.applied if str(edit.get("issue")) == str(index))
+                    correction_method = "局部修补"
+                    correction_details = f"针对问题'{issue_dict.get('description', '')}'修改了{edit_count}处"
+                else:
+                    correction_method = "智能修正"
+                    correction_details = f"根据问题描述'{issue_dict.get('description', '')}'进行了针对性修正"
                 corrections_made.append({
                     "issue_category": issue_dict.get('category', '未知'),
                     "issue_description": issue_dict.get('description', '无描述'),
-                    "correction_method": "智能修正",
-                    "correction_details": f"根据问题描述'{issue_dict.get('description', '')}'进行了针对性修正"
+                    "correction_method": correction_method,
+                    "correction_details": correction_details
                 })
             
+            if patch is not None:
+                mode_note = f"，局部补丁修改{len(patch.applied)}处（约占全文{patch.edited_ratio:.0%}）"
+            elif correction_mode == "full_fallback":
+                mode_note = "，补丁无法应用，已回退为全文重写"
+            else:
+                mode_note = ""
+            
             # 构建修正历史记录
             correction_history_entry = {
                 "id": f"correction_hist_{uuid.uuid4().hex[:8]}",
@@ -91,12 +107,12 @@ class CorrectionService:
                 "correction_summary": f"修正了{len(issues)}个问题{'，同时考虑了用户修正要求' if user_prompt.strip() else ''}",
                 "word_count_change": word_count_change,
                 "quality_improvement": "修正了逻辑问题，提升了内容质量和一致性",
-                "correction_notes": f"使用简化修正智能体进行修正{'，包含用户自定义修正要求' if user_prompt.strip() else ''}",
+                "correction_notes": f"使用简化修正智能体进行修正{mode_note}{'，包含用户自定义修正要求' if user_prompt.strip() else ''}",
                 "corrected_by": corrected_by,
                 "corrected_at": datetime.now().isoformat()
             }
             
-            info_log("修正完成", f"ID: {detailed_plot_id}, 字数变化: {word_count_change}")
+            info_log("修正完成", f"ID: {detailed_plot_id}, 模式: {correction_mode}, 字数变化: {word_count_change}")
             
             return {
                 "correction_status": "completed",
@@ -105,8 +121,10 @@ class CorrectionService:
                 "correction_summary": f"修正了{len(issues)}个问题{'，同时考虑了用户修正要求' if user_prompt.strip() else ''}",
                 "word_count_change": word_count_change,
                 "quality_improvement": "修正了逻辑问题，提升了内容质量和一致性",
-                "correction_notes": f"使用简化修正智能体进行修正{'，包含用户自定义修正要求' if user_prompt.strip() else ''}",
+                "correction_notes": f"使用简化修正智能体进行修正{mode_note}{'，包含用户自定义修正要求' if user_prompt.strip() else ''}",
                 "corrected_by": corrected_by,
+                "correction_mode": correction_mode,
+                "edits_applied": len(patch.applied) if patch is not None else None,
                 "correction_history": correction_history_entry
             }
             
@@ -118,6 +136,49 @@ class CorrectionService:
                 "corrected_by": corrected_by
             }
     
+    async def _correct_full_text(self, content: str, issues: List[Dict[str, Any]], user_prompt: str) -> str:
+        """全文重写：LLM输出完整的修正后内容"""
+        # 获取修正prompt
+        prompt = self.prompt_manager.get_correction_prompt(
+            content=content, 
+            issues=issues,
+            user_prompt=user_prompt
+        )
+        
+        # 调用LLM进行修正
+        response = await self.llm_client.generate_text(
+            prompt=prompt,
+            temperature=0.3,  # 使用较低的温度以确保修正的准确性
+            max_tokens=20000
+        )
+        
+        debug_log("LLM修正响应", f"长度: {len(response)}")
+        
+        # 直接使用LLM响应作为修正后的内容
+        return response.strip()
+    
+    async def _correct_with_patch(self, content: str, issues: List[Dict[str, Any]], user_prompt: str) -> PatchResult:
+        """补丁修正：LLM只输出局部修改，本地校验后应用（失败时抛出PatchError）"""
+        paragraphs, _ = split_paragraphs(content)
+        prompt = self.prompt_manager.get_correction_patch_prompt(
+            paragraphs=paragraphs,
+            issues=issues,
+            user_prompt=user_prompt
+        )
+        
+        response = await self.llm_client.generate_text(
+            prompt=prompt,
+            temperature=0.3,
+            max_tokens=settings.CORRECTION_PATCH_MAX_TOKENS
+        )
+        
+        debug_log("LLM补丁响应", f"长度: {len(response)}")
+        
+        edits = parse_edits(response)
+        result = apply_edits(content, edits)
+        debug_log("补丁应用成功", f"修改{len(result.applied)}处，约占全文{result.edited_ratio:.1%}")
+        return result
+    
 
 
 # 创建全局实例
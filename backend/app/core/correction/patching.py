@@ -0,0 +1,130 @@
+"""
+修正补丁解析与应用
+
+LLM只返回局部修改（锚定查找替换 / 按段落编号替换），在本地校验后应用到原文；
+任一修改的锚点无法唯一定位时整体判定失败，由调用方回退到全文重写。
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class PatchError(ValueError):
+    """补丁无法解析或无法应用"""
+
+
+@dataclass
+class PatchResult:
+    """补丁应用结果"""
+    content: str
+    applied: List[Dict[str, Any]] = field(default_factory=list)
+    changed_chars: int = 0
+    
+    @property
+    def edited_ratio(self) -> float:
+        """修改字符数占修改后全文的比例"""
+        return self.changed_chars / len(self.content) if self.content else 0.0
+
+
+def split_paragraphs(content: str) -> Tuple[List[str], List[int]]:
+    """
+    按行切分段落
+    
+    Returns:
+        (非空段落列表, 各段落在原文行列表中的行号)，空行不编号、应用补丁时原样保留
+    """
+    lines = content.split('\n')
+    paragraphs, line_indexes = [], []
+    for line_index, line in enumerate(lines):
+        if line.strip():
+            paragraphs.append(line)
+            line_indexes.append(line_index)
+    return paragraphs, line_indexes
+
+
+def parse_edits(response: str) -> List[Dict[str, Any]]:
+    """解析LLM返回的修改操作列表"""
+    text = response.strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        json_match = re.search(r'\{.*\}', text, re.DOTALL)
+        if not json_match:
+            raise PatchError("响应中没有找到JSON")
+        try:
+            data = json.loads(json_match.group())
+        except json.JSONDecodeError as e:
+            raise PatchError(f"补丁JSON无效: {e}")
+    
+    edits = data.get("edits") if isinstance(data, dict) else data
+    if not isinstance(edits, list):
+        raise PatchError("补丁缺少edits列表")
+    return [edit for edit in edits if isinstance(edit, dict)]
+
+
+def _paragraph_number(edit: Dict[str, Any], paragraph_count: int) -> Optional[int]:
+    """读取并校验段落编号（从1开始），未提供时返回None"""
+    value = edit.get("paragraph")
+    if value in (None, ""):
+        return None
+    try:
+        number = int(str(value).lstrip('Pp'))
+    except ValueError:
+        raise PatchError(f"段落编号无效: {value}")
+    if not 1 <= number <= paragraph_count:
+        raise PatchError(f"段落编号超出范围: {number}（共{paragraph_count}段）")
+    return number
+
+
+def apply_edits(content: str, edits: List[Dict[str, Any]]) -> PatchResult:
+    """
+    校验并应用修改操作
+    
+    replace：find在指定段落内（未指定段落时在全文内）必须恰好出现一次；
+    replace_paragraph：按段落编号整段替换。任一操作不合法时抛出PatchError，原文不做任何修改。
+    """
+    if not edits:
+        raise PatchError("补丁为空")
+    
+    lines = content.split('\n')
+    paragraphs, line_indexes = split_paragraphs(content)
+    result = PatchResult(content=content)
+    
+    for position, edit in enumerate(edits, 1):
+        edit_type = edit.get("type", "replace")
+        number = _paragraph_number(edit, len(paragraphs))
+        
+        if edit_type == "replace_paragraph":
+            new_text = str(edit.get("content") or "").strip()
+            if number is None or not new_text:
+                raise PatchError(f"第{position}个修改缺少段落编号或内容")
+            line_index = line_indexes[number - 1]
+            result.changed_chars += max(len(lines[line_index]), len(new_text))
+            lines[line_index] = new_text
+        
+        elif edit_type == "replace":
+            find = edit.get("find") or ""
+            replace = edit.get("replace")
+            if not find or replace is None:
+                raise PatchError(f"第{position}个修改缺少find或replace")
+            if number is not None:
+                candidates = [line_indexes[number - 1]]
+            else:
+                candidates = [index for index in line_indexes if find in lines[index]]
+            occurrences = sum(lines[index].count(find) for index in candidates)
+            if occurrences == 0:
+                raise PatchError(f"第{position}个修改的锚点未找到: {find[:30]}")
+            if occurrences > 1:
+                raise PatchError(f"第{position}个修改的锚点不唯一: {find[:30]}")
+            line_index = next(index for index in candidates if find in lines[index])
+            lines[line_index] = lines[line_index].replace(find, str(replace), 1)
+            result.changed_chars += max(len(find), len(str(replace)))
+        
+        else:
+            raise PatchError(f"不支持的修改类型: {edit_type}")
+        
+        result.applied.append(edit)
+    
+    result.content = '\n'.join(lines)
+    return result
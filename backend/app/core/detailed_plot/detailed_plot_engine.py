@@ -1,6 +1,7 @@
 """
 详细剧情生成引擎
 """
+import asyncio
 import uuid
 from typing import Dict, Any, Optional
 from datetime import datetime
@@ -17,6 +18,10 @@ from app.core.logic.service import LogicReflectionService
 from app.core.logic.models import LogicStatus
 from app.utils.prompt_manager import PromptManager
 from app.utils.file_writer import FileWriter
+from app.utils.entity_loader import get_entity_loader
+from app.utils.stage_cache import stage_cache
+from app.utils.story_memory import story_memory
+from app.utils.best_of_n import best_of_n
 
 
 class DetailedPlotEngine:
@@ -40,79 +45,17 @@ class DetailedPlotEngine:
         print(f"📋 [DEBUG] 请求: {request.title}")
         
         try:
-            # 1. 获取章节大纲信息
-            print(f"🔍 [DEBUG] 步骤1: 获取章节大纲信息...")
-            chapter_outline = self.chapter_database.get_chapter_outline(request.chapter_outline_id)
-            if not chapter_outline:
-                raise ValueError(f"章节大纲不存在: {request.chapter_outline_id}")
-            print(f"✅ [DEBUG] 章节大纲获取成功: {chapter_outline.title}")
-            print(f"📋 [DEBUG] 章节事件: {getattr(chapter_outline, 'main_events', '无事件')}")
+            inputs = await self._load_generation_inputs(request)
             
-            # 2. 获取剧情大纲信息
-            print(f"🔍 [DEBUG] 步骤2: 获取剧情大纲信息...")
-            plot_outline = self.plot_database.get_plot_outline(request.plot_outline_id)
-            if not plot_outline:
-                raise ValueError(f"剧情大纲不存在: {request.plot_outline_id}")
-            print(f"✅ [DEBUG] 剧情大纲获取成功: {plot_outline.title}")
-            
-            # 3. 获取世界观信息
-            print(f"🔍 [DEBUG] 步骤3: 获取世界观信息...")
-            world_view = self.world_database.get_worldview(plot_outline.worldview_id)
-            if not world_view:
-                raise ValueError(f"世界观不存在: {plot_outline.worldview_id}")
-            print(f"✅ [DEBUG] 世界观获取成功: {world_view.get('name', '未知世界观')}")
-            
-            # 4. 获取角色信息
-            print(f"🔍 [DEBUG] 步骤4: 获取角色信息...")
-            characters = self.character_database.get_characters_by_worldview(plot_outline.worldview_id)
-            print(f"✅ [DEBUG] 角色信息获取成功: {len(characters)}个角色")
-            
-            # 5. 获取相关事件信息 - 新增
-            print(f"🔍 [DEBUG] 步骤5: 获取相关事件信息...")
-            events = []
-            if hasattr(chapter_outline, 'key_scenes') and chapter_outline.key_scenes:
-                # 从章节场景中提取关联的事件ID
-                related_event_ids = []
-                for scene in chapter_outline.key_scenes:
-                    if hasattr(scene, 'related_events') and scene.related_events:
-                        related_event_ids.extend(scene.related_events)
-                
-                # 去重并获取事件详情
-                unique_event_ids = list(set(related_event_ids))
-                if unique_event_ids:
-                    for event_id in unique_event_ids:
-                        event = self.event_database.get_event_by_id(event_id)
-                        if event:
-                            events.append(event)
-                print(f"✅ [DEBUG] 相关事件获取成功: {len(events)}个事件")
+            # 6-8. 构建提示、调用LLM并解析（输入未变化时复用上次生成的内容，force_regenerate时重新生成）
+            if request.candidate_count > 1:
+                compute = lambda: self._generate_best_content(inputs, request.candidate_count)
             else:
-                print(f"⚠️ [DEBUG] 章节无关键场景或关联事件")
-            
-            # 6. 构建生成提示
-            print(f"🔍 [DEBUG] 步骤6: 构建生成提示...")
-            prompt = self.prompt_manager.get_detailed_plot_prompt(
-                chapter_outline=chapter_outline,
-                plot_outline=plot_outline,
-                world_view=world_view,
-                characters=characters,
-                events=events,
-                additional_requirements=request.additional_requirements
+                compute = lambda: self._generate_content(inputs)
+            detailed_plot_content = await stage_cache.memoize(
+                "detailed_plot", self._cache_inputs(inputs, request.candidate_count), compute,
+                force=request.force_regenerate
             )
-            print(f"✅ [DEBUG] 提示构建成功: {len(prompt)}字符")
-            
-            # 7. 调用LLM生成详细剧情
-            print(f"🔍 [DEBUG] 步骤7: 调用LLM生成详细剧情...")
-            response = await self.llm_client.generate_text(
-                prompt=prompt,
-                temperature=0.7,
-                max_tokens=12000
-            )
-            print(f"✅ [DEBUG] LLM响应获取成功: {len(response) if response else 0}字符")
-            
-            # 8. 解析响应
-            print(f"🔍 [DEBUG] 步骤8: 解析响应...")
-            detailed_plot_content = self._parse_detailed_plot_response(response)
-            print(f"✅ [DEBUG] 响应解析成功: {len(detailed_plot_content)}字符")
             
             # 9. 创建详细剧情对象（不进行自动逻辑检查）
             print(f"🔍 [DEBUG] 步骤9: 创建详细剧情对象...")
@@ -138,6 +81,9 @@ class DetailedPlotEngine:
             self.detailed_plot_database.save_detailed_plot(detailed_plot)
             print(f"✅ [DEBUG] 数据库保存成功")
             
+            # 更新分层摘要记忆（失败不影响主要流程）
+            await story_memory.record_chapter(request.plot_outline_id, inputs["chapter_outline"], detailed_plot_content)
+            
             # 11. 生成MD文件
             print(f"🔍 [DEBUG] 步骤10: 生成MD文件...")
             try:
@@ -158,6 +104,129 @@ class DetailedPlotEngine:
             raise e
     
     
+    async def _load_generation_inputs(self, request: DetailedPlotRequest) -> Dict[str, Any]:
+        """加载生成详细剧情所需的全部输入（章节大纲、剧情大纲、世界观、角色、相关事件、前情提要）"""
+        # 同一请求内共享的实体加载器（批量查询 + 去重缓存）
+        loader = get_entity_loader()
+        
+        # 1. 获取章节大纲信息
+        print(f"🔍 [DEBUG] 步骤1: 获取章节大纲和剧情大纲信息...")
+        chapter_outline, plot_outline = await asyncio.gather(
+            loader.get_chapter_outline(request.chapter_outline_id),
+            loader.get_plot_outline(request.plot_outline_id)
+        )
+        if not chapter_outline:
+            raise ValueError(f"章节大纲不存在: {request.chapter_outline_id}")
+        print(f"✅ [DEBUG] 章节大纲获取成功: {chapter_outline.title}")
+        print(f"📋 [DEBUG] 章节事件: {getattr(chapter_outline, 'main_events', '无事件')}")
+        
+        # 2. 获取剧情大纲信息
+        if not plot_outline:
+            raise ValueError(f"剧情大纲不存在: {request.plot_outline_id}")
+        print(f"✅ [DEBUG] 剧情大纲获取成功: {plot_outline.title}")
+        
+        # 3. 获取世界观信息和 4. 角色信息
+        print(f"🔍 [DEBUG] 步骤3: 获取世界观和角色信息...")
+        world_view, characters = await asyncio.gather(
+            loader.get_worldview(plot_outline.worldview_id),
+            loader.get_characters_by_worldview(plot_outline.worldview_id)
+        )
+        if not world_view:
+            raise ValueError(f"世界观不存在: {plot_outline.worldview_id}")
+        print(f"✅ [DEBUG] 世界观获取成功: {world_view.get('name', '未知世界观')}")
+        print(f"✅ [DEBUG] 角色信息获取成功: {len(characters)}个角色")
+        
+        # 5. 获取相关事件信息
+        print(f"🔍 [DEBUG] 步骤5: 获取相关事件信息...")
+        events = []
+        if hasattr(chapter_outline, 'key_scenes') and chapter_outline.key_scenes:
+            # 从章节场景中提取关联的事件ID
+            related_event_ids = []
+            for scene in chapter_outline.key_scenes:
+                if hasattr(scene, 'related_events') and scene.related_events:
+                    related_event_ids.extend(scene.related_events)
+            
+            # 去重后一次批量获取事件详情
+            if related_event_ids:
+                events = await loader.get_events(related_event_ids)
+            print(f"✅ [DEBUG] 相关事件获取成功: {len(events)}个事件")
+        else:
+            print(f"⚠️ [DEBUG] 章节无关键场景或关联事件")
+        
+        # 6. 前情提要：此前章节的分层摘要（作为输入参与阶段缓存，前文变化时重新生成）
+        story_so_far = await story_memory.story_so_far(
+            request.plot_outline_id, chapter_outline.chapter_number, chapter_outline.act_belonging
+        )
+        if story_so_far:
+            print(f"✅ [DEBUG] 前情提要获取成功: {len(story_so_far)}字符")
+        # 较早章节的摘要，构建prompt时按与本章的相关度选取
+        chapter_summaries = story_memory.chapter_summaries(request.plot_outline_id, chapter_outline.chapter_number)
+        
+        return {
+            "chapter_outline": chapter_outline,
+            "plot_outline": plot_outline,
+            "world_view": world_view,
+            "characters": characters,
+            "events": events,
+            "additional_requirements": request.additional_requirements,
+            "story_so_far": story_so_far,
+            "chapter_summaries": chapter_summaries
+        }
+    
+    async def _generate_content(self, inputs: Dict[str, Any]) -> str:
+        """调用LLM生成详细剧情正文"""
+        # 6. 构建生成提示
+        print(f"🔍 [DEBUG] 步骤6: 构建生成提示...")
+        prompt = self.prompt_manager.get_detailed_plot_prompt(**inputs)
+        print(f"✅ [DEBUG] 提示构建成功: {len(prompt)}字符")
+        
+        # 7. 调用LLM生成详细剧情
+        print(f"🔍 [DEBUG] 步骤7: 调用LLM生成详细剧情...")
+        response = await self.llm_client.generate_text(
+            prompt=prompt,
+            temperature=0.7,
+            max_tokens=12000
+        )
+        print(f"✅ [DEBUG] LLM响应获取成功: {len(response) if response else 0}字符")
+        
+        # 8. 解析响应
+        print(f"🔍 [DEBUG] 步骤8: 解析响应...")
+        detailed_plot_content = self._parse_detailed_plot_response(response)
+        print(f"✅ [DEBUG] 响应解析成功: {len(detailed_plot_content)}字符")
+        return detailed_plot_content
+    
+    async def _generate_best_content(self, inputs: Dict[str, Any], candidate_count: int) -> str:
+        """并行生成多个详细剧情候选，按智能评分保留最佳候选"""
+        from app.core.scoring.intelligent_scoring_service import IntelligentScoringService
+        scoring_service = IntelligentScoringService()
+        
+        async def generate(index: int) -> str:
+            return await self._generate_content(inputs)
+        
+        async def score(content: str) -> float:
+            scoring_data = await scoring_service.evaluate_content(content)
+            return scoring_data.get("total_score", 0.0) / 10
+        
+        result = await best_of_n(generate, score, candidate_count, label="详细剧情")
+        print(f"📊 [DEBUG] 候选评选结果: {result.summary()}")
+        return result.best
+    
+    def _cache_inputs(self, inputs: Dict[str, Any], candidate_count: int) -> Dict[str, Any]:
+        """阶段缓存的输入：best-of-N生成的结果与单次生成分开缓存"""
+        if candidate_count > 1:
+            return {**inputs, "candidate_count": candidate_count}
+        return inputs
+    
+    async def preview_regeneration(self, request: DetailedPlotRequest) -> Dict[str, Any]:
+        """dry-run：判断该章节的详细剧情是否需要重新调用LLM生成"""
+        inputs = await self._load_generation_inputs(request)
+        info = stage_cache.lookup("detailed_plot", self._cache_inputs(inputs, request.candidate_count))
+        info.pop("output", None)
+        if request.force_regenerate:
+            info["would_regenerate"] = True
+        info["chapter_outline_id"] = request.chapter_outline_id
+        return info
+    
     def _parse_detailed_plot_response(self, response: str) -> str:
         """解析LLM响应"""
         # 简单的响应解析，直接返回内容
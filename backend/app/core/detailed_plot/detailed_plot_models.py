@@ -57,6 +57,8 @@ class DetailedPlotRequest(BaseModel):
     title: str = Field(..., description="详细剧情标题")
     additional_requirements: Optional[str] = Field(None, description="额外要求")
     enable_logic_check: bool = Field(default=True, description="是否启用逻辑检查")
+    candidate_count: int = Field(default=1, ge=1, le=8, description="并行生成的候选数量，大于1时保留评分最高的候选")
+    force_regenerate: bool = Field(default=False, description="忽略阶段缓存强制重新生成（输入未变化时重新生成同一章节）")
 
 
 class DetailedPlotResponse(BaseModel):
@@ -3,14 +3,15 @@
 """
 import json
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
 from app.core.event_generator.event_models import Event, EventType, EventImportance, EventCategory, SimpleEvent
 from app.core.event_generator.event_scoring_agent import EventScore
 from app.core.config import settings
+from app.utils.entity_loader import invalidate_entity
 
 
 class EventDatabase:
@@ -25,6 +26,7 @@ class EventDatabase:
     
     def save_event(self, event: Event) -> bool:
         """保存事件到数据库（简化版）"""
+        invalidate_entity("events", event.id)
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
@@ -70,12 +72,39 @@ class EventDatabase:
                 conn.close()
             return None
     
+    def get_events_by_ids(self, event_ids: List[str]) -> Dict[str, Event]:
+        """批量获取事件，返回以ID为键的字典"""
+        if not event_ids:
+            return {}
+        try:
+            conn = self.get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT 
+                        e.id, e.plot_outline_id, e.chapter_number, e.sequence_order,
+                        e.title, e.event_type, e.description, e.outcome,
+                        e.created_at, e.updated_at
+                    FROM events e
+                    WHERE e.id = ANY(%s)
+                """, (list(event_ids),))
+                rows = cursor.fetchall()
+                columns = [desc[0] for desc in cursor.description]
+                conn.close()
+                events = [self._row_to_event(row, columns) for row in rows]
+                return {event.id: event for event in events}
+        except Exception as e:
+            print(f"批量获取事件失败: {e}")
+            if 'conn' in locals():
+                conn.close()
+            return {}
+    
     def get_event(self, event_id: str) -> Optional[Event]:
         """根据ID获取事件（别名方法）"""
         return self.get_event_by_id(event_id)
     
     def update_event(self, event_id: str, event_data: dict) -> bool:
         """更新事件"""
+        invalidate_entity("events", event_id)
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
@@ -219,6 +248,7 @@ class EventDatabase:
     
     def delete_event(self, event_id: str) -> bool:
         """删除事件"""
+        invalidate_entity("events", event_id)
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
@@ -236,6 +266,7 @@ class EventDatabase:
     
     def delete_events_by_plot_outline(self, plot_outline_id: str) -> bool:
         """删除剧情大纲的所有事件"""
+        invalidate_entity("events")
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
@@ -363,6 +394,49 @@ class EventDatabase:
                 conn.close()
             return False
     
+    def save_event_scores_bulk(self, scores: List[Tuple[str, EventScore]]) -> int:
+        """批量保存事件评分结果（单次插入、单个事务），返回保存条数；写入失败时回滚并抛出异常"""
+        if not scores:
+            return 0
+        try:
+            conn = self.get_connection()
+            with conn.cursor() as cursor:
+                rows = [
+                    (
+                        event_id,
+                        score.protagonist_involvement,
+                        score.plot_coherence,
+                        5.0,  # character_development - 使用默认值
+                        5.0,  # world_consistency - 使用默认值
+                        score.dramatic_tension,
+                        score.writing_quality,  # 将文笔质量存储到emotional_impact字段
+                        5.0,  # foreshadowing - 使用默认值
+                        score.overall_quality,
+                        score.feedback,
+                        score.strengths,
+                        score.weaknesses
+                    )
+                    for event_id, score in scores
+                ]
+                execute_values(cursor, """
+                    INSERT INTO event_scores (
+                        event_id, protagonist_involvement, plot_coherence, 
+                        character_development, world_consistency, dramatic_tension,
+                        emotional_impact, foreshadowing, overall_quality,
+                        feedback, strengths, weaknesses
+                    ) VALUES %s
+                """, rows, page_size=len(rows))
+                conn.commit()
+                conn.close()
+                print(f"✅ 批量保存事件评分成功，共 {len(rows)} 条")
+                return len(rows)
+        except Exception as e:
+            print(f"❌ 批量保存事件评分失败: {e}")
+            if 'conn' in locals():
+                conn.rollback()
+                conn.close()
+            raise
+    
     def get_event_score_by_id(self, score_id: int) -> Optional[EventScore]:
         """根据评分ID获取评分结果"""
         try:
@@ -674,6 +748,7 @@ class EventDatabase:
                            new_event_type: str, new_description: str, new_outcome: str,
                            evolution_reason: str = "", score_id: int = None) -> Optional[str]:
         """创建事件的新版本（使用进化历史表）"""
+        invalidate_entity("events", event_id)
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
@@ -699,6 +774,7 @@ class EventDatabase:
         - 如果指定版本号：只删除该版本
         - 如果未指定版本号：删除整个事件的所有版本
         """
+        invalidate_entity("events", event_id)
         try:
             conn = self.get_connection()
             with conn.cursor() as cursor:
@@ -1,15 +1,20 @@
 """
 事件生成器
 """
+import asyncio
 import json
+import time
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 
+from app.core.config import settings
 from app.utils import llm_client
 from app.core.event_generator.event_models import Event, EventType, EventImportance, EventCategory, SimpleEvent
 from app.core.event_generator.event_database import EventDatabase
+from app.core.event_generator.event_shards import EventShard, plan_event_shards, merge_shard_events
 from app.utils.prompt_manager import PromptManager
+from app.utils.best_of_n import best_of_n
 
 
 class EventGenerator:
@@ -23,8 +28,37 @@ class EventGenerator:
                            world_view: Dict[str, Any],
                            characters: List[Dict[str, Any]],
                            event_requirements: List[str],
-                           event_type: EventType = "日常事件") -> Event:
-        """生成单个事件"""
+                           event_type: EventType = "日常事件",
+                           candidate_count: int = 1,
+                           plot_outline: Any = None) -> Event:
+        """
+        生成单个事件
+        
+        candidate_count 大于1时（如高潮、关键事件）并行生成多个候选，
+        由事件评分智能体评分后保留最佳候选；plot_outline 作为评分上下文。
+        """
+        if candidate_count <= 1:
+            return await self._generate_single_event(world_view, characters, event_requirements, event_type)
+        
+        from app.core.event_generator.event_scoring_agent import EventScoringAgent
+        scoring_agent = EventScoringAgent(llm_client)
+        
+        async def generate(index: int) -> Event:
+            return await self._generate_single_event(world_view, characters, event_requirements, event_type)
+        
+        async def score(event: Event) -> float:
+            event_score = await scoring_agent.score_event_in_context(event, characters, world_view, plot_outline)
+            return event_score.overall_quality
+        
+        result = await best_of_n(generate, score, candidate_count, label="事件")
+        return result.best
+    
+    async def _generate_single_event(self,
+                                     world_view: Dict[str, Any],
+                                     characters: List[Dict[str, Any]],
+                                     event_requirements: List[str],
+                                     event_type: EventType) -> Event:
+        """调用LLM生成一个事件"""
         try:
             # 构建prompt
             prompt = self._build_event_prompt(
@@ -98,54 +132,64 @@ class EventGenerator:
                                      selected_act: Optional[Dict[str, Any]] = None,
                                      story_tone: str = "",
                                      narrative_structure: str = "",
-                                     save_to_database: bool = True) -> List[Event]:
-        """生成增强事件（支持重要性分级和章节关联）"""
+                                     save_to_database: bool = True,
+                                     sharded: Optional[bool] = None) -> List[Event]:
+        """
+        生成增强事件（支持重要性分级和章节关联）
+        
+        sharded为None时，事件总数超过分片大小自动按幕次/重要性级别分片并发生成。
+        需要知道是否有分片失败时使用 generate_enhanced_events_with_report。
+        """
+        result = await self.generate_enhanced_events_with_report(
+            plot_outline, world_view, characters, importance_distribution, event_requirements,
+            generate_chapter_integration, selected_act, story_tone, narrative_structure,
+            save_to_database, sharded
+        )
+        return result["events"]
+    
+    async def generate_enhanced_events_with_report(self,
+                                                   plot_outline: Dict[str, Any],
+                                                   world_view: Dict[str, Any],
+                                                   characters: List[Dict[str, Any]],
+                                                   importance_distribution: Dict[str, int],
+                                                   event_requirements: str = "",
+                                                   generate_chapter_integration: bool = True,
+                                                   selected_act: Optional[Dict[str, Any]] = None,
+                                                   story_tone: str = "",
+                                                   narrative_structure: str = "",
+                                                   save_to_database: bool = True,
+                                                   sharded: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        生成增强事件并返回分片报告
+        
+        Returns:
+            {"events": 事件列表, "shard_report": 分片报告（未分片时为None）, "partial": 是否有分片重试后仍失败}
+        """
+        shard_report = None
         try:
             # 计算总事件数
             total_events = sum(importance_distribution.values())
+            if sharded is None:
+                sharded = total_events > settings.EVENT_SHARD_SIZE
+            
+            if sharded:
+                events_data, shard_report = await self._generate_sharded_events_data(
+                    plot_outline, world_view, characters, importance_distribution,
+                    event_requirements, generate_chapter_integration, selected_act,
+                    story_tone, narrative_structure
+                )
+            else:
+                # 构建增强prompt
+                prompt = self._build_enhanced_event_prompt(
+                    world_view, characters, plot_outline, importance_distribution, 
+                    event_requirements, generate_chapter_integration, selected_act,
+                    story_tone, narrative_structure
+                )
+                events_data = await self._request_enhanced_events_data(prompt)
             
-            # 构建增强prompt
-            prompt = self._build_enhanced_event_prompt(
-                world_view, characters, plot_outline, importance_distribution, 
-                event_requirements, generate_chapter_integration, selected_act,
-                story_tone, narrative_structure
-            )
-            
-            # 调用LLM
-            content = await llm_client.generate_chat(
-                messages=[
-                    {"role": "system", "content": "你是一个专业的小说事件设计师，擅长创造引人入胜的事件序列，支持重要性分级和章节关联。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.8,
-                max_tokens=20000
-            )
-            
-            # 解析JSON
-            try:
-                batch_data = json.loads(content)
-            except json.JSONDecodeError as e:
-                print(f"增强事件JSON解析失败: {e}")
-                print(f"LLM响应内容: {content[:500]}...")
-                # 尝试提取JSON部分
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group()
-                    try:
-                        batch_data = json.loads(json_str)
-                        print("成功从响应中提取JSON")
-                    except json.JSONDecodeError as e2:
-                        print(f"提取的JSON仍然无效: {e2}")
-                        print(f"提取的JSON内容: {json_str[:200]}...")
-                        raise ValueError(f"无法从LLM响应中提取有效的JSON: {content[:100]}...")
-                else:
-                    raise ValueError(f"无法从LLM响应中提取有效的JSON: {content[:100]}...")
-            
-            events_data = batch_data.get("events", [])
-            
+            partial = bool(shard_report and shard_report["failed_shards"])
             if len(events_data) == 0:
-                return []
+                return {"events": [], "shard_report": shard_report, "partial": partial}
             
             events = []
             plot_outline_id = plot_outline.get('id', '') if isinstance(plot_outline, dict) else getattr(plot_outline, 'id', '')
@@ -199,11 +243,103 @@ class EventGenerator:
                 except Exception as e:
                     continue
             
-            return events
+            return {"events": events, "shard_report": shard_report, "partial": partial}
             
         except Exception as e:
             print(f"生成增强事件失败: {e}")
             raise
+    
+    async def _request_enhanced_events_data(self, prompt: str) -> List[Dict[str, Any]]:
+        """调用LLM生成增强事件并解析JSON，返回事件数据列表"""
+        content = await llm_client.generate_chat(
+            messages=[
+                {"role": "system", "content": "你是一个专业的小说事件设计师，擅长创造引人入胜的事件序列，支持重要性分级和章节关联。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.8,
+            max_tokens=20000
+        )
+        
+        # 解析JSON
+        try:
+            batch_data = json.loads(content)
+        except json.JSONDecodeError as e:
+            print(f"增强事件JSON解析失败: {e}")
+            print(f"LLM响应内容: {content[:500]}...")
+            # 尝试提取JSON部分
+            import re
+            json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            if json_match:
+                json_str = json_match.group()
+                try:
+                    batch_data = json.loads(json_str)
+                    print("成功从响应中提取JSON")
+                except json.JSONDecodeError as e2:
+                    print(f"提取的JSON仍然无效: {e2}")
+                    print(f"提取的JSON内容: {json_str[:200]}...")
+                    raise ValueError(f"无法从LLM响应中提取有效的JSON: {content[:100]}...")
+            else:
+                raise ValueError(f"无法从LLM响应中提取有效的JSON: {content[:100]}...")
+        
+        return batch_data.get("events", [])
+    
+    async def _generate_sharded_events_data(self,
+                                           plot_outline: Dict[str, Any],
+                                           world_view: Dict[str, Any],
+                                           characters: List[Dict[str, Any]],
+                                           importance_distribution: Dict[str, int],
+                                           event_requirements: str = "",
+                                           generate_chapter_integration: bool = True,
+                                           selected_act: Optional[Dict[str, Any]] = None,
+                                           story_tone: str = "",
+                                           narrative_structure: str = "") -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """按幕次/重要性级别分片并发生成事件，失败的分片单独重试，结果确定性合并，返回 (事件数据, 分片报告)"""
+        acts = self._format_plot_outline_dict(plot_outline).get('acts') or []
+        shards = plan_event_shards(importance_distribution, acts, selected_act, settings.EVENT_SHARD_SIZE)
+        max_attempts = 1 + settings.EVENT_SHARD_MAX_RETRIES
+        print(f"🧩 事件分片生成：{sum(importance_distribution.values())} 个事件拆分为 {len(shards)} 个分片")
+        
+        async def run_shard(shard: EventShard):
+            start = time.perf_counter()
+            while shard.attempts < max_attempts:
+                shard.attempts += 1
+                try:
+                    prompt = self._build_enhanced_event_prompt(
+                        world_view, characters, plot_outline, shard.importance_distribution,
+                        event_requirements, generate_chapter_integration, shard.selected_act,
+                        story_tone, narrative_structure
+                    )
+                    events_data = await self._request_enhanced_events_data(prompt)
+                    if not events_data:
+                        raise ValueError("分片未生成任何事件")
+                    # 多生成的事件截断，保持各级别的数量分布
+                    shard.events_data = events_data[:shard.event_count]
+                    shard.error = None
+                    break
+                except Exception as e:
+                    shard.error = str(e)
+                    print(f"⚠️ 事件{shard.label}第{shard.attempts}次生成失败: {e}")
+            shard.duration = time.perf_counter() - start
+        
+        await asyncio.gather(*(run_shard(shard) for shard in shards))
+        
+        failed = [shard for shard in shards if shard.error]
+        report = {
+            "shards": len(shards),
+            "failed_shards": len(failed),
+            "retried_shards": sum(1 for shard in shards if shard.attempts > 1),
+            "llm_calls": sum(shard.attempts for shard in shards),
+            "max_shard_seconds": round(max(shard.duration for shard in shards), 3) if shards else 0.0,
+            "failures": [{"shard": shard.label, "error": shard.error} for shard in failed]
+        }
+        if shards and len(failed) == len(shards):
+            raise ValueError(f"全部{len(shards)}个事件分片生成失败: {failed[0].error}")
+        if failed:
+            print(f"⚠️ {len(failed)}/{len(shards)} 个事件分片重试后仍失败，保留其余分片的事件")
+        
+        events_data = merge_shard_events(shards)
+        print(f"✅ 分片生成完成：{len(events_data)} 个事件，LLM调用 {report['llm_calls']} 次")
+        return events_data, report
 
     async def generate_simple_events(self,
                                    plot_outline: Dict[str, Any],
@@ -3,10 +3,13 @@
 负责对生成的事件进行多维度评分，识别优缺点并提供改进建议
 """
 
-from typing import Dict, List, Any, Optional
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from app.core.config import settings
 from app.utils.llm_client import get_llm_client
 from app.utils.prompt_manager import PromptManager
+from app.utils.entity_loader import get_entity_loader
 
 
 @dataclass
@@ -64,6 +67,8 @@ class EventScoringAgent:
     async def score_event(self, event_or_id) -> EventScore:
         """对指定事件进行评分，支持传入事件对象或事件ID"""
         try:
+            loader = get_entity_loader()
+            
             # 判断传入的是事件对象还是事件ID
             if isinstance(event_or_id, str):
                 # 传入的是事件ID
@@ -71,7 +76,7 @@ class EventScoringAgent:
                 print(f"🎯 开始对事件 {event_id} 进行评分...")
                 
                 # 1. 获取事件信息
-                event = self.event_database.get_event(event_id)
+                event = await loader.get_event(event_id)
                 if not event:
                     raise ValueError(f"事件 {event_id} 不存在")
             else:
@@ -79,50 +84,22 @@ class EventScoringAgent:
                 event = event_or_id
                 print(f"🎯 开始对事件对象 {event.title} 进行评分...")
             
-            # 2. 获取相关角色和世界观信息
-            characters = self.character_database.get_characters_by_worldview(
-                event.plot_outline_id
-            )
-            world_info = self.worldview_database.get_worldview(
-                event.plot_outline_id
-            )
-            plot_info = self.plot_database.get_plot_outline(
-                event.plot_outline_id
+            # 2. 获取相关剧情、角色和世界观信息（同一请求内共享加载结果）
+            plot_info = await loader.get_plot_outline(event.plot_outline_id)
+            worldview_id = getattr(plot_info, 'worldview_id', None) or event.plot_outline_id
+            world_info, characters = await asyncio.gather(
+                loader.get_worldview(worldview_id),
+                loader.get_characters_by_worldview(worldview_id)
             )
             
             print(f"📊 获取到 {len(characters)} 个角色信息")
             print(f"📊 世界观信息类型: {type(world_info)}")
             print(f"📊 剧情信息类型: {type(plot_info)}")
             
-            # 3. 生成评分prompt
-            try:
-                prompt = self.prompt_manager.get_event_scoring_prompt(
-                    event, characters, world_info, plot_info
-                )
-                print(f"📝 评分prompt生成成功，长度: {len(prompt)}")
-            except Exception as e:
-                print(f"❌ 生成评分prompt失败: {e}")
-                raise
-            
-            # 4. 调用LLM进行评分
-            print("🤖 调用LLM进行事件评分...")
-            try:
-                response = await self.llm_client.generate_text(prompt)
-                print(f"🤖 LLM响应长度: {len(response)}")
-            except Exception as e:
-                print(f"❌ LLM调用失败: {e}")
-                raise
-            
-            # 5. 解析评分结果
-            try:
-                score_data = self._parse_score_response(response)
-                print(f"📊 评分数据解析成功: {score_data}")
-            except Exception as e:
-                print(f"❌ 解析评分结果失败: {e}")
-                raise
+            # 3-5. 生成评分prompt、调用LLM并解析评分结果
+            score = await self.score_event_in_context(event, characters, world_info, plot_info)
             
             # 6. 保存评分结果
-            score = EventScore(**score_data)
             self.event_database.save_event_score(event.id, score)
             
             print(f"✅ 事件评分完成，综合质量: {score.overall_quality}/10")
@@ -132,6 +109,112 @@ class EventScoringAgent:
             print(f"❌ 事件评分失败: {e}")
             raise
     
+    async def score_plot_events(self, plot_outline_id: str, events: Optional[List[Any]] = None,
+                                max_concurrency: Optional[int] = None,
+                                on_progress: Optional[Callable[[int, int, Any, Optional[EventScore], Optional[str]], Any]] = None
+                                ) -> Dict[str, Any]:
+        """
+        批量评分剧情大纲下的全部事件
+        
+        剧情、世界观和角色只加载一次，事件按并发上限同时评分，
+        全部完成后一次性批量写入评分结果。
+        
+        Args:
+            plot_outline_id: 剧情大纲ID
+            events: 待评分事件，默认取该大纲下所有事件的最新版本
+            max_concurrency: 同时评分的事件数，默认使用配置
+            on_progress: 每个事件完成时回调 on_progress(已完成数, 总数, 事件, 评分, 错误)
+        
+        Returns:
+            {"scores": [(事件, 评分)], "failed": [{"event_id", "title", "error"}], "saved": 保存条数,
+             "save_error": 保存失败原因（成功时为None）}
+        """
+        if events is None:
+            events = self.event_database.get_events_by_plot_outline(plot_outline_id)
+        total = len(events)
+        print(f"🎯 开始批量评分剧情 {plot_outline_id} 的 {total} 个事件...")
+        if not events:
+            return {"scores": [], "failed": [], "saved": 0, "save_error": None}
+        
+        # 共享上下文只加载一次
+        loader = get_entity_loader()
+        plot_info = await loader.get_plot_outline(plot_outline_id)
+        worldview_id = getattr(plot_info, 'worldview_id', None) or plot_outline_id
+        world_info, characters = await asyncio.gather(
+            loader.get_worldview(worldview_id),
+            loader.get_characters_by_worldview(worldview_id)
+        )
+        print(f"📊 共享上下文加载完成：{len(characters)} 个角色")
+        
+        semaphore = asyncio.Semaphore(max_concurrency or settings.EVENT_SCORING_CONCURRENCY)
+        scores: List[Tuple[Any, EventScore]] = []
+        failed: List[Dict[str, Any]] = []
+        completed = 0
+        
+        async def score_one(event):
+            nonlocal completed
+            score, error = None, None
+            async with semaphore:
+                try:
+                    score = await self.score_event_in_context(event, characters, world_info, plot_info)
+                except Exception as e:
+                    error = str(e)
+            completed += 1
+            if score is not None:
+                scores.append((event, score))
+            else:
+                failed.append({"event_id": event.id, "title": event.title, "error": error})
+            if on_progress is not None:
+                result = on_progress(completed, total, event, score, error)
+                if asyncio.iscoroutine(result):
+                    await result
+        
+        await asyncio.gather(*(score_one(event) for event in events))
+        
+        order = {id(event): index for index, event in enumerate(events)}
+        scores.sort(key=lambda item: order[id(item[0])])
+        # 按事件原顺序一次性保存；同步数据库写入放到线程中执行，避免阻塞事件循环。
+        # 保存失败时保留已完成的评分结果并返回失败原因，由调用方决定如何上报
+        saved, save_error = 0, None
+        try:
+            saved = await asyncio.to_thread(
+                self.event_database.save_event_scores_bulk,
+                [(event.id, score) for event, score in scores]
+            )
+        except Exception as e:
+            save_error = str(e)
+        print(f"✅ 批量评分完成：成功 {len(scores)} 个，失败 {len(failed)} 个，已保存 {saved} 条")
+        return {"scores": scores, "failed": failed, "saved": saved, "save_error": save_error}
+    
+    async def score_event_in_context(self, event, characters: List[Dict[str, Any]],
+                                     world_info: Any, plot_info: Any = None) -> EventScore:
+        """使用已加载的上下文对事件评分（不保存评分结果，用于候选事件比较）"""
+        try:
+            prompt = self.prompt_manager.get_event_scoring_prompt(
+                event, characters, world_info, plot_info
+            )
+            print(f"📝 评分prompt生成成功，长度: {len(prompt)}")
+        except Exception as e:
+            print(f"❌ 生成评分prompt失败: {e}")
+            raise
+        
+        print("🤖 调用LLM进行事件评分...")
+        try:
+            response = await self.llm_client.generate_text(prompt)
+            print(f"🤖 LLM响应长度: {len(response)}")
+        except Exception as e:
+            print(f"❌ LLM调用失败: {e}")
+            raise
+        
+        try:
+            score_data = self._parse_score_response(response)
+            print(f"📊 评分数据解析成功: {score_data}")
+        except Exception as e:
+            print(f"❌ 解析评分结果失败: {e}")
+            raise
+        
+        return EventScore(**score_data)
+    
     def _parse_score_response(self, response: str) -> Dict[str, Any]:
         """解析评分响应"""
         import json
@@ -0,0 +1,103 @@
+"""
+事件分片生成
+
+把重要性分布按幕次、重要性级别拆分为若干小分片并发生成，每个分片只输出少量事件的小JSON，
+单个分片解析失败时只重试该分片；合并时按（幕次, 分片, 分片内顺序）确定性排序。
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class EventShard:
+    """事件分片"""
+    index: int
+    act_index: int
+    selected_act: Optional[Dict[str, Any]]
+    importance_distribution: Dict[str, int]
+    attempts: int = 0
+    error: Optional[str] = None
+    duration: float = 0.0
+    events_data: List[Dict[str, Any]] = field(default_factory=list)
+    
+    @property
+    def event_count(self) -> int:
+        return sum(self.importance_distribution.values())
+    
+    @property
+    def label(self) -> str:
+        act_name = (self.selected_act or {}).get('act_name')
+        tiers = "、".join(f"{tier}{count}" for tier, count in self.importance_distribution.items())
+        return f"分片{self.index + 1}（{act_name + '·' if act_name else ''}{tiers}）"
+
+
+def _act_to_dict(act: Any) -> Dict[str, Any]:
+    if isinstance(act, dict):
+        return act
+    if hasattr(act, 'dict'):
+        return act.dict()
+    return dict(getattr(act, '__dict__', {}))
+
+
+def plan_event_shards(importance_distribution: Dict[str, int], acts: Optional[List[Any]] = None,
+                      selected_act: Optional[Dict[str, Any]] = None, shard_size: int = 8) -> List[EventShard]:
+    """
+    规划事件分片
+    
+    指定了幕次时只在该幕次内按重要性级别拆分；否则剧情大纲有幕次结构时，
+    各级别事件数在幕次间均分（余数轮流分配），每幕再按级别拆分。
+    单个分片超过shard_size个事件时继续切分。
+    """
+    if selected_act:
+        act_list = [selected_act]
+    else:
+        act_list = [_act_to_dict(act) for act in (acts or [])] or [None]
+    
+    # 各幕次的重要性分布
+    act_distributions: List[Dict[str, int]] = [{} for _ in act_list]
+    offset = 0
+    for tier, count in importance_distribution.items():
+        if count <= 0:
+            continue
+        base, extra = divmod(count, len(act_list))
+        for i in range(len(act_list)):
+            tier_count = base + (1 if (i - offset) % len(act_list) < extra else 0)
+            if tier_count:
+                act_distributions[i][tier] = tier_count
+        offset = (offset + extra) % len(act_list)
+    
+    shards = []
+    for act_index, (act, distribution) in enumerate(zip(act_list, act_distributions)):
+        for tier, count in distribution.items():
+            while count > 0:
+                size = min(count, shard_size)
+                shards.append(EventShard(
+                    index=len(shards),
+                    act_index=act_index,
+                    selected_act=act,
+                    importance_distribution={tier: size}
+                ))
+                count -= size
+    return shards
+
+
+def merge_shard_events(shards: List[EventShard]) -> List[Dict[str, Any]]:
+    """
+    确定性合并分片结果
+    
+    按幕次顺序合并；同一幕次内所有事件都带有story_position时按其排序（稳定排序，
+    相同位置保持分片顺序），否则按分片顺序及分片内顺序排列。
+    """
+    merged = []
+    for act_index in sorted({shard.act_index for shard in shards}):
+        act_events = [
+            event_data
+            for shard in sorted(shards, key=lambda item: item.index) if shard.act_index == act_index
+            for event_data in shard.events_data
+        ]
+        positions = [event_data.get('story_position') for event_data in act_events]
+        if act_events and all(isinstance(position, (int, float)) for position in positions):
+            act_events = [event_data for _, event_data in
+                          sorted(zip(positions, act_events), key=lambda item: item[0])]
+        merged.extend(act_events)
+    return merged
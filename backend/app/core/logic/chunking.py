@@ -0,0 +1,158 @@
+"""
+长文本分块逻辑检查
+
+详细剧情按段落/场景边界切分为带重叠的若干块，各块并发检查；段落使用全文统一编号，
+合并时按问题位置（段落编号）去重，重叠段落中被相邻两块重复报告的问题只保留一条。
+"""
+import re
+from dataclasses import dataclass, field
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional
+
+
+# 场景分隔行：***、---、===、Markdown标题、【场景名】
+SCENE_BREAK_PATTERN = re.compile(r'^\s*(\*{3,}|-{3,}|={3,}|#{1,6}\s|【[^】]*】\s*$)')
+# 问题位置中的段落编号，如 "[P12]"、"P12-P13"
+PARAGRAPH_REF_PATTERN = re.compile(r'P(\d+)', re.IGNORECASE)
+# 同一位置的两条问题描述相似度达到该值时视为重复
+DUPLICATE_SIMILARITY = 0.6
+
+
+@dataclass
+class LogicChunk:
+    """检查分块"""
+    index: int
+    # 本块负责的段落范围（全文编号，从1开始，含两端）
+    start_paragraph: int
+    end_paragraph: int
+    # 块首与上一块重叠、仅作上下文的段落数
+    overlap: int
+    paragraphs: List[str] = field(default_factory=list)
+    attempts: int = 0
+    error: Optional[str] = None
+    analysis: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def text(self) -> str:
+        """带全文段落编号的分块正文"""
+        return number_paragraphs(self.paragraphs, self.start_paragraph - self.overlap)
+    
+    @property
+    def label(self) -> str:
+        return f"第{self.index + 1}块（第{self.start_paragraph}-{self.end_paragraph}段）"
+
+
+def split_paragraphs(content: str) -> List[str]:
+    """按行切分非空段落"""
+    return [line.strip() for line in content.split('\n') if line.strip()]
+
+
+def number_paragraphs(paragraphs: List[str], first: int = 1) -> str:
+    """在每段开头加上全文段落编号 [P编号]，供LLM在问题位置中引用"""
+    return "\n".join(f"[P{first + i}] {paragraph}" for i, paragraph in enumerate(paragraphs))
+
+
+def _is_scene_break(paragraph: str) -> bool:
+    return bool(SCENE_BREAK_PATTERN.match(paragraph))
+
+
+def plan_chunks(content: str, chunk_chars: int, overlap: int = 1) -> List[LogicChunk]:
+    """
+    规划检查分块
+    
+    段落依次累积到约chunk_chars字；块已超过一半长度时遇到场景分隔行提前换块，
+    使分块尽量落在场景边界上。每块（首块除外）在开头附带上一块末尾的overlap个段落作为上下文。
+    """
+    paragraphs = split_paragraphs(content)
+    ranges = []  # (起始下标, 结束下标)，左闭右开
+    start, size = 0, 0
+    for i, paragraph in enumerate(paragraphs):
+        if i > start and (size + len(paragraph) > chunk_chars or
+                          (_is_scene_break(paragraph) and size >= chunk_chars // 2)):
+            ranges.append((start, i))
+            start, size = i, 0
+        size += len(paragraph)
+    if start < len(paragraphs):
+        ranges.append((start, len(paragraphs)))
+    
+    chunks = []
+    for index, (range_start, range_end) in enumerate(ranges):
+        context_start = max(0, range_start - overlap) if index > 0 else range_start
+        chunks.append(LogicChunk(
+            index=index,
+            start_paragraph=range_start + 1,
+            end_paragraph=range_end,
+            overlap=range_start - context_start,
+            paragraphs=paragraphs[context_start:range_end]
+        ))
+    return chunks
+
+
+def build_chunk_note(chunk: LogicChunk, total: int) -> str:
+    """生成分块说明，告知LLM本块在全文中的范围和位置标注方式"""
+    lines = [f"本次只检查全文的{chunk.label}，共{total}块，其他块由其他检查任务负责。"]
+    if chunk.overlap:
+        lines.append(f"开头的第{chunk.start_paragraph - chunk.overlap}-{chunk.start_paragraph - 1}段属于上一块，"
+                     f"仅作为上下文参考，不要报告只出现在这些段落中的问题。")
+    lines.append("每段开头的 [P编号] 是全文段落编号，不属于正文；location 字段必须以段落编号开头，如 \"P12：……\"。")
+    return "\n".join(lines)
+
+
+def _location_key(issue: Dict[str, Any]) -> str:
+    """问题位置的归一化键：优先使用段落编号，否则使用去除空白后的位置描述"""
+    location = str(issue.get("location") or "")
+    refs = PARAGRAPH_REF_PATTERN.findall(location)
+    if refs:
+        return "P" + "-".join(sorted(set(refs), key=int))
+    return re.sub(r'\s+', '', location)
+
+
+def _is_duplicate(issue: Dict[str, Any], existing: Dict[str, Any]) -> bool:
+    description = str(issue.get("description") or "")
+    existing_description = str(existing.get("description") or "")
+    if not description or not existing_description:
+        return description == existing_description
+    return SequenceMatcher(None, description, existing_description).ratio() >= DUPLICATE_SIMILARITY
+
+
+def merge_chunk_analyses(chunks: List[LogicChunk]) -> Dict[str, Any]:
+    """
+    合并各块的分析结果
+    
+    问题按位置键分组，同一位置描述相近的问题只保留描述更详细的一条；
+    总结按块拼接，建议去重合并。未完成检查的块记入failed_chunks。
+    """
+    issues: List[Dict[str, Any]] = []
+    issues_by_location: Dict[str, List[Dict[str, Any]]] = {}
+    summaries, recommendations = [], []
+    failed_chunks = []
+    
+    for chunk in sorted(chunks, key=lambda item: item.index):
+        if chunk.error:
+            failed_chunks.append({"chunk": chunk.label, "error": chunk.error})
+            continue
+        
+        for issue in chunk.analysis.get("issues_found", []) or []:
+            if not isinstance(issue, dict):
+                continue
+            key = _location_key(issue)
+            same_location = issues_by_location.setdefault(key, [])
+            duplicate = next((existing for existing in same_location if _is_duplicate(issue, existing)), None)
+            if duplicate is None:
+                same_location.append(issue)
+                issues.append(issue)
+            elif len(str(issue.get("description") or "")) > len(str(duplicate.get("description") or "")):
+                duplicate.update(issue)
+        
+        if chunk.analysis.get("summary"):
+            summaries.append(f"{chunk.label}：{chunk.analysis['summary']}")
+        for recommendation in chunk.analysis.get("recommendations", []) or []:
+            if recommendation not in recommendations:
+                recommendations.append(recommendation)
+    
+    return {
+        "issues_found": issues,
+        "summary": "\n".join(summaries),
+        "recommendations": recommendations,
+        "failed_chunks": failed_chunks
+    }
@@ -1,18 +1,33 @@
 """
 逻辑检查引擎
 """
+import asyncio
 import json
 import uuid
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from app.core.config import settings
+from app.core.logic.chunking import (
+    LogicChunk, build_chunk_note, merge_chunk_analyses, number_paragraphs, plan_chunks, split_paragraphs
+)
+from app.core.logic.incremental import (
+    carry_forward_issues, locate_issue_paragraphs, paragraph_hashes, plan_incremental_check
+)
 from app.core.logic.models import (
     LogicCheckResult, LogicIssue, LogicDimension, LogicIssueSeverity,
     LogicStatus, LogicDimensionScore, LogicScoringRules
 )
+from app.core.logic.precheck import LogicPreChecker, format_precheck_hints, is_precheck_issue
 from app.utils.llm_client import get_llm_client
 from app.utils.prompt_manager import PromptManager
 from app.utils.dynamic_parser import dynamic_parser
+from app.utils.keyword_matcher import KeywordMatcher
+from app.utils.stage_cache import stage_cache
+
+
+# LLM响应无法解析时的状态标记，此类结果不缓存
+PARSE_FAILURE_STATUSES = ("无法解析", "解析错误")
 
 
 class LogicIssueClassifier:
@@ -32,6 +47,19 @@ class LogicIssueClassifier:
             LogicIssueSeverity.MEDIUM: ["问题", "不合理", "不当", "需要"],
             LogicIssueSeverity.LOW: ["建议", "可以", "考虑", "优化"]
         }
+        
+        self.auto_fixable_keywords = ["格式", "标点", "用词", "表达"]
+        self.refresh_matchers()
+    
+    def refresh_matchers(self):
+        """按关键词表构建匹配器（修改关键词表后需调用），表的顺序即匹配优先级"""
+        self._category_matcher = KeywordMatcher(
+            (keyword, category) for category, keywords in self.category_keywords.items() for keyword in keywords
+        )
+        self._severity_matcher = KeywordMatcher(
+            (keyword, severity) for severity, keywords in self.severity_keywords.items() for keyword in keywords
+        )
+        self._auto_fixable_matcher = KeywordMatcher(self.auto_fixable_keywords)
     
     def classify_issue(self, issue_text: str) -> LogicIssue:
         """分类逻辑问题"""
@@ -47,19 +75,17 @@ class LogicIssueClassifier:
             auto_fixable=self._is_auto_fixable(issue_text)
         )
     
+    def classify_issues(self, issue_texts: List[str]) -> List[LogicIssue]:
+        """批量分类逻辑问题"""
+        return [self.classify_issue(issue_text) for issue_text in issue_texts]
+    
     def _determine_category(self, text: str) -> str:
         """确定问题分类"""
-        for category, keywords in self.category_keywords.items():
-            if any(keyword in text for keyword in keywords):
-                return category
-        return "其他"
+        return self._category_matcher.first(text, "其他")
     
     def _determine_severity(self, text: str) -> LogicIssueSeverity:
         """确定问题严重程度"""
-        for severity, keywords in self.severity_keywords.items():
-            if any(keyword in text for keyword in keywords):
-                return severity
-        return LogicIssueSeverity.MEDIUM
+        return self._severity_matcher.first(text, LogicIssueSeverity.MEDIUM)
     
     def _map_category_to_dimension(self, category: str) -> LogicDimension:
         """将分类映射到维度"""
@@ -74,8 +100,7 @@ class LogicIssueClassifier:
     
     def _is_auto_fixable(self, text: str) -> bool:
         """判断是否可自动修复"""
-        auto_fixable_keywords = ["格式", "标点", "用词", "表达"]
-        return any(keyword in text for keyword in auto_fixable_keywords)
+        return self._auto_fixable_matcher.contains_any(text)
 
 
 class LogicScoringEngine:
@@ -152,52 +177,49 @@ class LogicCheckEngine:
         self.prompt_manager = PromptManager()
         self.classifier = LogicIssueClassifier()
         self.scoring_engine = LogicScoringEngine()
+        self.pre_checker = LogicPreChecker(classifier=self.classifier)
+        # 最近一次分块检查的各块执行情况
+        self.last_chunk_report: List[Dict[str, Any]] = []
     
-    async def check_logic(self, content: str, checked_by: str = "system") -> LogicCheckResult:
-        """执行逻辑检查"""
+    async def check_logic(self, content: str, checked_by: str = "system", context: str = "",
+                          chunked: Optional[bool] = None, characters: Optional[List[Any]] = None,
+                          world_info: Optional[Dict[str, Any]] = None) -> LogicCheckResult:
+        """
+        执行逻辑检查
+        
+        Args:
+            content: 待检查内容
+            checked_by: 检查者
+            context: 世界观、角色等设定背景，作为prompt前缀提供给LLM
+            chunked: 是否分块并发检查，None时内容超过LOGIC_CHECK_CHUNK_THRESHOLD字自动分块
+            characters: 角色列表，用于本地规则预检
+            world_info: 世界观数据，用于本地规则预检（境界体系）
+        """
         try:
-            # 1. 调用LLM进行逻辑分析
-            prompt = self.prompt_manager.get_logic_check_prompt(content)
-            response = await self.llm_client.generate_text(
-                prompt=prompt,
-                temperature=0.3,
-                max_tokens=20000
-            )
-            
-            # 2. 解析LLM响应
-            analysis_data = self._parse_llm_response(response)
-            
-            # 3. 分类问题
-            issues = []
-            for issue_data in analysis_data.get("issues_found", []):
-                issue = self.classifier.classify_issue(issue_data.get("description", ""))
-                # 更新从LLM解析的详细信息
-                issue.location = issue_data.get("location", "")
-                issue.suggestion = issue_data.get("suggestion", "")
-                issues.append(issue)
+            if chunked is None:
+                chunked = len(content) > settings.LOGIC_CHECK_CHUNK_THRESHOLD
             
-            # 4. 计算各维度分数
-            dimension_scores = self.scoring_engine.calculate_dimension_scores(issues)
+            # 0. 本地规则预检，结果作为提示交给LLM核实
+            precheck_issues = self._precheck(content, characters, world_info)
             
-            # 5. 计算总分
-            overall_score = self.scoring_engine.calculate_overall_score(dimension_scores)
+            # 1-2. 调用LLM进行逻辑分析并解析响应（相同内容复用上次的分析结果）
+            if chunked:
+                analysis_data = await self._analyze_chunked(content, context, precheck_issues)
+            else:
+                # 与分块检查一样带段落编号，问题位置可定位到段落（增量复查依赖段落编号）
+                text = number_paragraphs(split_paragraphs(content))
+                hints = format_precheck_hints(precheck_issues)
+                inputs = {"content": text}
+                if context:
+                    inputs["context"] = context
+                if hints:
+                    inputs["hints"] = hints
+                analysis_data = await stage_cache.memoize(
+                    "logic_check", inputs, lambda: self._analyze_content(text, context, hints=hints),
+                    cacheable=lambda data: data.get("overall_status") not in PARSE_FAILURE_STATUSES
+                )
             
-            # 6. 判断状态
-            status = self.scoring_engine.determine_status(overall_score, issues)
-            
-            # 7. 生成建议
-            recommendations = analysis_data.get("recommendations", [])
-            
-            return LogicCheckResult(
-                overall_status=status,
-                logic_score=overall_score,
-                issues_found=issues,
-                dimension_scores=dimension_scores,
-                summary=analysis_data.get("summary", ""),
-                recommendations=recommendations,
-                checked_at=datetime.now(),
-                checked_by=checked_by
-            )
+            return self._build_result(analysis_data, split_paragraphs(content), checked_by)
             
         except Exception as e:
             # 返回错误结果
@@ -212,6 +234,206 @@ class LogicCheckEngine:
                 checked_by=checked_by
             )
     
+    async def check_logic_incremental(self, content: str, previous: LogicCheckResult,
+                                      checked_by: str = "system", context: str = "",
+                                      characters: Optional[List[Any]] = None,
+                                      world_info: Optional[Dict[str, Any]] = None) -> LogicCheckResult:
+        """
+        增量逻辑复查
+        
+        按段落哈希对比上次检查时的内容，只把变化段落及前后LOGIC_RECHECK_WINDOW段交给LLM复查，
+        未变化段落上的问题直接沿用，最后对全部问题统一评分。上次结果没有段落哈希、有无法定位到段落的问题或
+        变化段落占比超过LOGIC_RECHECK_MAX_CHANGED_RATIO时执行完整检查；变化段落总字数
+        不超过LOGIC_PRECHECK_TRIVIAL_EDIT_CHARS时跳过LLM，只有变化段落改用本地规则预检结果（均为低严重程度提示），
+        邻近未变化段落上的问题照常沿用。
+        """
+        full_check = lambda: self.check_logic(content, checked_by, context=context,
+                                              characters=characters, world_info=world_info)
+        if not previous or not previous.paragraph_hashes:
+            return await full_check()
+        if any(not issue.paragraphs for issue in previous.issues_found):
+            # 无法判断这些问题是否已被修改，不能沿用也不能丢弃
+            print("🔁 上次检查结果中有无法定位到段落的问题，执行完整逻辑检查")
+            return await full_check()
+        
+        try:
+            paragraphs, mapping, changed, chunks = plan_incremental_check(
+                previous.paragraph_hashes, content, settings.LOGIC_RECHECK_WINDOW
+            )
+            rechecked = {number for chunk in chunks
+                         for number in range(chunk.start_paragraph, chunk.end_paragraph + 1)}
+            if paragraphs and len(rechecked) / len(paragraphs) > settings.LOGIC_RECHECK_MAX_CHANGED_RATIO:
+                print(f"🔁 变化段落较多（复查{len(rechecked)}/{len(paragraphs)}段），执行完整逻辑检查")
+                return await full_check()
+            
+            edited_chars = sum(len(paragraphs[number - 1]) for number in changed)
+            trivial_edit = bool(chunks) and edited_chars <= settings.LOGIC_PRECHECK_TRIVIAL_EDIT_CHARS
+            # 跳过LLM时邻近窗口未被重新检查，只有变化段落上的历史问题需要重新判断
+            rechecked = changed if trivial_edit else rechecked
+            carried = carry_forward_issues(
+                [issue.dict() for issue in previous.issues_found], mapping, rechecked
+            )
+            print(f"🔁 增量逻辑复查：复查{len(rechecked)}/{len(paragraphs)}段（{len(chunks)}个区间），"
+                  f"沿用{len(carried)}个问题")
+            
+            precheck_issues = self._precheck(content, characters, world_info) if chunks else []
+            if trivial_edit:
+                # 改动很小：跳过LLM，变化段落只采用规则预检发现的问题
+                region_issues = [issue.dict() for issue in precheck_issues if set(issue.paragraphs) & rechecked]
+                print(f"⚡ 改动仅{edited_chars}字，跳过LLM复查，规则预检发现{len(region_issues)}个问题")
+                analysis_data = {"issues_found": region_issues,
+                                 "summary": f"改动仅{edited_chars}字，变化段落使用本地规则预检结果",
+                                 "recommendations": list(previous.recommendations)}
+            elif chunks:
+                analysis_data = await self._check_chunks(chunks, context, precheck_issues)
+            else:
+                # 内容未变化：沿用上次的总结（去掉上次增量复查的说明行）
+                previous_summary = previous.summary
+                if previous_summary.startswith("增量复查："):
+                    previous_summary = previous_summary.partition("\n")[2]
+                analysis_data = {"issues_found": [], "summary": previous_summary,
+                                 "recommendations": list(previous.recommendations)}
+            
+            analysis_data["issues_found"] = carried + analysis_data.get("issues_found", [])
+            summary = f"增量复查：重新检查{len(rechecked)}/{len(paragraphs)}段，沿用未变化段落的{len(carried)}个问题"
+            analysis_data["summary"] = f"{summary}\n{analysis_data['summary']}" if analysis_data.get("summary") else summary
+            return self._build_result(analysis_data, paragraphs, checked_by)
+        
+        except Exception as e:
+            print(f"⚠️ 增量逻辑复查失败，执行完整检查: {e}")
+            return await full_check()
+    
+    def _precheck(self, content: str, characters: Optional[List[Any]] = None,
+                  world_info: Optional[Dict[str, Any]] = None) -> List[LogicIssue]:
+        """本地规则预检，失败时不影响LLM检查"""
+        if not settings.LOGIC_PRECHECK_ENABLED:
+            return []
+        try:
+            issues = self.pre_checker.check(content, characters, world_info)
+            if issues:
+                print(f"📏 规则预检发现{len(issues)}个疑似问题")
+            return issues
+        except Exception as e:
+            print(f"⚠️ 规则预检失败: {e}")
+            return []
+    
+    def _build_result(self, analysis_data: Dict[str, Any], paragraphs: List[str],
+                      checked_by: str) -> LogicCheckResult:
+        """对分析结果中的全部问题统一分类、评分并生成检查结果"""
+        # 3. 分类问题
+        issues_data = analysis_data.get("issues_found", [])
+        issues = self.classifier.classify_issues([issue_data.get("description", "") for issue_data in issues_data])
+        for issue, issue_data in zip(issues, issues_data):
+            # 更新从LLM解析的详细信息
+            issue.location = issue_data.get("location", "")
+            issue.suggestion = issue_data.get("suggestion", "")
+            issue.paragraphs = issue_data.get("paragraphs") or locate_issue_paragraphs(issue_data, paragraphs)
+            if is_precheck_issue(issue.description):
+                # 规则预检问题只作为提示（跳过LLM的小改动、沿用的历史预检问题），不按关键词定级
+                issue.severity = LogicIssueSeverity.LOW
+        
+        # 4. 计算各维度分数
+        dimension_scores = self.scoring_engine.calculate_dimension_scores(issues)
+        
+        # 5. 计算总分
+        overall_score = self.scoring_engine.calculate_overall_score(dimension_scores)
+        
+        # 6. 判断状态
+        status = self.scoring_engine.determine_status(overall_score, issues)
+        
+        # 7. 生成建议
+        recommendations = analysis_data.get("recommendations", [])
+        summary = analysis_data.get("summary", "")
+        
+        # 分块检查有未完成的块时，结果不完整，不能直接判为通过
+        failed_chunks = analysis_data.get("failed_chunks") or []
+        if failed_chunks:
+            failed_labels = "、".join(item["chunk"] for item in failed_chunks)
+            summary = f"{summary}\n（{failed_labels}未能完成检查）".strip()
+            recommendations = recommendations + [f"{failed_labels}未能完成逻辑检查，建议重新检查"]
+            if status == LogicStatus.PASSED:
+                status = LogicStatus.MANUAL_REVIEW
+        
+        return LogicCheckResult(
+            overall_status=status,
+            logic_score=overall_score,
+            issues_found=issues,
+            dimension_scores=dimension_scores,
+            summary=summary,
+            recommendations=recommendations,
+            checked_at=datetime.now(),
+            checked_by=checked_by,
+            # 有未完成检查的块时不记录段落哈希，下次复查执行完整检查
+            paragraph_hashes=[] if failed_chunks else paragraph_hashes(paragraphs)
+        )
+    
+    async def _analyze_content(self, content: str, context: str = "", chunk_note: str = "",
+                               max_tokens: int = 20000, hints: str = "") -> Dict[str, Any]:
+        """调用LLM分析内容逻辑"""
+        prompt = self.prompt_manager.get_logic_check_prompt(content, context, chunk_note, hints)
+        response = await self.llm_client.generate_text(
+            prompt=prompt,
+            temperature=0.3,
+            max_tokens=max_tokens
+        )
+        return self._parse_llm_response(response)
+    
+    async def _analyze_chunked(self, content: str, context: str = "",
+                               precheck_issues: Optional[List[LogicIssue]] = None) -> Dict[str, Any]:
+        """
+        分块并发检查并合并结果
+        
+        各块共享同一设定背景前缀，单块失败（LLM异常或响应无法解析）时只重试该块；
+        全部块都失败时抛出异常，部分失败时在合并结果的failed_chunks中记录。
+        """
+        chunks = plan_chunks(content, settings.LOGIC_CHECK_CHUNK_CHARS, settings.LOGIC_CHECK_CHUNK_OVERLAP)
+        print(f"🧩 分块逻辑检查：{len(content)}字，切分为{len(chunks)}块")
+        return await self._check_chunks(chunks, context, precheck_issues)
+    
+    async def _check_chunks(self, chunks: List[LogicChunk], context: str = "",
+                            precheck_issues: Optional[List[LogicIssue]] = None) -> Dict[str, Any]:
+        """并发检查各块（各块只带本块范围内的预检提示），失败块单独重试，合并各块结果"""
+        if not chunks:
+            # 没有可检查的段落（如空白正文）
+            self.last_chunk_report = []
+            return merge_chunk_analyses([])
+        
+        async def check_chunk(chunk: LogicChunk):
+            chunk_note = build_chunk_note(chunk, len(chunks))
+            text = chunk.text
+            first = chunk.start_paragraph - chunk.overlap
+            hints = format_precheck_hints([
+                issue for issue in precheck_issues or []
+                if any(first <= number <= chunk.end_paragraph for number in issue.paragraphs)
+            ])
+            for attempt in range(settings.LOGIC_CHECK_CHUNK_MAX_RETRIES + 1):
+                chunk.attempts = attempt + 1
+                try:
+                    data = await stage_cache.memoize(
+                        "logic_check", {"content": text, "context": context, "chunk_note": chunk_note, "hints": hints},
+                        lambda: self._analyze_content(text, context, chunk_note,
+                                                      max_tokens=settings.LOGIC_CHECK_CHUNK_MAX_TOKENS, hints=hints),
+                        cacheable=lambda data: data.get("overall_status") not in PARSE_FAILURE_STATUSES
+                    )
+                    if data.get("overall_status") in PARSE_FAILURE_STATUSES:
+                        raise ValueError(data.get("summary") or data.get("overall_status"))
+                    chunk.analysis, chunk.error = data, None
+                    return
+                except Exception as e:
+                    chunk.error = str(e)
+                    print(f"⚠️ {chunk.label}第{attempt + 1}次检查失败: {e}")
+        
+        await asyncio.gather(*(check_chunk(chunk) for chunk in chunks))
+        
+        failed = [chunk for chunk in chunks if chunk.error]
+        self.last_chunk_report = [
+            {"chunk": chunk.label, "attempts": chunk.attempts, "error": chunk.error} for chunk in chunks
+        ]
+        if len(failed) == len(chunks):
+            raise RuntimeError(f"所有分块检查均失败: {failed[0].error}")
+        print(f"✅ 分块逻辑检查完成：{len(chunks) - len(failed)}/{len(chunks)}块成功")
+        return merge_chunk_analyses(chunks)
+    
     def _parse_llm_response(self, response: str) -> Dict[str, Any]:
         """解析LLM响应"""
         try:
@@ -0,0 +1,114 @@
+"""
+增量逻辑复查
+
+逻辑检查结果中保存各段落的内容哈希，问题记录所在段落编号。内容修正或进化后，
+按段落哈希对比新旧内容，只把变化段落及其邻近窗口重新交给LLM检查，
+未变化段落上的问题直接沿用（段落编号按新内容重新映射）。
+"""
+import hashlib
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.logic.chunking import PARAGRAPH_REF_PATTERN, LogicChunk, split_paragraphs
+
+
+# 问题描述/位置中引用原文的片段：「」、“”、‘’、""
+QUOTE_PATTERN = re.compile(r'[「“‘"]([^」”’"]{4,})[」”’"]')
+
+
+def paragraph_hashes(paragraphs: List[str]) -> List[str]:
+    """计算各段落内容哈希"""
+    return [hashlib.sha1(paragraph.encode('utf-8')).hexdigest()[:16] for paragraph in paragraphs]
+
+
+def locate_issue_paragraphs(issue_data: Dict[str, Any], paragraphs: List[str],
+                            first: int = 1, last: Optional[int] = None) -> List[int]:
+    """
+    确定问题所在的段落编号（从1开始）
+    
+    优先使用位置中的段落编号（限定在[first, last]范围内），否则按位置/描述中引用的原文片段查找段落。
+    """
+    last = last or len(paragraphs)
+    location = str(issue_data.get("location") or "")
+    numbers = sorted({int(ref) for ref in PARAGRAPH_REF_PATTERN.findall(location) if first <= int(ref) <= last})
+    if numbers:
+        return numbers
+    
+    quotes = QUOTE_PATTERN.findall(location + " " + str(issue_data.get("description") or ""))
+    return sorted({
+        number for number in range(first, last + 1)
+        if any(quote in paragraphs[number - 1] for quote in quotes)
+    })
+
+
+def diff_paragraphs(old_hashes: List[str], new_hashes: List[str]) -> Tuple[Dict[int, int], Set[int]]:
+    """
+    对比新旧段落哈希
+    
+    Returns:
+        (未变化段落的旧编号→新编号映射, 发生变化的新段落编号集合)；
+        删除段落时，删除位置前后的新段落计为变化，以便复查衔接处
+    """
+    mapping: Dict[int, int] = {}
+    changed: Set[int] = set()
+    matcher = SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == "equal":
+            for offset in range(old_end - old_start):
+                mapping[old_start + offset + 1] = new_start + offset + 1
+        elif new_end > new_start:
+            changed.update(range(new_start + 1, new_end + 1))
+        else:
+            changed.update(number for number in (new_start, new_start + 1) if 1 <= number <= len(new_hashes))
+    return mapping, changed
+
+
+def plan_recheck_chunks(paragraphs: List[str], changed: Set[int], window: int) -> List[LogicChunk]:
+    """把变化段落向两侧扩展window段后合并为连续区间，每个区间作为一个复查块"""
+    ranges: List[List[int]] = []
+    for number in sorted(changed):
+        start, end = max(1, number - window), min(len(paragraphs), number + window)
+        if ranges and start <= ranges[-1][1] + 1:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    
+    return [
+        LogicChunk(index=index, start_paragraph=start, end_paragraph=end, overlap=0,
+                   paragraphs=paragraphs[start - 1:end])
+        for index, (start, end) in enumerate(ranges)
+    ]
+
+
+def carry_forward_issues(previous_issues: List[Dict[str, Any]], mapping: Dict[int, int],
+                         rechecked: Set[int]) -> List[Dict[str, Any]]:
+    """
+    沿用未变化段落上的历史问题
+    
+    问题涉及的段落全部未变化且都不在复查范围内时沿用，段落编号及位置中的编号按新内容更新；
+    无法定位到段落的问题不沿用（调用方应对此类结果执行完整检查）。
+    """
+    carried = []
+    for issue in previous_issues:
+        numbers = issue.get("paragraphs") or []
+        if not numbers or any(number not in mapping or mapping[number] in rechecked for number in numbers):
+            continue
+        location = PARAGRAPH_REF_PATTERN.sub(
+            lambda match: f"P{mapping.get(int(match.group(1)), int(match.group(1)))}",
+            str(issue.get("location") or "")
+        )
+        carried.append({**issue, "location": location, "paragraphs": [mapping[number] for number in numbers]})
+    return carried
+
+
+def plan_incremental_check(previous_hashes: List[str], content: str, window: int):
+    """
+    规划增量复查
+    
+    Returns:
+        (新段落列表, 未变化段落映射, 变化段落编号集合, 复查块列表)
+    """
+    paragraphs = split_paragraphs(content)
+    mapping, changed = diff_paragraphs(previous_hashes, paragraph_hashes(paragraphs))
+    return paragraphs, mapping, changed, plan_recheck_chunks(paragraphs, changed, window)
@@ -42,6 +42,7 @@ class LogicIssue(BaseModel):
     suggestion: str = Field("", description="修改建议")
     auto_fixable: bool = Field(False, description="是否可自动修复")
     dimension: LogicDimension = Field(..., description="所属维度")
+    paragraphs: List[int] = Field(default_factory=list, description="问题所在段落编号（从1开始）")
 
 
 class LogicDimensionScore(BaseModel):
@@ -62,6 +63,7 @@ class LogicCheckResult(BaseModel):
     recommendations: List[str] = Field(default_factory=list, description="改进建议")
     checked_at: datetime = Field(default_factory=datetime.now, description="检查时间")
     checked_by: str = Field("system", description="检查者")
+    paragraph_hashes: List[str] = Field(default_factory=list, description="各段落内容哈希（增量复查用）")
 
 
 class LogicCheckHistory(BaseModel):
@@ -0,0 +1,236 @@
+"""
+逻辑检查本地规则预检
+
+在调用LLM之前，从正文中抽取境界、灵根属性、法宝品级和角色等实体提及，
+按世界观境界体系和 RuleEngine 规则校验，产出与LLM结果同格式的 LogicIssue。
+预检结果作为提示提供给LLM核实；改动很小时可直接代替LLM复查。预检无法完整理解句意，
+产出的问题一律为低严重程度，只作为提示，不会单独导致检查不通过。
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.logic.chunking import split_paragraphs
+from app.core.logic.models import LogicIssue, LogicIssueSeverity
+from app.utils.keyword_matcher import KeywordMatcher
+
+
+# 境界名称的常见后缀，匹配时去掉后缀只比较主体（练气期/练气境 → 练气）
+REALM_SUFFIXES = ("期", "境", "阶")
+# 默认境界体系的别名
+REALM_ALIASES = {"炼气": "练气"}
+BREAKTHROUGH_VERBS = ("突破", "晋升", "晋入", "踏入", "迈入", "步入", "进阶", "晋级")
+ARTIFACT_USE_VERBS = ("祭出", "催动", "驾驭", "使用", "操控")
+TECHNIQUE_VERBS = ("修炼", "修习", "参悟", "学习")
+SENTENCE_PATTERN = re.compile(r'[^。！？!?；;]+[。！？!?；;]?')
+ARTIFACT_PATTERN = re.compile(r'([一二三四五六七八九1-9])品(?:法宝|法器|灵器|宝器)')
+TECHNIQUE_ELEMENT_PATTERN = re.compile(r'([金木水火土])(?:属性|系|行)(?:功法|法术|神通|心法)')
+CHINESE_DIGITS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+# 角色名后紧跟这些词时，句子说的是角色的亲友/所属之物（如"林凡的师父"），角色本人不是主语
+POSSESSIVE_SUFFIXES = ("的", "之", "家", "手下", "麾下", "身边", "身旁", "师父", "师尊", "师兄", "师姐",
+                       "师弟", "师妹", "父亲", "母亲", "兄长", "妹妹", "弟弟", "姐姐")
+# 预检问题描述的标记，用于在评分时识别预检问题
+PRECHECK_MARK = "（规则预检）"
+
+
+def _strip_realm(name: str) -> str:
+    name = str(name or "").strip()
+    for suffix in REALM_SUFFIXES:
+        if len(name) > len(suffix) and name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    return REALM_ALIASES.get(name, name)
+
+
+def _brief(text: str, length: int = 30) -> str:
+    return text if len(text) <= length else text[:length] + "..."
+
+
+def is_precheck_issue(description: str) -> bool:
+    """问题是否由规则预检产生"""
+    return str(description or "").endswith(PRECHECK_MARK)
+
+
+def _subject(sentence: str, names: List[str]) -> Optional[str]:
+    """句子的主语角色：只有一个角色以本人身份（非"某某的……"）出现时才能确定"""
+    subjects = []
+    for name in names:
+        for match in re.finditer(re.escape(name), sentence):
+            if not sentence.startswith(POSSESSIVE_SUFFIXES, match.end()):
+                subjects.append(name)
+                break
+    return subjects[0] if len(subjects) == 1 else None
+
+
+class LogicPreChecker:
+    """本地规则预检器"""
+    
+    def __init__(self, rule_engine=None, classifier=None):
+        self._rule_engine = rule_engine
+        self._classifier = classifier
+    
+    @property
+    def rule_engine(self):
+        if self._rule_engine is None:
+            from app.core.world.rule_engine import RuleEngine
+            self._rule_engine = RuleEngine()
+        return self._rule_engine
+    
+    @property
+    def classifier(self):
+        if self._classifier is None:
+            from app.core.logic.engine import LogicIssueClassifier
+            self._classifier = LogicIssueClassifier()
+        return self._classifier
+    
+    def realm_order(self, world_info: Optional[Dict[str, Any]] = None) -> List[str]:
+        """境界顺序：优先使用世界观力量体系中的境界，否则使用默认境界体系"""
+        realms = []
+        if isinstance(world_info, dict):
+            power_system = world_info.get('power_system') or {}
+            if isinstance(power_system, dict):
+                for realm in power_system.get('cultivation_realms') or []:
+                    name = _strip_realm(realm.get('name') if isinstance(realm, dict) else realm)
+                    if name and name not in realms:
+                        realms.append(name)
+        if not realms:
+            from app.core.world.models import CultivationLevel
+            realms = [level.value for level in CultivationLevel]
+        return realms
+    
+    def check(self, content: str, characters: Optional[List[Any]] = None,
+              world_info: Optional[Dict[str, Any]] = None) -> List[LogicIssue]:
+        """
+        对全文执行规则预检
+        
+        逐段逐句抽取实体提及：境界突破（与前文或角色设定的当前境界比较）、
+        角色使用法宝（品级与境界）、角色修炼属性功法（与灵根属性相性）。
+        """
+        realms = self.realm_order(world_info)
+        realm_names = sorted(realms + [alias for alias in REALM_ALIASES if REALM_ALIASES[alias] in realms],
+                             key=len, reverse=True)
+        
+        # 角色当前境界与灵根属性（正文中突破后更新）
+        levels: Dict[str, str] = {}
+        elements: Dict[str, str] = {}
+        for char in characters or []:
+            if not isinstance(char, dict):
+                char = getattr(char, '__dict__', {})
+            name = str(char.get('name') or '').strip()
+            if not name:
+                continue
+            level = self._find_realms(str(char.get('cultivation_level') or ''), realm_names)
+            if level:
+                levels[name] = level[0][1]
+            element = str(char.get('element_type') or '')
+            if element[:1] in "金木水火土":
+                elements[name] = element[:1]
+        
+        name_matcher = KeywordMatcher(list(levels.keys() | elements.keys()))
+        issues: List[LogicIssue] = []
+        for number, paragraph in enumerate(split_paragraphs(content), 1):
+            for sentence in SENTENCE_PATTERN.findall(paragraph):
+                subject = _subject(sentence, name_matcher.find(sentence))
+                mentions = self._find_realms(sentence, realm_names)
+                
+                issue = self._check_progression(sentence, mentions, subject, levels, realms)
+                if issue is None and subject:
+                    issue = (self._check_artifact(sentence, subject, levels)
+                             or self._check_element(sentence, subject, elements))
+                if issue is not None:
+                    issue.location = f"P{number}：「{_brief(sentence.strip())}」"
+                    issue.paragraphs = [number]
+                    issues.append(issue)
+        return issues
+    
+    def _find_realms(self, text: str, realm_names: List[str]) -> List[tuple]:
+        """按出现位置返回 (位置, 规范境界名) 列表，长名称优先且不重叠"""
+        found, occupied = [], set()
+        for name in realm_names:
+            for match in re.finditer(re.escape(name), text):
+                span = set(range(match.start(), match.end()))
+                if span & occupied:
+                    continue
+                occupied |= span
+                found.append((match.start(), REALM_ALIASES.get(name, name)))
+        return sorted(found)
+    
+    def _issue(self, description: str, suggestion: str) -> LogicIssue:
+        issue = self.classifier.classify_issue(f"{description}{PRECHECK_MARK}")
+        issue.severity = LogicIssueSeverity.LOW
+        issue.suggestion = suggestion
+        return issue
+    
+    def _check_progression(self, sentence: str, mentions: List[tuple], subject: Optional[str],
+                           levels: Dict[str, str], realms: List[str]) -> Optional[LogicIssue]:
+        """境界突破必须逐级进行"""
+        verb_positions = [sentence.find(verb) for verb in BREAKTHROUGH_VERBS if verb in sentence]
+        if not verb_positions or not mentions:
+            return None
+        verb_position = min(verb_positions)
+        targets = [realm for position, realm in mentions if position > verb_position]
+        sources = [realm for position, realm in mentions if position < verb_position]
+        if not targets:
+            return None
+        target = targets[-1]
+        current = sources[-1] if sources else levels.get(subject) if subject else None
+        if subject:
+            levels[subject] = target
+        if not current or current not in realms or target not in realms:
+            return None
+        if realms.index(target) <= realms.index(current) + 1:
+            return None
+        
+        rule = self.rule_engine.get_rule("cultivation_level_progression")
+        violations = self.rule_engine.check_rule_violation({
+            "cultivation_progression": {"current_level": current, "target_level": target}
+        }) if current in self._default_levels() and target in self._default_levels() else []
+        description = violations[0] if violations else f"修炼境界提升不合理：从{current}直接跳到{target}"
+        return self._issue(
+            f"{description}，违反「{rule.name if rule else '境界提升规则'}」",
+            f"补充{current}到{target}之间的境界过渡，或调整为只提升一个大境界"
+        )
+    
+    def _check_artifact(self, sentence: str, subject: str, levels: Dict[str, str]) -> Optional[LogicIssue]:
+        """法宝品级不能超过使用者境界的上限"""
+        match = ARTIFACT_PATTERN.search(sentence)
+        level = levels.get(subject)
+        if not match or not level or level not in self._default_levels():
+            return None
+        if not any(verb in sentence for verb in ARTIFACT_USE_VERBS):
+            return None
+        grade = CHINESE_DIGITS.get(match.group(1)) or int(match.group(1))
+        violations = self.rule_engine.check_rule_violation({
+            "artifact_usage": {"grade": grade, "user_level": level}
+        })
+        if not violations:
+            return None
+        return self._issue(
+            f"{subject}{violations[0]}，违反「法宝品级威力」规则",
+            "降低法宝品级，或交代借助外力、法宝认主等使用条件"
+        )
+    
+    def _check_element(self, sentence: str, subject: str, elements: Dict[str, str]) -> Optional[LogicIssue]:
+        """修炼与自身灵根相克的属性功法需要合理交代"""
+        match = TECHNIQUE_ELEMENT_PATTERN.search(sentence)
+        element = elements.get(subject)
+        if not match or not element or not any(verb in sentence for verb in TECHNIQUE_VERBS):
+            return None
+        violations = self.rule_engine.check_rule_violation({
+            "element_interaction": {"element1": element, "element2": match.group(1)}
+        })
+        if not violations:
+            return None
+        return self._issue(
+            f"{subject}（{element}灵根）{violations[0]}，需要交代修炼该功法的合理性",
+            "说明克服属性相克的方法或代价，或改为与灵根相生的功法"
+        )
+    
+    @staticmethod
+    def _default_levels() -> List[str]:
+        from app.core.world.models import CultivationLevel
+        return [level.value for level in CultivationLevel]
+
+
+def format_precheck_hints(issues: List[LogicIssue]) -> str:
+    """把预检问题格式化为LLM提示"""
+    return "\n".join(f"- {issue.location}：{issue.description}" for issue in issues)
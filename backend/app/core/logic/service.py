@@ -30,9 +30,68 @@ class LogicReflectionService:
         except Exception as e:
             return {"status": "error", "message": str(e)}
     
-    async def check_logic_detailed(self, content: str, checked_by: str = "system") -> LogicCheckResult:
-        """详细逻辑检查（新接口）"""
-        return await self.logic_engine.check_logic(content, checked_by)
+    async def check_logic_detailed(self, content: str, checked_by: str = "system",
+                                   plot_outline_id: Optional[str] = None,
+                                   chunked: Optional[bool] = None,
+                                   previous_result: Optional[LogicCheckResult] = None) -> LogicCheckResult:
+        """
+        详细逻辑检查（新接口）
+        
+        提供剧情大纲ID时附带世界观和角色设定；提供上次检查结果时只复查变化的段落。
+        """
+        world_info, characters = await self.load_check_setting(plot_outline_id) if plot_outline_id else (None, [])
+        context = self.format_check_context(world_info, characters)
+        if isinstance(previous_result, dict):
+            try:
+                previous_result = LogicCheckResult(**previous_result)
+            except Exception:
+                previous_result = None
+        if previous_result:
+            return await self.logic_engine.check_logic_incremental(
+                content, previous_result, checked_by, context=context,
+                characters=characters, world_info=world_info
+            )
+        return await self.logic_engine.check_logic(
+            content, checked_by, context=context, chunked=chunked,
+            characters=characters, world_info=world_info
+        )
+    
+    async def load_check_setting(self, plot_outline_id: str):
+        """加载剧情大纲对应的世界观和角色，返回 (世界观数据, 角色列表)，失败时返回 (None, [])"""
+        try:
+            from app.utils.entity_loader import get_entity_loader
+            loader = get_entity_loader()
+            plot_info = await loader.get_plot_outline(plot_outline_id)
+            worldview_id = getattr(plot_info, 'worldview_id', None) or plot_outline_id
+            world_info, characters = await asyncio.gather(
+                loader.get_worldview(worldview_id),
+                loader.get_characters_by_worldview(worldview_id)
+            )
+            return world_info, characters or []
+        except Exception as e:
+            print(f"⚠️ 加载逻辑检查设定背景失败: {e}")
+            return None, []
+    
+    def format_check_context(self, world_info: Optional[Dict[str, Any]], characters: List[Any]) -> str:
+        """生成逻辑检查的设定背景：核心概念、境界体系和主要角色"""
+        lines = []
+        if isinstance(world_info, dict):
+            if world_info.get('core_concept'):
+                lines.append(f"核心概念: {world_info['core_concept']}")
+            if world_info.get('description'):
+                lines.append(f"世界观描述: {world_info['description']}")
+            power_system = world_info.get('power_system')
+            if isinstance(power_system, dict) and power_system.get('cultivation_realms'):
+                realms = self.logic_engine.pre_checker.realm_order(world_info)
+                lines.append(f"境界体系: {'→'.join(realms)}")
+        if characters:
+            lines.append("主要角色:")
+            for char in characters[:10]:
+                if not isinstance(char, dict):
+                    char = getattr(char, '__dict__', {})
+                lines.append(f"- {char.get('name', '未知角色')}（{char.get('role_type', '未知类型')}，"
+                             f"{char.get('cultivation_level', '未知境界')}）: {char.get('background', '无背景信息')}")
+        return "\n".join(lines)
     
     async def generate_reflection_report(self, content: str) -> Dict[str, Any]:
         """生成反思报告"""
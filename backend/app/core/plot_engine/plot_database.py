@@ -8,6 +8,7 @@ from datetime import datetime
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from app.core.config import settings
+from app.utils.entity_loader import invalidate_entity
 from .plot_models import PlotOutline, PlotStatus
 
 
@@ -26,6 +27,7 @@ class PlotOutlineDatabase:
     
     def save_plot_outline(self, plot_outline: PlotOutline) -> bool:
         """保存剧情大纲到数据库"""
+        invalidate_entity("plot_outlines", plot_outline.id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -160,6 +162,24 @@ class PlotOutlineDatabase:
             print(f"❌ 获取剧情大纲失败: {e}")
             return None
     
+    def get_plot_outlines_by_ids(self, plot_ids: List[str]) -> Dict[str, PlotOutline]:
+        """批量获取剧情大纲，返回以ID为键的字典"""
+        if not plot_ids:
+            return {}
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT * FROM plot_outlines WHERE id = ANY(%s)
+                    """, (list(plot_ids),))
+                    rows = cursor.fetchall()
+                    
+                    return {row['id']: self._row_to_plot_outline(dict(row)) for row in rows}
+                    
+        except Exception as e:
+            print(f"❌ 批量获取剧情大纲失败: {e}")
+            return {}
+    
     def get_plot_outlines_by_worldview(self, worldview_id: str = None, status: str = None, limit: int = 20, offset: int = 0) -> List[PlotOutline]:
         """根据条件获取剧情大纲列表"""
         try:
@@ -210,6 +230,7 @@ class PlotOutlineDatabase:
     
     def update_plot_outline_status(self, plot_id: str, status: PlotStatus) -> bool:
         """更新剧情大纲状态"""
+        invalidate_entity("plot_outlines", plot_id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -232,6 +253,7 @@ class PlotOutlineDatabase:
     
     def delete_plot_outline(self, plot_id: str) -> bool:
         """删除剧情大纲（检查是否有关联的章节大纲）"""
+        invalidate_entity("plot_outlines", plot_id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
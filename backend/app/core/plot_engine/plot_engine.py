@@ -11,6 +11,7 @@ from app.utils.llm_client import get_llm_client
 from app.utils.prompt_manager import PromptManager
 from app.utils.markdown_generator import MarkdownGenerator
 from app.utils.logger import debug_log, error_log, info_log
+from app.utils.best_of_n import best_of_n
 from .plot_database import PlotOutlineDatabase
 import sys
 import os
@@ -66,11 +67,16 @@ class PlotOutlineEngine:
             protagonist_info = await self._get_protagonist_context(request.protagonist_character_id)
             debug_log("获取主角信息", protagonist_info.get('name', '未知'))
             
-            # 3. 生成剧情大纲数据
+            # 3. 生成剧情大纲数据（candidate_count > 1 时并行生成多个候选并择优）
             debug_log("开始调用LLM生成剧情大纲数据...")
-            plot_outline_data = await self._generate_plot_outline_data(
-                request, worldview_info, protagonist_info
-            )
+            if request.candidate_count > 1:
+                plot_outline_data = await self._generate_best_plot_outline_data(
+                    request, worldview_info, protagonist_info
+                )
+            else:
+                plot_outline_data = await self._generate_plot_outline_data(
+                    request, worldview_info, protagonist_info
+                )
             debug_log("LLM生成完成，数据长度", len(str(plot_outline_data)))
             
             # 4. 创建剧情大纲对象
@@ -381,6 +387,24 @@ class PlotOutlineEngine:
             error_log("LLM原始响应", response[:500])
             raise ValueError(f"LLM响应解析失败: {e}")
     
+    async def _generate_best_plot_outline_data(self, request: PlotOutlineRequest,
+                                               worldview_info: Dict[str, Any],
+                                               protagonist_info: Dict[str, Any]) -> Dict[str, Any]:
+        """并行生成多个剧情大纲候选，按智能评分保留最佳候选"""
+        from app.core.scoring.intelligent_scoring_service import IntelligentScoringService
+        scoring_service = IntelligentScoringService()
+        
+        async def generate(index: int) -> Dict[str, Any]:
+            return await self._generate_plot_outline_data(request, worldview_info, protagonist_info)
+        
+        async def score(plot_data: Dict[str, Any]) -> float:
+            scoring_data = await scoring_service.evaluate_content(json.dumps(plot_data, ensure_ascii=False))
+            return scoring_data.get("total_score", 0.0) / 10
+        
+        result = await best_of_n(generate, score, request.candidate_count, label="剧情大纲")
+        info_log("剧情大纲候选评选结果", result.summary())
+        return result.best
+    
     async def _get_protagonist_context(self, character_id: str) -> Dict[str, Any]:
         """从数据库获取主角信息"""
         try:
@@ -258,6 +258,7 @@ class PlotOutlineRequest(BaseModel):
     # 技术参数
     target_word_count: int = Field(default=100000, description="目标字数")
     estimated_chapters: int = Field(default=20, description="预计章节数")
+    candidate_count: int = Field(default=1, ge=1, le=8, description="并行生成的候选数量，大于1时保留评分最高的候选")
 
 
 class PlotOutlineResponse(BaseModel):
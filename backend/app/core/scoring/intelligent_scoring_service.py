@@ -28,18 +28,7 @@ class IntelligentScoringService:
     async def score_detailed_plot(self, content: str, detailed_plot_id: str, scorer_id: str = "system") -> Dict[str, Any]:
         """对详细剧情进行智能评分"""
         try:
-            # 获取评分标准prompt
-            prompt = self.prompt_manager.get_scoring_criteria_prompt(content)
-            
-            # 调用LLM进行评分
-            response = await self.llm_client.generate_text(
-                prompt=prompt,
-                temperature=0.3,
-                max_tokens=4000
-            )
-            
-            # 解析LLM响应
-            scoring_data = self._parse_scoring_response(response)
+            scoring_data = await self.evaluate_content(content)
             
             # 生成评分记录ID
             scoring_record_id = str(uuid4())
@@ -126,6 +115,21 @@ class IntelligentScoringService:
                 "error": str(e)
             }
     
+    async def evaluate_content(self, content: str) -> Dict[str, Any]:
+        """按评分标准对内容评分（不保存评分记录，total_score为0-100分）"""
+        # 获取评分标准prompt
+        prompt = self.prompt_manager.get_scoring_criteria_prompt(content)
+        
+        # 调用LLM进行评分
+        response = await self.llm_client.generate_text(
+            prompt=prompt,
+            temperature=0.3,
+            max_tokens=4000
+        )
+        
+        # 解析LLM响应
+        return self._parse_scoring_response(response)
+    
     def get_scoring_result(self, detailed_plot_id: str) -> Optional[ScoringDisplayData]:
         """获取评分结果"""
         try:
@@ -1,90 +1,210 @@
 """
 多维度评分服务
+
+支持三种评分模式（settings.SCORING_MODE 或 score_content 的 mode 参数）：
+- sequential: 逐个维度依次评分
+- parallel: 各维度并发评分（默认）
+- fused: 一次结构化LLM调用同时给出全部维度评分，解析失败的维度回退到并发单项评分
 """
 from typing import Dict, List, Any, Optional
 import asyncio
-from openai import AsyncAzureOpenAI
+import re
 
 from app.core.config import settings
 from app.utils import llm_client
-from app.utils.prompt_manager import prompt_manager
+from app.utils.dynamic_parser import dynamic_parser
+from app.utils.stage_cache import stage_cache
+
+
+SCORING_MODES = ("sequential", "parallel", "fused")
+
+# 单项评分失败时使用的默认分数（含默认分数的结果不写入阶段缓存）
+DEFAULT_SCORE = 5.0
+
+# 评分维度及中文名称
+SCORING_DIMENSIONS = {
+    "logic_consistency": "逻辑自洽性",
+    "dramatic_conflict": "戏剧冲突性",
+    "character_consistency": "角色一致性",
+    "writing_quality": "文笔流畅度",
+    "innovation": "创新性"
+}
 
 
 class ScoringService:
     """多维度评分服务类"""
     
-    def __init__(self):
-        pass
+    def __init__(self, mode: Optional[str] = None):
         self.weights = settings.SCORING_WEIGHTS
+        self.mode = mode or settings.SCORING_MODE
+        self.llm_client = llm_client
     
-    async def score_content(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        """对内容进行多维度评分"""
+    async def score_content(self, content: Dict[str, Any], mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        对内容进行多维度评分
+        
+        Args:
+            content: 待评分内容
+            mode: 评分模式 sequential / parallel / fused，默认使用实例配置
+        """
+        mode = mode or self.mode
+        if mode not in SCORING_MODES:
+            return {"error": f"不支持的评分模式: {mode}"}
+        
         try:
-            # 逻辑自洽性评分
-            logic_score = await self._score_logic_consistency(content)
-            
-            # 戏剧冲突性评分
-            conflict_score = await self._score_dramatic_conflict(content)
-            
-            # 角色一致性评分
-            character_score = await self._score_character_consistency(content)
-            
-            # 文笔流畅度评分
-            writing_score = await self._score_writing_quality(content)
-            
-            # 创新性评分
-            innovation_score = await self._score_innovation(content)
+            # 相同内容、相同模式的评分结果直接复用（有维度使用默认分数时不缓存，下次重新评分）
+            scores = await stage_cache.memoize(
+                "scoring", {"content": content, "mode": mode}, lambda: self._compute_scores(content, mode),
+                cacheable=lambda data: not data.get("fallback_dimensions")
+            )
             
             # 计算加权总分
-            total_score = (
-                logic_score * self.weights["logic_consistency"] +
-                conflict_score * self.weights["dramatic_conflict"] +
-                character_score * self.weights["character_consistency"] +
-                writing_score * self.weights["writing_quality"] +
-                innovation_score * self.weights["innovation"]
-            )
+            total_score = sum(scores[dimension] * self.weights[dimension] for dimension in SCORING_DIMENSIONS)
             
             return {
                 "total_score": total_score,
-                "scores": {
-                    "logic_consistency": logic_score,
-                    "dramatic_conflict": conflict_score,
-                    "character_consistency": character_score,
-                    "writing_quality": writing_score,
-                    "innovation": innovation_score
-                },
-                "weights": self.weights
+                "scores": {dimension: scores[dimension] for dimension in SCORING_DIMENSIONS},
+                "weights": self.weights,
+                "mode": mode,
+                "fallback_dimensions": scores.get("fallback_dimensions", [])
             }
             
         except Exception as e:
             return {"error": str(e)}
     
-    async def _score_logic_consistency(self, content: Dict[str, Any]) -> float:
-        """评分逻辑自洽性"""
+    async def _compute_scores(self, content: Dict[str, Any], mode: str) -> Dict[str, Any]:
+        """
+        按评分模式计算各维度得分
+        
+        评分失败的维度使用默认分数并记入fallback_dimensions；全部维度都失败时抛出异常。
+        """
+        if mode == "fused":
+            scores = await self._score_fused(content)
+        elif mode == "sequential":
+            scores = {}
+            for dimension, scorer in self._dimension_scorers().items():
+                scores[dimension] = await scorer(content)
+        else:
+            scores = await self._score_dimensions(content, list(SCORING_DIMENSIONS))
+        
+        fallback_dimensions = [dimension for dimension in SCORING_DIMENSIONS if scores.get(dimension) is None]
+        if len(fallback_dimensions) == len(SCORING_DIMENSIONS):
+            raise RuntimeError("所有维度评分均失败")
+        if fallback_dimensions:
+            print(f"⚠️ {len(fallback_dimensions)}个维度评分失败，使用默认分数: {', '.join(fallback_dimensions)}")
+        for dimension in fallback_dimensions:
+            scores[dimension] = DEFAULT_SCORE
+        scores["fallback_dimensions"] = fallback_dimensions
+        return scores
+    
+    def _dimension_scorers(self) -> Dict[str, Any]:
+        """各维度的单项评分函数"""
+        return {
+            "logic_consistency": self._score_logic_consistency,
+            "dramatic_conflict": self._score_dramatic_conflict,
+            "character_consistency": self._score_character_consistency,
+            "writing_quality": self._score_writing_quality,
+            "innovation": self._score_innovation
+        }
+    
+    async def _score_dimensions(self, content: Dict[str, Any], dimensions: List[str]) -> Dict[str, Optional[float]]:
+        """并发评分指定维度，评分失败的维度为None"""
+        scorers = self._dimension_scorers()
+        values = await asyncio.gather(*(scorers[dimension](content) for dimension in dimensions))
+        return dict(zip(dimensions, values))
+    
+    async def _score_fused(self, content: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        """一次LLM调用评分全部维度，缺失或无法解析的维度回退到单项评分"""
+        scores: Dict[str, float] = {}
         try:
-            prompt = prompt_manager.build_prompt(
-                "scoring_criteria",
-                content=content,
-                dimension="逻辑自洽性"
+            dimension_lines = "\n".join(f"- {key}: {name}" for key, name in SCORING_DIMENSIONS.items())
+            prompt = f"""
+请从以下维度对内容进行评分（每个维度1-10分）：
+
+{dimension_lines}
+
+内容：{content}
+
+评分标准：
+- 10分：该维度表现极佳
+- 8-9分：表现良好
+- 6-7分：表现一般
+- 4-5分：表现较弱
+- 1-3分：问题严重
+
+请只返回JSON对象，键为上述维度的英文标识，值为数字分数，例如：
+{{"logic_consistency": 7, "dramatic_conflict": 6, "character_consistency": 8, "writing_quality": 7, "innovation": 5}}
+"""
+            response = await self.llm_client.generate_chat(
+                [
+                    {"role": "system", "content": "你是一个专业的小说多维度评分员。"},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1
             )
-            
-            response = await self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[
-                    {"role": "system", "content": prompt_manager.get_scoring_criteria_prompt()},
+            data = dynamic_parser.parse_json(response) or {}
+            for dimension in SCORING_DIMENSIONS:
+                score = self._parse_score(data.get(dimension))
+                if score is not None:
+                    scores[dimension] = score
+        except Exception as e:
+            print(f"⚠️ 合并评分失败，回退到单项评分: {e}")
+        
+        missing = [dimension for dimension in SCORING_DIMENSIONS if dimension not in scores]
+        if missing:
+            scores.update(await self._score_dimensions(content, missing))
+        return scores
+    
+    async def _request_score(self, system_prompt: str, prompt: str) -> Optional[float]:
+        """请求单项评分，调用或解析失败时返回None"""
+        try:
+            response = await self.llm_client.generate_chat(
+                [
+                    {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.1,
-                max_tokens=20000
+                temperature=0.1
             )
+            return self._parse_score(response)
+        except Exception as e:
+            return None
+    
+    @staticmethod
+    def _parse_score(value: Any) -> Optional[float]:
+        """从LLM返回中解析1-10分的分数"""
+        if isinstance(value, (int, float)):
+            score = float(value)
+        else:
+            match = re.search(r"\d+(?:\.\d+)?", str(value or ""))
+            if not match:
+                return None
+            score = float(match.group())
+        return max(1, min(10, score))
+    
+    async def _score_logic_consistency(self, content: Dict[str, Any]) -> Optional[float]:
+        """评分逻辑自洽性"""
+        try:
+            prompt = f"""
+请对以下内容的逻辑自洽性进行评分（1-10分）：
+
+内容：{content}
+
+评分标准：
+- 10分：设定与情节完全自洽，无矛盾
+- 8-9分：基本自洽，偶有小瑕疵
+- 6-7分：存在少量逻辑漏洞
+- 4-5分：逻辑漏洞较多
+- 1-3分：逻辑混乱，前后矛盾
+
+请只返回数字分数。
+"""
             
-            score = float(response.strip())
-            return max(1, min(10, score))
+            return await self._request_score("你是一个专业的逻辑自洽性评分员。", prompt)
             
         except Exception as e:
-            return 5.0  # 默认分数
+            return None
     
-    async def _score_dramatic_conflict(self, content: Dict[str, Any]) -> float:
+    async def _score_dramatic_conflict(self, content: Dict[str, Any]) -> Optional[float]:
         """评分戏剧冲突性"""
         try:
             prompt = f"""
@@ -102,23 +222,12 @@ class ScoringService:
 请只返回数字分数。
 """
             
-            response = await self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的戏剧冲突评分员。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=20000
-            )
-            
-            score = float(response.strip())
-            return max(1, min(10, score))
+            return await self._request_score("你是一个专业的戏剧冲突评分员。", prompt)
             
         except Exception as e:
-            return 5.0
+            return None
     
-    async def _score_character_consistency(self, content: Dict[str, Any]) -> float:
+    async def _score_character_consistency(self, content: Dict[str, Any]) -> Optional[float]:
         """评分角色一致性"""
         try:
             prompt = f"""
@@ -136,23 +245,12 @@ class ScoringService:
 请只返回数字分数。
 """
             
-            response = await self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的角色一致性评分员。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=20000
-            )
-            
-            score = float(response.strip())
-            return max(1, min(10, score))
+            return await self._request_score("你是一个专业的角色一致性评分员。", prompt)
             
         except Exception as e:
-            return 5.0
+            return None
     
-    async def _score_writing_quality(self, content: Dict[str, Any]) -> float:
+    async def _score_writing_quality(self, content: Dict[str, Any]) -> Optional[float]:
         """评分文笔流畅度"""
         try:
             prompt = f"""
@@ -170,23 +268,12 @@ class ScoringService:
 请只返回数字分数。
 """
             
-            response = await self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的文笔评分员。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=20000
-            )
-            
-            score = float(response.strip())
-            return max(1, min(10, score))
+            return await self._request_score("你是一个专业的文笔评分员。", prompt)
             
         except Exception as e:
-            return 5.0
+            return None
     
-    async def _score_innovation(self, content: Dict[str, Any]) -> float:
+    async def _score_innovation(self, content: Dict[str, Any]) -> Optional[float]:
         """评分创新性"""
         try:
             prompt = f"""
@@ -204,18 +291,7 @@ class ScoringService:
 请只返回数字分数。
 """
             
-            response = await self.client.chat.completions.create(
-                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的创新性评分员。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,
-                max_tokens=20000
-            )
-            
-            score = float(response.strip())
-            return max(1, min(10, score))
+            return await self._request_score("你是一个专业的创新性评分员。", prompt)
             
         except Exception as e:
-            return 5.0
+            return None
@@ -10,6 +10,7 @@ from datetime import datetime
 import logging
 
 from app.core.config import settings
+from app.utils.entity_loader import invalidate_entity
 
 logger = logging.getLogger(__name__)
 
@@ -87,6 +88,25 @@ class WorldViewDatabase:
             logger.error(f"插入世界观数据失败: {e}")
             raise
     
+    _WORLDVIEW_SELECT = """
+        SELECT 
+            w.*,
+            ps.cultivation_realms,
+            g.regions,
+            g.main_regions,
+            g.special_locations,
+            s.organizations,
+            s.social_hierarchy,
+            hc.historical_events,
+            hc.cultural_features,
+            hc.current_conflicts
+        FROM worldviews w
+        LEFT JOIN power_systems ps ON w.worldview_id = ps.worldview_id
+        LEFT JOIN geographies g ON w.worldview_id = g.worldview_id
+        LEFT JOIN societies s ON w.worldview_id = s.worldview_id
+        LEFT JOIN history_cultures hc ON w.worldview_id = hc.worldview_id
+    """
+    
     def get_worldview(self, worldview_id: str) -> Optional[Dict[str, Any]]:
         """
         获取完整的世界观数据
@@ -101,62 +121,76 @@ class WorldViewDatabase:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
                     # 使用显式 JOIN 获取完整数据
-                    cursor.execute("""
-                        SELECT 
-                            w.*,
-                            ps.cultivation_realms,
-                            g.regions,
-                            g.main_regions,
-                            g.special_locations,
-                            s.organizations,
-                            s.social_hierarchy,
-                            hc.historical_events,
-                            hc.cultural_features,
-                            hc.current_conflicts
-                        FROM worldviews w
-                        LEFT JOIN power_systems ps ON w.worldview_id = ps.worldview_id
-                        LEFT JOIN geographies g ON w.worldview_id = g.worldview_id
-                        LEFT JOIN societies s ON w.worldview_id = s.worldview_id
-                        LEFT JOIN history_cultures hc ON w.worldview_id = hc.worldview_id
-                        WHERE w.worldview_id = %s AND w.status = 'active'
-                    """, (worldview_id,))
+                    cursor.execute(
+                        self._WORLDVIEW_SELECT + " WHERE w.worldview_id = %s AND w.status = 'active'",
+                        (worldview_id,)
+                    )
                     
                     result = cursor.fetchone()
                     if result:
-                        worldview_data = dict(result)
-                        
-                        # 构建前端期望的数据结构，只包含prompt中定义的字段
-                        power_system = {
-                            'cultivation_realms': worldview_data.get('cultivation_realms') or []
-                        }
-                        
-                        geography = {
-                            'regions': worldview_data.get('regions') or [],
-                            'main_regions': worldview_data.get('main_regions') or [],
-                            'special_locations': worldview_data.get('special_locations') or []
-                        }
-                        
-                        # 返回重构的数据结构，只包含prompt中定义的字段
-                        return {
-                            'id': worldview_data['worldview_id'],  # 前端期望的字段名
-                            'worldview_id': worldview_data['worldview_id'],
-                            'name': worldview_data['name'],
-                            'description': worldview_data['description'] or '',
-                            'core_concept': worldview_data['core_concept'] or '',
-                            'created_at': worldview_data['created_at'],
-                            'updated_at': worldview_data['updated_at'],
-                            'created_by': worldview_data['created_by'],
-                            'version': worldview_data['version'],
-                            'status': worldview_data['status'],
-                            'power_system': power_system,
-                            'geography': geography
-                        }
+                        return self._build_worldview_payload(dict(result))
                     return None
                     
         except Exception as e:
             logger.error(f"获取世界观数据失败: {e}")
             raise
     
+    def get_worldviews_by_ids(self, worldview_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        批量获取完整的世界观数据
+        
+        Args:
+            worldview_ids: 世界观ID列表
+            
+        Returns:
+            以世界观ID为键的世界观数据字典，不存在的ID不出现在结果中
+        """
+        if not worldview_ids:
+            return {}
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        self._WORLDVIEW_SELECT + " WHERE w.worldview_id = ANY(%s) AND w.status = 'active'",
+                        (list(worldview_ids),)
+                    )
+                    
+                    return {
+                        row['worldview_id']: self._build_worldview_payload(dict(row))
+                        for row in cursor.fetchall()
+                    }
+                    
+        except Exception as e:
+            logger.error(f"批量获取世界观数据失败: {e}")
+            raise
+    
+    def _build_worldview_payload(self, worldview_data: Dict[str, Any]) -> Dict[str, Any]:
+        """将查询结果构建为前端期望的数据结构，只包含prompt中定义的字段"""
+        power_system = {
+            'cultivation_realms': worldview_data.get('cultivation_realms') or []
+        }
+        
+        geography = {
+            'regions': worldview_data.get('regions') or [],
+            'main_regions': worldview_data.get('main_regions') or [],
+            'special_locations': worldview_data.get('special_locations') or []
+        }
+        
+        return {
+            'id': worldview_data['worldview_id'],  # 前端期望的字段名
+            'worldview_id': worldview_data['worldview_id'],
+            'name': worldview_data['name'],
+            'description': worldview_data['description'] or '',
+            'core_concept': worldview_data['core_concept'] or '',
+            'created_at': worldview_data['created_at'],
+            'updated_at': worldview_data['updated_at'],
+            'created_by': worldview_data['created_by'],
+            'version': worldview_data['version'],
+            'status': worldview_data['status'],
+            'power_system': power_system,
+            'geography': geography
+        }
+    
     def get_geography(self, worldview_id: str) -> Optional[Dict[str, Any]]:
         """获取地理设定信息"""
         try:
@@ -258,6 +292,7 @@ class WorldViewDatabase:
         Returns:
             是否更新成功
         """
+        invalidate_entity("worldviews", worldview_id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
@@ -348,6 +383,7 @@ class WorldViewDatabase:
         Returns:
             是否删除成功
         """
+        invalidate_entity("worldviews", worldview_id)
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
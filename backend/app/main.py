@@ -13,6 +13,8 @@ from app.core.config import settings
 from app.api import world, character, logic, scoring, evolution
 from app.api import plot_outline, chapter_outline
 from app.core.database import init_database
+from app.utils.entity_loader import entity_loader_scope
+from app.utils.async_queue import task_queue
 
 # 配置日志
 logging.basicConfig(
@@ -27,9 +29,11 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     # 启动时初始化数据库
     await init_database()
+    # 启动后台任务队列（处理器由各API模块注册）
+    task_queue.start()
     yield
-    # 关闭时清理资源
-    pass
+    # 关闭时停止任务队列，正在执行的任务执行完毕
+    task_queue.stop(timeout=30)
 
 
 # 创建FastAPI应用
@@ -55,6 +59,14 @@ app.add_middleware(
     allowed_hosts=settings.ALLOWED_HOSTS
 )
 
+# 请求级实体加载器
+@app.middleware("http")
+async def entity_loader_middleware(request, call_next):
+    """为每个请求开启独立的实体加载器作用域，请求内的实体查询批量合并并去重"""
+    with entity_loader_scope():
+        return await call_next(request)
+
+
 # 注册API路由
 app.include_router(world.router, prefix="/api/v1/world", tags=["世界观"])
 app.include_router(character.router, prefix="/api/v1/character", tags=["角色管理"])
@@ -80,6 +92,14 @@ app.include_router(detailed_plot.router, prefix="/api/v1", tags=["详细剧情"]
 from app.api import scoring as scoring_intelligent
 app.include_router(scoring_intelligent.router, prefix="/api/v1/score-intelligent", tags=["评分智能体"])
 
+# 导入进度推送API
+from app.api import progress
+app.include_router(progress.router, prefix="/api/v1/progress", tags=["进度推送"])
+
+# 生成流水线（阶段缓存与dry-run）
+from app.api import pipeline
+app.include_router(pipeline.router, prefix="/api/v1/pipeline", tags=["生成流水线"])
+
 # 添加兼容性路由，支持前端的旧API调用
 app.include_router(plot_outline.router, prefix="/api/generate", tags=["兼容性API"])
 
@@ -0,0 +1,87 @@
+"""
+内容寻址的产物存储
+
+完整的阶段输出（世界观、角色、剧情大纲、章节、事件等）以紧凑JSON + gzip压缩
+保存，文件名为内容的sha256哈希：相同内容只存一份，进度日志只需记录哈希即可
+在断点续传时还原完整输出，无需重新调用LLM。
+"""
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.utils.json_utils import to_plain
+
+
+def canonical_json(value: Any) -> bytes:
+    """规范化JSON编码（键排序、无多余空白），保证相同内容得到相同哈希"""
+    return json.dumps(to_plain(value), ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class ArtifactStore:
+    """按内容哈希存取产物"""
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.ARTIFACT_STORE_DIR)
+    
+    def _artifact_path(self, digest: str) -> Path:
+        # 按哈希前两位分目录，避免单个目录文件过多
+        return self.root / digest[:2] / f"{digest}.json.gz"
+    
+    def put(self, value: Any) -> Optional[str]:
+        """保存产物，返回内容哈希；内容已存在时直接返回哈希"""
+        data = canonical_json(value)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._artifact_path(digest)
+        if path.exists():
+            return digest
+        
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'wb') as f:
+                # mtime=0 使相同内容的压缩结果逐字节一致
+                f.write(gzip.compress(data, compresslevel=6, mtime=0))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            return digest
+        except Exception as e:
+            print(f"⚠️ 保存产物失败 {digest[:12]}: {e}")
+            return None
+    
+    def get(self, digest: str) -> Any:
+        """读取产物，不存在或内容校验失败时返回None"""
+        path = self._artifact_path(digest)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = gzip.decompress(f.read())
+            if hashlib.sha256(data).hexdigest() != digest:
+                print(f"⚠️ 产物内容校验失败: {digest[:12]}")
+                return None
+            return json.loads(data)
+        except Exception as e:
+            print(f"⚠️ 读取产物失败 {digest[:12]}: {e}")
+            return None
+    
+    def has(self, digest: str) -> bool:
+        return self._artifact_path(digest).exists()
+    
+    def get_stats(self) -> Dict[str, int]:
+        """产物数量及压缩后占用的字节数"""
+        count = 0
+        total_bytes = 0
+        if self.root.exists():
+            for path in self.root.glob("*/*.json.gz"):
+                count += 1
+                total_bytes += path.stat().st_size
+        return {"artifacts": count, "bytes": total_bytes}
+
+
+# 全局产物存储
+artifact_store = ArtifactStore()
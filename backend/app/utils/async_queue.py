@@ -2,13 +2,22 @@
 通用异步队列模块
 """
 import asyncio
+import json
+import os
+import socket
 import threading
 import uuid
-from queue import Queue
-from typing import Dict, Any, Callable, Optional
+from collections import defaultdict, deque, OrderedDict
+from typing import Dict, Any, Callable, Optional, List, Deque
 from enum import Enum
 import time
 
+from app.core.config import settings
+from app.utils.entity_loader import entity_loader_scope
+from app.utils.progress_events import progress_bus, task_topic
+from app.utils.task_queue_database import TaskQueueDatabase
+from app.utils.json_utils import dump_json
+
 
 class TaskStatus(Enum):
     QUEUED = "queued"
@@ -18,36 +27,85 @@ class TaskStatus(Enum):
 
 
 class AsyncTaskQueue:
-    """通用异步任务队列"""
+    """通用异步任务队列
+    
+    后台线程中运行一个长期存在的事件循环，多个worker协程共享该循环并发处理任务，
+    支持按任务类型限制并发数量。已结束的任务状态按TTL/数量上限淘汰，体积较大的
+    结果写入磁盘、内存中只保留引用；队列统计通过增量计数器维护。
+    任务状态变化和处理器上报的进度会发布到进度事件总线（主题 task:<task_id>）。
+    """
     
-    def __init__(self):
-        self.task_queue = Queue()
+    def __init__(self, num_workers: Optional[int] = None, type_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            num_workers: 并发worker数量，默认取 settings.TASK_QUEUE_WORKERS
+            type_limits: 按任务类型的并发上限，默认取 settings.TASK_QUEUE_TYPE_LIMITS
+        """
+        self.num_workers = max(1, num_workers or settings.TASK_QUEUE_WORKERS)
+        self.type_limits: Dict[str, int] = dict(
+            settings.TASK_QUEUE_TYPE_LIMITS if type_limits is None else type_limits
+        )
         self.task_states: Dict[str, Dict[str, Any]] = {}
+        self.result_ttl = settings.TASK_QUEUE_RESULT_TTL_SECONDS
+        self.max_finished_tasks = settings.TASK_QUEUE_MAX_FINISHED_TASKS
+        self.spill_threshold = settings.TASK_QUEUE_RESULT_SPILL_BYTES
+        self.spill_dir = settings.TASK_QUEUE_SPILL_DIR
         self.task_handlers: Dict[str, Callable] = {}
         self.running = False
         self.queue_thread: Optional[threading.Thread] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         
-    def register_handler(self, task_type: str, handler: Callable):
-        """注册任务处理器"""
-        self.task_handlers[task_type] = handler
+        self._queue: Optional[asyncio.Queue] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # 队列启动前（或停止后）提交的任务
+        self._pending_tasks: List[Dict[str, Any]] = []
+        # 因类型并发上限暂缓执行的任务（仅在队列线程中访问）
+        self._deferred: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._type_running: Dict[str, int] = defaultdict(int)
+        # 已结束任务按完成顺序排列，用于TTL/LRU淘汰
+        self._finished: "OrderedDict[str, float]" = OrderedDict()
+        # 按状态的增量计数（累计值，不受淘汰影响）
+        self._status_counts: Dict[str, int] = defaultdict(int)
+        self._total_submitted = 0
+        self._evicted_count = 0
+        self._state_lock = threading.RLock()
+    
+    def register_handler(self, task_type: str, handler: Callable, max_concurrency: Optional[int] = None):
+        """注册任务处理器
         
+        Args:
+            task_type: 任务类型
+            handler: 异步处理函数 handler(task_id, data)
+            max_concurrency: 该类型任务的并发上限，None表示只受worker数量限制
+        """
+        self.task_handlers[task_type] = handler
+        if max_concurrency is not None:
+            self.type_limits[task_type] = max_concurrency
+    
     def start(self):
         """启动队列处理器"""
         if self.running:
             return
-            
+        
         self.running = True
-        self.queue_thread = threading.Thread(target=self._queue_processor, daemon=True)
+        self._ready.clear()
+        self.queue_thread = threading.Thread(target=self._run_loop, daemon=True)
         self.queue_thread.start()
-        print("✅ 异步队列处理器已启动")
-        
-    def stop(self):
-        """停止队列处理器"""
+        self._ready.wait()
+        print(f"✅ 异步队列处理器已启动，worker数量: {self.num_workers}")
+    
+    def stop(self, timeout: Optional[float] = None):
+        """停止队列处理器（正在执行的任务会执行完毕，未开始的任务保留到下次启动）"""
+        if not self.running:
+            return
         self.running = False
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._wake_workers)
         if self.queue_thread:
-            self.queue_thread.join()
+            self.queue_thread.join(timeout)
         print("✅ 异步队列处理器已停止")
-        
+    
     def submit_task(self, task_type: str, data: Dict[str, Any]) -> str:
         """提交任务到队列"""
         task_id = str(uuid.uuid4())
@@ -60,116 +118,545 @@ class AsyncTaskQueue:
             'created_at': time.time()
         }
         
-        # 添加到队列
-        self.task_queue.put(task)
-        
         # 初始化任务状态
-        self.task_states[task_id] = {
-            'status': TaskStatus.QUEUED.value,
-            'progress': 0,
-            'created_at': task['created_at'],
-            'started_at': None,
-            'completed_at': None,
-            'result': None,
-            'error': None
-        }
+        with self._state_lock:
+            self.task_states[task_id] = {
+                'status': TaskStatus.QUEUED.value,
+                'progress': 0,
+                'created_at': task['created_at'],
+                'started_at': None,
+                'completed_at': None,
+                'result': None,
+                'error': None
+            }
+            self._status_counts[TaskStatus.QUEUED.value] += 1
+            self._total_submitted += 1
+        
+        # 添加到队列
+        self._publish_progress(task_id, TaskStatus.QUEUED.value, 0)
+        self._enqueue(task)
         
         print(f"📝 任务 {task_id} 已加入队列，类型: {task_type}")
         return task_id
-        
+    
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """获取任务状态"""
-        return self.task_states.get(task_id)
+        """获取任务状态（结果已写入磁盘时按需读取，已淘汰的任务返回None）"""
+        with self._state_lock:
+            self._evict_finished()
+            state = self.task_states.get(task_id)
+            if state is None or not state.get('result_ref'):
+                return state
+            state = dict(state)
+        
+        try:
+            with open(state['result_ref'], 'r', encoding='utf-8') as f:
+                state['result'] = json.load(f)
+        except Exception as e:
+            state['error'] = state.get('error') or f"读取任务结果失败: {e}"
+        return state
+    
+    def update_progress(self, task_id: str, progress: int, stage: Optional[str] = None,
+                        message: Optional[str] = None, partial: Any = None):
+        """更新任务进度并推送给订阅者（供任务处理器调用）
         
+        Args:
+            task_id: 任务ID
+            progress: 进度百分比
+            stage: 当前阶段
+            message: 进度说明
+            partial: 部分输出
+        """
+        state = self.task_states.get(task_id)
+        if state is not None:
+            state['progress'] = progress
+            if stage is not None:
+                state['stage'] = stage
+        self._publish_progress(task_id, TaskStatus.PROCESSING.value, progress, stage, message, partial)
+    
+    def _publish_progress(self, task_id: str, status: str, progress: int, stage: Optional[str] = None,
+                          message: Optional[str] = None, partial: Any = None):
+        """发布任务进度事件"""
+        if status == TaskStatus.COMPLETED.value:
+            event = 'completed'
+        elif status == TaskStatus.FAILED.value:
+            event = 'failed'
+        else:
+            event = 'progress'
+        progress_bus.publish(task_topic(task_id), event=event, stage=stage or status, percent=progress,
+                             message=message, partial=partial, task_id=task_id, status=status)
+    
     def get_queue_status(self) -> Dict[str, Any]:
         """获取队列状态"""
-        queued_count = len([t for t in self.task_states.values() if t['status'] == TaskStatus.QUEUED.value])
-        processing_count = len([t for t in self.task_states.values() if t['status'] == TaskStatus.PROCESSING.value])
-        completed_count = len([t for t in self.task_states.values() if t['status'] == TaskStatus.COMPLETED.value])
-        failed_count = len([t for t in self.task_states.values() if t['status'] == TaskStatus.FAILED.value])
+        with self._state_lock:
+            self._evict_finished()
+            counts = dict(self._status_counts)
+            retained = len(self.task_states)
         
         return {
-            'queue_size': self.task_queue.qsize(),
-            'queued_tasks': queued_count,
-            'processing_tasks': processing_count,
-            'completed_tasks': completed_count,
-            'failed_tasks': failed_count,
-            'total_tasks': len(self.task_states)
+            'queue_size': self._queue_size(),
+            'queued_tasks': counts.get(TaskStatus.QUEUED.value, 0),
+            'processing_tasks': counts.get(TaskStatus.PROCESSING.value, 0),
+            'completed_tasks': counts.get(TaskStatus.COMPLETED.value, 0),
+            'failed_tasks': counts.get(TaskStatus.FAILED.value, 0),
+            'total_tasks': self._total_submitted,
+            'retained_tasks': retained,
+            'evicted_tasks': self._evicted_count,
+            'workers': self.num_workers,
+            'type_limits': dict(self.type_limits),
+            'running_by_type': {k: v for k, v in self._type_running.items() if v}
         }
+    
+    def _queue_size(self) -> int:
+        """等待执行的任务数量"""
+        size = len(self._pending_tasks) + sum(len(d) for d in self._deferred.values())
+        if self._queue is not None:
+            size += self._queue.qsize()
+        return size
+    
+    def _enqueue(self, task: Dict[str, Any]):
+        """将任务放入事件循环的队列（可从任意线程调用）"""
+        with self._lock:
+            if not self.running or self.loop is None:
+                self._pending_tasks.append(task)
+                return
+            loop = self.loop
+        loop.call_soon_threadsafe(self._queue.put_nowait, task)
+    
+    def _run_loop(self):
+        """队列线程入口：创建长期存在的事件循环并运行worker"""
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._queue = asyncio.Queue()
         
-    def _queue_processor(self):
-        """队列处理器（在后台线程中运行）"""
+        with self._lock:
+            self.loop = loop
+            for task in self._pending_tasks:
+                self._queue.put_nowait(task)
+            self._pending_tasks.clear()
+        
+        workers = self._create_background_tasks(loop)
+        self._ready.set()
         print("🔄 队列处理器启动")
         
-        while self.running:
+        try:
+            loop.run_until_complete(asyncio.gather(*workers))
+        finally:
+            with self._lock:
+                self.loop = None
+                # 未处理的任务保留到下次启动
+                while not self._queue.empty():
+                    task = self._queue.get_nowait()
+                    if task is not None:
+                        self._pending_tasks.append(task)
+                for deferred in self._deferred.values():
+                    self._pending_tasks.extend(deferred)
+                self._deferred.clear()
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
+            print("🔄 队列处理器停止")
+    
+    def _create_background_tasks(self, loop: asyncio.AbstractEventLoop) -> List[asyncio.Task]:
+        """创建在队列事件循环中运行的后台协程"""
+        return [loop.create_task(self._worker(i)) for i in range(self.num_workers)]
+    
+    def _wake_workers(self):
+        """向每个worker发送停止信号（在队列线程中执行）"""
+        for _ in range(self.num_workers):
+            self._queue.put_nowait(None)
+    
+    async def _worker(self, worker_id: int):
+        """worker协程：循环获取并执行任务"""
+        while True:
+            task = self._take_deferred_task()
+            if task is None:
+                task = await self._queue.get()
+                if task is None or not self.running:
+                    if task is not None:
+                        with self._lock:
+                            self._pending_tasks.append(task)
+                    break
+            
+            task_type = task['task_type']
+            if not self._acquire_type_slot(task_type):
+                # 该类型已达并发上限，暂缓执行，由释放槽位的worker接手
+                self._deferred[task_type].append(task)
+                continue
+            
             try:
-                # 获取任务（阻塞等待）
-                task = self.task_queue.get(timeout=1)
-                if task is None:
-                    continue
-                    
-                task_id = task['task_id']
-                task_type = task['task_type']
-                task_data = task['data']
-                
-                print(f"🚀 开始处理任务 {task_id}，类型: {task_type}")
-                
-                # 更新任务状态为处理中
-                self.task_states[task_id].update({
-                    'status': TaskStatus.PROCESSING.value,
-                    'progress': 10,
-                    'started_at': time.time()
-                })
-                
-                # 获取处理器
-                handler = self.task_handlers.get(task_type)
-                if not handler:
-                    self._mark_task_failed(task_id, f"未找到任务类型 {task_type} 的处理器")
-                    continue
-                
-                # 执行任务
-                try:
-                    # 在新的事件循环中运行异步任务
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    
-                    result = loop.run_until_complete(handler(task_id, task_data))
-                    
-                    # 更新任务状态为完成
-                    self.task_states[task_id].update({
-                        'status': TaskStatus.COMPLETED.value,
-                        'progress': 100,
-                        'completed_at': time.time(),
-                        'result': result
-                    })
-                    
-                    print(f"✅ 任务 {task_id} 处理完成")
-                    
-                except Exception as e:
-                    self._mark_task_failed(task_id, str(e))
-                    
-                finally:
-                    loop.close()
-                    
-                # 标记任务完成
-                self.task_queue.task_done()
-                
+                await self._execute_task(task, worker_id)
             except Exception as e:
-                if self.running:  # 只有在运行状态下才打印错误
-                    print(f"❌ 队列处理错误: {e}")
-                    
-        print("🔄 队列处理器停止")
+                print(f"❌ 队列处理错误: {e}")
+            finally:
+                self._release_type_slot(task_type)
+    
+    def _take_deferred_task(self) -> Optional[Dict[str, Any]]:
+        """取出一个已有空闲槽位的暂缓任务"""
+        if not self.running:
+            return None
+        for task_type, deferred in self._deferred.items():
+            if deferred and self._has_type_slot(task_type):
+                return deferred.popleft()
+        return None
+    
+    def _has_type_slot(self, task_type: str) -> bool:
+        limit = self.type_limits.get(task_type)
+        return not limit or self._type_running[task_type] < limit
+    
+    def _acquire_type_slot(self, task_type: str) -> bool:
+        if not self._has_type_slot(task_type):
+            return False
+        self._type_running[task_type] += 1
+        return True
+    
+    def _release_type_slot(self, task_type: str):
+        self._type_running[task_type] = max(0, self._type_running[task_type] - 1)
+    
+    async def _execute_task(self, task: Dict[str, Any], worker_id: int):
+        """执行单个任务"""
+        task_id = task['task_id']
+        task_type = task['task_type']
+        task_data = task['data']
+        
+        print(f"🚀 worker-{worker_id} 开始处理任务 {task_id}，类型: {task_type}")
         
-    def _mark_task_failed(self, task_id: str, error: str):
+        # 更新任务状态为处理中
+        self._mark_task_processing(task_id)
+        
+        # 获取处理器
+        handler = self.task_handlers.get(task_type)
+        if not handler:
+            await self._mark_task_failed(task_id, f"未找到任务类型 {task_type} 的处理器")
+            return
+        
+        # 执行任务
+        try:
+            # 每个任务拥有独立的实体加载器作用域
+            with entity_loader_scope():
+                result = await handler(task_id, task_data)
+            
+            # 更新任务状态为完成
+            await self._mark_task_completed(task_id, result)
+            
+            print(f"✅ 任务 {task_id} 处理完成")
+        
+        except Exception as e:
+            await self._mark_task_failed(task_id, str(e))
+    
+    def _mark_task_processing(self, task_id: str):
+        """标记任务开始处理"""
+        self._update_state(task_id, {
+            'status': TaskStatus.PROCESSING.value,
+            'progress': 10,
+            'started_at': time.time()
+        })
+    
+    async def _mark_task_completed(self, task_id: str, result: Any):
+        """标记任务完成"""
+        result_ref = self._spill_result(task_id, result)
+        self._update_state(task_id, {
+            'status': TaskStatus.COMPLETED.value,
+            'progress': 100,
+            'completed_at': time.time(),
+            'result': None if result_ref else result,
+            'result_ref': result_ref
+        })
+    
+    async def _mark_task_failed(self, task_id: str, error: str):
         """标记任务失败"""
-        self.task_states[task_id].update({
+        self._update_state(task_id, {
             'status': TaskStatus.FAILED.value,
             'progress': 0,
             'completed_at': time.time(),
             'error': error
         })
         print(f"❌ 任务 {task_id} 处理失败: {error}")
+    
+    def _update_state(self, task_id: str, fields: Dict[str, Any]):
+        """更新任务状态并维护计数器，任务结束时登记到淘汰队列"""
+        with self._state_lock:
+            state = self.task_states.get(task_id)
+            if state is None:
+                return
+            old_status = state['status']
+            state.update(fields)
+            new_status = state['status']
+            if new_status != old_status:
+                self._status_counts[old_status] -= 1
+                self._status_counts[new_status] += 1
+            if new_status in (TaskStatus.COMPLETED.value, TaskStatus.FAILED.value):
+                self._finished[task_id] = state['completed_at'] or time.time()
+                self._finished.move_to_end(task_id)
+                self._evict_finished()
+            progress = state['progress']
+            error = state.get('error')
+        
+        if new_status != old_status:
+            self._publish_progress(
+                task_id, new_status, progress,
+                message=error if new_status == TaskStatus.FAILED.value else None
+            )
+    
+    def _evict_finished(self):
+        """淘汰超过TTL或超出数量上限的已结束任务（按完成时间从旧到新，均摊O(1)）"""
+        now = time.time()
+        while self._finished:
+            task_id, finished_at = next(iter(self._finished.items()))
+            expired = self.result_ttl and now - finished_at > self.result_ttl
+            overflow = self.max_finished_tasks and len(self._finished) > self.max_finished_tasks
+            if not expired and not overflow:
+                break
+            self._finished.popitem(last=False)
+            state = self.task_states.pop(task_id, None)
+            self._evicted_count += 1
+            if state and state.get('result_ref'):
+                try:
+                    os.remove(state['result_ref'])
+                except OSError:
+                    pass
+    
+    def _spill_result(self, task_id: str, result: Any) -> Optional[str]:
+        """结果序列化后超过阈值时写入磁盘，返回文件路径；否则返回None"""
+        if result is None or not self.spill_threshold:
+            return None
+        try:
+            payload = dump_json(result)
+            if len(payload.encode('utf-8')) < self.spill_threshold:
+                return None
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{task_id}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            return path
+        except Exception as e:
+            print(f"⚠️ 任务 {task_id} 结果写入磁盘失败，保留在内存中: {e}")
+            return None
+
+
+class DurableTaskQueue(AsyncTaskQueue):
+    """基于PostgreSQL的持久化任务队列
+    
+    任务保存在 task_queue 表中，进程重启不会丢失；多个后端节点通过
+    FOR UPDATE SKIP LOCKED 领取任务，执行期间定期心跳续约，节点崩溃后
+    租约过期的任务由其他节点回收并按重试次数重新排队。
+    submit_task / get_task_status 的接口与内存队列保持一致。
+    """
+    
+    def __init__(self, num_workers: Optional[int] = None, type_limits: Optional[Dict[str, int]] = None,
+                 database: Optional[TaskQueueDatabase] = None):
+        super().__init__(num_workers, type_limits)
+        self.database = database or TaskQueueDatabase()
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.max_attempts = settings.TASK_QUEUE_MAX_ATTEMPTS
+        self.lease_seconds = settings.TASK_QUEUE_LEASE_SECONDS
+        self.heartbeat_seconds = settings.TASK_QUEUE_HEARTBEAT_SECONDS
+        self.poll_interval = settings.TASK_QUEUE_POLL_INTERVAL
+        self.retry_delay_seconds = settings.TASK_QUEUE_RETRY_DELAY_SECONDS
+        self._active_task_ids: set = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._claim_lock: Optional[asyncio.Lock] = None
+        # 各任务尚未完成的进度写入（队列事件循环中按顺序串联执行）
+        self._progress_writes: Dict[str, asyncio.Task] = {}
+    
+    def submit_task(self, task_type: str, data: Dict[str, Any]) -> str:
+        """提交任务到持久化队列"""
+        task_id = str(uuid.uuid4())
+        self.database.enqueue_task(task_id, task_type, data, self.max_attempts)
+        self._publish_progress(task_id, TaskStatus.QUEUED.value, 0)
+        
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._notify_workers)
+        
+        print(f"📝 任务 {task_id} 已加入持久化队列，类型: {task_type}")
+        return task_id
+    
+    def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态"""
+        row = self.database.get_task(task_id)
+        if not row:
+            return None
+        return self._row_to_state(row)
+    
+    def update_progress(self, task_id: str, progress: int, stage: Optional[str] = None,
+                        message: Optional[str] = None, partial: Any = None):
+        """更新任务进度并推送给本节点的订阅者（供任务处理器调用）
+        
+        在队列事件循环中调用时，数据库写入放到线程中执行，不阻塞其他任务；同一任务的写入按调用顺序进行。
+        """
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is not None and running_loop is self.loop:
+            self._progress_writes[task_id] = running_loop.create_task(
+                self._write_progress(self._progress_writes.get(task_id), task_id, progress)
+            )
+        else:
+            self.database.update_progress(task_id, progress)
+        self._publish_progress(task_id, TaskStatus.PROCESSING.value, progress, stage, message, partial)
+    
+    def get_queue_status(self) -> Dict[str, Any]:
+        """获取队列状态（全部节点）"""
+        counts = self.database.get_status_counts()
+        return {
+            'queue_size': counts.get(TaskStatus.QUEUED.value, 0),
+            'queued_tasks': counts.get(TaskStatus.QUEUED.value, 0),
+            'processing_tasks': counts.get(TaskStatus.PROCESSING.value, 0),
+            'completed_tasks': counts.get(TaskStatus.COMPLETED.value, 0),
+            'failed_tasks': counts.get(TaskStatus.FAILED.value, 0),
+            'total_tasks': sum(counts.values()),
+            'workers': self.num_workers,
+            'worker_id': self.worker_id,
+            'type_limits': dict(self.type_limits),
+            'running_by_type': {k: v for k, v in self._type_running.items() if v}
+        }
+    
+    def _row_to_state(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """将数据库记录转换为与内存队列一致的任务状态"""
+        def to_timestamp(value):
+            return value.timestamp() if value else None
+        
+        return {
+            'status': row['status'],
+            'progress': row['progress'],
+            'created_at': to_timestamp(row['created_at']),
+            'started_at': to_timestamp(row['started_at']),
+            'completed_at': to_timestamp(row['completed_at']),
+            'result': row['result'],
+            'error': row['error'],
+            'task_type': row['task_type'],
+            'attempts': row['attempts'],
+            'max_attempts': row['max_attempts'],
+            'worker_id': row['worker_id']
+        }
+    
+    def _create_background_tasks(self, loop: asyncio.AbstractEventLoop) -> List[asyncio.Task]:
+        """创建worker协程和心跳协程"""
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        tasks = [loop.create_task(self._worker(i)) for i in range(self.num_workers)]
+        tasks.append(loop.create_task(self._heartbeat_loop()))
+        return tasks
+    
+    def _notify_workers(self):
+        """唤醒空闲的worker（在队列线程中执行）"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    def _wake_workers(self):
+        """通知所有协程停止（在队列线程中执行）"""
+        self._stopping.set()
+        self._wakeup.set()
+    
+    async def _wait(self, event: asyncio.Event, timeout: float):
+        """等待事件或超时"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+    
+    async def _claim_task(self) -> Optional[Dict[str, Any]]:
+        """在类型并发上限内领取一个任务，并占用对应的类型槽位"""
+        async with self._claim_lock:
+            task_types = [t for t in self.task_handlers if self._has_type_slot(t)]
+            if not task_types:
+                return None
+            row = await asyncio.to_thread(
+                self.database.claim_task, self.worker_id, task_types, self.lease_seconds
+            )
+            if row is None:
+                return None
+            self._type_running[row['task_type']] += 1
+            self._active_task_ids.add(row['id'])
+            return {
+                'task_id': row['id'],
+                'task_type': row['task_type'],
+                'data': row['payload'] or {},
+                'attempt': row['attempts']
+            }
+    
+    async def _worker(self, worker_id: int):
+        """worker协程：从数据库领取并执行任务"""
+        while self.running:
+            try:
+                task = await self._claim_task()
+            except Exception as e:
+                print(f"❌ 领取任务失败: {e}")
+                task = None
+            
+            if task is None:
+                self._wakeup.clear()
+                await self._wait(self._wakeup, self.poll_interval)
+                continue
+            
+            try:
+                await self._execute_task(task, worker_id)
+            except Exception as e:
+                print(f"❌ 队列处理错误: {e}")
+            finally:
+                self._active_task_ids.discard(task['task_id'])
+                self._release_type_slot(task['task_type'])
+    
+    async def _heartbeat_loop(self):
+        """心跳协程：为本节点的任务续约，并回收其他节点遗留的过期任务"""
+        while self.running:
+            try:
+                if self._active_task_ids:
+                    await asyncio.to_thread(
+                        self.database.heartbeat, self.worker_id, list(self._active_task_ids), self.lease_seconds
+                    )
+                reclaimed = await asyncio.to_thread(self.database.requeue_expired_tasks)
+                if reclaimed:
+                    print(f"♻️ 回收了 {reclaimed} 个租约过期的任务")
+                    self._notify_workers()
+            except Exception as e:
+                print(f"❌ 任务心跳错误: {e}")
+            await self._wait(self._stopping, self.heartbeat_seconds)
+    
+    def _mark_task_processing(self, task_id: str):
+        """领取任务时已在数据库中标记为处理中，这里只推送进度"""
+        self._publish_progress(task_id, TaskStatus.PROCESSING.value, 10)
+    
+    async def _write_progress(self, previous: Optional[asyncio.Task], task_id: str, progress: int):
+        """等待同一任务的上一次进度写入完成后再写入，保证进度不倒退"""
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        await asyncio.to_thread(self.database.update_progress, task_id, progress)
+    
+    async def _flush_progress(self, task_id: str):
+        """等待任务尚未完成的进度写入，避免其晚于完成/失败状态写入"""
+        write = self._progress_writes.pop(task_id, None)
+        if write is not None:
+            await asyncio.gather(write, return_exceptions=True)
+    
+    async def _mark_task_completed(self, task_id: str, result: Any):
+        """标记任务完成"""
+        await self._flush_progress(task_id)
+        await asyncio.to_thread(self.database.complete_task, task_id, self.worker_id, result)
+        self._publish_progress(task_id, TaskStatus.COMPLETED.value, 100)
+    
+    async def _mark_task_failed(self, task_id: str, error: str):
+        """标记任务失败，未超过最大重试次数时重新排队"""
+        await self._flush_progress(task_id)
+        status = await asyncio.to_thread(
+            self.database.fail_task, task_id, self.worker_id, error, self.retry_delay_seconds
+        )
+        if status == TaskStatus.QUEUED.value:
+            print(f"⚠️ 任务 {task_id} 处理失败，稍后重试: {error}")
+            self._publish_progress(task_id, TaskStatus.QUEUED.value, 0, message=error)
+        else:
+            print(f"❌ 任务 {task_id} 处理失败: {error}")
+            self._publish_progress(task_id, TaskStatus.FAILED.value, 0, message=error)
+
+
+def create_task_queue() -> AsyncTaskQueue:
+    """根据配置创建任务队列"""
+    if settings.TASK_QUEUE_BACKEND == "postgres":
+        return DurableTaskQueue()
+    return AsyncTaskQueue()
 
 
 # 全局队列实例
-task_queue = AsyncTaskQueue()
+task_queue = create_task_queue()
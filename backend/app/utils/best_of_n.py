@@ -0,0 +1,126 @@
+"""
+Best-of-N 并行候选生成
+
+并发生成N个候选并逐个评分，保留得分最高的候选。任一候选达到目标分数时
+立即取消其余候选（提前截断），累计token超过预算时也停止等待剩余候选。
+评分函数统一返回0-10分。
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.llm_client import llm_usage_scope
+
+
+@dataclass
+class Candidate:
+    """单个候选"""
+    index: int
+    output: Any = None
+    score: Optional[float] = None
+    error: Optional[str] = None
+    cancelled: bool = False
+
+
+@dataclass
+class BestOfNResult:
+    """Best-of-N 结果"""
+    best: Any
+    best_score: float
+    best_index: int
+    stop_reason: str
+    tokens: int
+    candidates: List[Candidate] = field(default_factory=list)
+    
+    def summary(self) -> Dict[str, Any]:
+        """结果摘要（不含候选内容）"""
+        return {
+            "best_index": self.best_index,
+            "best_score": round(self.best_score, 2),
+            "stop_reason": self.stop_reason,
+            "tokens": self.tokens,
+            "candidates": [
+                {
+                    "index": candidate.index,
+                    "score": round(candidate.score, 2) if candidate.score is not None else None,
+                    "error": candidate.error,
+                    "cancelled": candidate.cancelled
+                }
+                for candidate in self.candidates
+            ]
+        }
+
+
+async def best_of_n(generate: Callable[[int], Awaitable[Any]],
+                    score: Callable[[Any], Awaitable[float]],
+                    candidate_count: int,
+                    target_score: Optional[float] = None,
+                    token_budget: Optional[int] = None,
+                    label: str = "内容") -> BestOfNResult:
+    """
+    并发生成候选并保留评分最高者
+    
+    Args:
+        generate: 生成函数，参数为候选序号
+        score: 评分函数，返回0-10分
+        candidate_count: 候选数量
+        target_score: 达到该分数即停止其余候选，默认使用配置，0表示不提前截断
+        token_budget: 本次生成+评分的token上限，默认使用配置，0表示不限制
+        label: 日志中的内容名称
+    """
+    target_score = settings.BEST_OF_N_TARGET_SCORE if target_score is None else target_score
+    token_budget = settings.BEST_OF_N_TOKEN_BUDGET if token_budget is None else token_budget
+    candidates = [Candidate(index=i) for i in range(candidate_count)]
+    
+    async def run(candidate: Candidate) -> Candidate:
+        candidate.output = await generate(candidate.index)
+        candidate.score = float(await score(candidate.output))
+        print(f"  🎲 {label}候选{candidate.index + 1}/{candidate_count} 评分: {candidate.score:.1f}")
+        return candidate
+    
+    best: Optional[Candidate] = None
+    stop_reason = "全部候选完成"
+    with llm_usage_scope() as usage:
+        tasks = {asyncio.create_task(run(candidate)): candidate for candidate in candidates}
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    candidate = tasks[task]
+                    if task.exception() is not None:
+                        candidate.error = str(task.exception())
+                        print(f"  ⚠️ {label}候选{candidate.index + 1}失败: {candidate.error}")
+                        continue
+                    if best is None or candidate.score > best.score:
+                        best = candidate
+                
+                if not pending:
+                    break
+                if target_score and best is not None and best.score >= target_score:
+                    stop_reason = f"候选{best.index + 1}达到目标分{target_score}，提前结束"
+                    break
+                if token_budget and usage.total_tokens >= token_budget:
+                    stop_reason = f"达到token预算{token_budget}"
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+                tasks[task].cancelled = True
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+    
+    if best is None:
+        errors = "; ".join(candidate.error for candidate in candidates if candidate.error)
+        raise RuntimeError(f"{label}的{candidate_count}个候选全部失败: {errors}")
+    
+    print(f"  🏆 {label}选用候选{best.index + 1}（{best.score:.1f}分），{stop_reason}，消耗{usage.total_tokens}个token")
+    return BestOfNResult(
+        best=best.output,
+        best_score=best.score,
+        best_index=best.index,
+        stop_reason=stop_reason,
+        tokens=usage.total_tokens,
+        candidates=candidates
+    )
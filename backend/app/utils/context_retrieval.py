@@ -0,0 +1,291 @@
+"""
+提示词上下文检索
+
+按世界观/剧情大纲维护本地BM25索引（中文按字二元组切分，字母数字按词），文档涵盖角色、地点、事件和较早章节的摘要等。
+构建prompt时以当前章节或事件为查询，按相关度选取top-k上下文，代替按列表位置截取。
+索引按文档内容哈希增量同步：每次只重新切分新增或内容变化的文档，并移除已不存在的文档。
+"""
+import hashlib
+import math
+import re
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+
+
+TOKEN_PATTERN = re.compile(r'[\u4e00-\u9fff]+|[a-z0-9]+')
+
+# 各类文档参与检索的字段，名称字段重复计入以提高名称命中的权重
+CHARACTER_FIELDS = ("name", "name", "role_type", "cultivation_level", "element_type", "personality_traits",
+                    "background", "goals", "current_goals", "relationships", "current_location",
+                    "current_region", "techniques", "organization")
+LOCATION_FIELDS = ("name", "name", "type", "description", "features", "significance")
+EVENT_FIELDS = ("title", "title", "event_type", "description", "outcome", "location", "characters_involved")
+CHAPTER_FIELDS = ("title", "title", "summary")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文连续片段切分为字二元组（单字片段保留单字），字母数字按词"""
+    tokens = []
+    for run in TOKEN_PATTERN.findall(str(text or "").lower()):
+        if run.isascii() or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _field(item: Any, name: str) -> Any:
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def _flatten(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, dict):
+        return " ".join(f"{key} {_flatten(item)}" for key, item in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return " ".join(_flatten(item) for item in value)
+    return str(getattr(value, "value", value))
+
+
+def entity_text(item: Any, fields: Sequence[str]) -> str:
+    """拼接实体的检索字段；字符串实体（如只有名称的地点）直接使用"""
+    if isinstance(item, str):
+        return item
+    return " ".join(_flatten(_field(item, name)) for name in fields)
+
+
+def _entity_key(item: Any, position: int) -> str:
+    if isinstance(item, str):
+        return item
+    for name in ("id", "name", "title"):
+        value = _field(item, name)
+        if value:
+            return str(value)
+    return f"#{position}"
+
+
+class BM25Index:
+    """单类文档的BM25倒排统计，支持增量增删"""
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, Tuple[str, Counter, int]] = {}  # key -> (内容哈希, 词频, 长度)
+        self.doc_freq: Counter = Counter()
+        self.total_length = 0
+    
+    def __len__(self) -> int:
+        return len(self.docs)
+    
+    def digest(self, key: str) -> Optional[str]:
+        doc = self.docs.get(key)
+        return doc[0] if doc else None
+    
+    def upsert(self, key: str, text: str, digest: str):
+        """添加或替换文档"""
+        self.remove(key)
+        tokens = tokenize(text)
+        term_freq = Counter(tokens)
+        self.docs[key] = (digest, term_freq, len(tokens))
+        self.doc_freq.update(term_freq.keys())
+        self.total_length += len(tokens)
+    
+    def remove(self, key: str):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        _, term_freq, length = doc
+        self.doc_freq.subtract(term_freq.keys())
+        for term in term_freq:
+            if self.doc_freq[term] <= 0:
+                del self.doc_freq[term]
+        self.total_length -= length
+    
+    def score(self, query: str, keys: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """计算查询与各文档（或指定文档）的BM25得分，只返回得分大于0的文档"""
+        terms = set(tokenize(query))
+        if not terms or not self.docs:
+            return {}
+        count = len(self.docs)
+        average_length = self.total_length / count or 1
+        idf = {
+            term: math.log(1 + (count - self.doc_freq[term] + 0.5) / (self.doc_freq[term] + 0.5))
+            for term in terms if self.doc_freq.get(term)
+        }
+        scores = {}
+        for key in (keys if keys is not None else self.docs.keys()):
+            doc = self.docs.get(key)
+            if doc is None:
+                continue
+            _, term_freq, length = doc
+            norm = self.k1 * (1 - self.b + self.b * length / average_length)
+            score = sum(
+                weight * term_freq[term] * (self.k1 + 1) / (term_freq[term] + norm)
+                for term, weight in idf.items() if term in term_freq
+            )
+            if score > 0:
+                scores[key] = score
+        return scores
+
+
+class ContextIndex:
+    """一个世界观或剧情大纲的检索索引，按文档类型分别统计"""
+    
+    def __init__(self, scope: str):
+        self.scope = scope
+        self.kinds: Dict[str, BM25Index] = {}
+    
+    def sync(self, kind: str, items: Sequence[Any], fields: Sequence[str], complete: bool = False) -> List[str]:
+        """
+        增量同步某类文档：只重新切分新增或内容变化的文档；complete为True（items是该类文档的全集）时
+        移除不在items中的文档
+        
+        Returns:
+            与items一一对应的文档键
+        """
+        index = self.kinds.setdefault(kind, BM25Index())
+        keys, seen, changed = [], set(), 0
+        for position, item in enumerate(items):
+            key = _entity_key(item, position)
+            if key in seen:
+                key = f"{key}#{position}"
+            keys.append(key)
+            seen.add(key)
+            text = entity_text(item, fields)
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            if index.digest(key) != digest:
+                index.upsert(key, text, digest)
+                changed += 1
+        stale = index.docs.keys() - seen if complete else set()
+        for key in stale:
+            index.remove(key)
+        if changed or stale:
+            print(f"🔎 上下文索引 {self.scope}/{kind}: 更新{changed}个文档，移除{len(stale)}个")
+        return keys
+    
+    def select(self, kind: str, items: Sequence[Any], query: str, top_k: int, fields: Sequence[str],
+               keep_order: bool = False, complete: bool = False) -> List[Any]:
+        """
+        按与查询的相关度选取top_k个实体
+        
+        相关实体不足top_k个时按原顺序补齐；keep_order为True时结果保持原列表顺序（如事件的时间顺序），
+        否则按相关度排序。
+        """
+        keys = self.sync(kind, items, fields, complete)
+        scores = self.kinds[kind].score(query, keys)
+        ranked = sorted(range(len(items)), key=lambda i: (-scores.get(keys[i], 0.0), i))[:top_k]
+        if keep_order:
+            ranked.sort()
+        return [items[i] for i in ranked]
+
+
+_indexes: "OrderedDict[str, ContextIndex]" = OrderedDict()
+
+
+def get_context_index(scope: str) -> ContextIndex:
+    """获取（或创建）指定范围的索引，超过 CONTEXT_INDEX_MAX_SCOPES 时淘汰最久未用的索引"""
+    index = _indexes.get(scope)
+    if index is None:
+        index = _indexes[scope] = ContextIndex(scope)
+        while len(_indexes) > settings.CONTEXT_INDEX_MAX_SCOPES:
+            _indexes.popitem(last=False)
+    else:
+        _indexes.move_to_end(scope)
+    return index
+
+
+def select_context(scope: str, kind: str, items: Optional[Sequence[Any]], query: str, top_k: int,
+                   fields: Sequence[str], keep_order: bool = False, complete: bool = False) -> List[Any]:
+    """
+    选取与查询最相关的top_k个实体；数量不超过top_k、未启用检索或检索失败时按原顺序截取
+    
+    items只是该类文档的一部分（如章节关联的事件）时complete为False，索引中的其他文档保留。
+    """
+    items = list(items or [])
+    if len(items) <= top_k or not settings.CONTEXT_RETRIEVAL_ENABLED or not query.strip():
+        return items[:top_k]
+    try:
+        return get_context_index(scope).select(kind, items, query, top_k, fields, keep_order, complete)
+    except Exception as e:
+        print(f"⚠️ 上下文检索失败，按原顺序截取: {e}")
+        return items[:top_k]
+
+
+def geography_locations(world_view: Optional[Dict[str, Any]]) -> List[Any]:
+    """展开世界观地理设定中的地点（区域、主要区域、特殊地点）"""
+    geography = (world_view or {}).get("geography") if isinstance(world_view, dict) else None
+    if not isinstance(geography, dict):
+        return []
+    locations = []
+    for group in ("main_regions", "regions", "special_locations"):
+        value = geography.get(group) or []
+        locations.extend(value if isinstance(value, list) else [value])
+    return [location for location in locations if location]
+
+
+def chapter_query(chapter_outline: Any) -> str:
+    """以章节标题、概要、核心事件和关键场景（地点、在场角色、关联事件）作为检索查询"""
+    parts = [_flatten(_field(chapter_outline, name)) for name in
+             ("title", "chapter_summary", "core_event", "conflict_development", "writing_notes")]
+    for scene in _field(chapter_outline, "key_scenes") or []:
+        parts.extend(_flatten(_field(scene, name)) for name in
+                     ("title", "scene_title", "description", "scene_description", "location",
+                      "characters_present", "related_events"))
+    return " ".join(part for part in parts if part)
+
+
+def event_query(event: Any) -> str:
+    """以事件标题、描述、结果等作为检索查询"""
+    return entity_text(event, EVENT_FIELDS)
+
+
+def _scope(prefix: str, *candidates: Any) -> str:
+    for candidate in candidates:
+        if candidate:
+            return f"{prefix}:{candidate}"
+    return f"{prefix}:default"
+
+
+def select_detailed_plot_context(chapter_outline: Any, plot_outline: Any, world_view: Dict[str, Any],
+                                 characters: List[Dict[str, Any]], events: Optional[List[Dict[str, Any]]],
+                                 chapter_summaries: Optional[List[Dict[str, Any]]] = None
+                                 ) -> Tuple[List[Any], List[Any], List[Any], List[Any]]:
+    """详细剧情prompt的上下文：按与章节的相关度选取角色、地点、事件和较早章节摘要，返回 (角色, 地点, 事件, 章节摘要)"""
+    query = chapter_query(chapter_outline)
+    world_scope = _scope("worldview", (world_view or {}).get("id"), _field(plot_outline, "worldview_id"))
+    plot_scope = _scope("plot", _field(plot_outline, "id"))
+    return (
+        select_context(world_scope, "characters", characters, query,
+                       settings.CONTEXT_RETRIEVAL_CHARACTERS, CHARACTER_FIELDS, complete=True),
+        select_context(world_scope, "locations", geography_locations(world_view), query,
+                       settings.CONTEXT_RETRIEVAL_LOCATIONS, LOCATION_FIELDS, complete=True),
+        select_context(plot_scope, "events", events, query,
+                       settings.CONTEXT_RETRIEVAL_EVENTS, EVENT_FIELDS, keep_order=True),
+        select_context(plot_scope, "chapters", chapter_summaries, query,
+                       settings.CONTEXT_RETRIEVAL_CHAPTERS, CHAPTER_FIELDS, keep_order=True)
+    )
+
+
+def select_event_scoring_characters(event: Any, characters: Optional[List[Dict[str, Any]]],
+                                    world_info: Any) -> List[Any]:
+    """事件评分prompt的上下文：选取与事件最相关的角色"""
+    world_id = _field(world_info, "id") if isinstance(world_info, dict) else None
+    return select_context(_scope("worldview", world_id), "characters", characters, event_query(event),
+                          settings.CONTEXT_RETRIEVAL_SCORING_CHARACTERS, CHARACTER_FIELDS, complete=True)
+
+
+def select_chapter_outline_events(plot_outline: Dict[str, Any], events: List[Dict[str, Any]],
+                                  act_belonging: Optional[str] = None, context: str = "") -> List[Dict[str, Any]]:
+    """章节大纲prompt的上下文：以剧情大纲、当前幕次和衔接信息为查询选取事件，保持事件原顺序"""
+    parts = [_flatten(plot_outline.get(name)) for name in ("title", "description", "core_conflict")]
+    for act in plot_outline.get("acts") or []:
+        if act_belonging and isinstance(act, dict) and act_belonging in str(act.get("act_name") or ""):
+            parts.append(_flatten(act))
+    parts.extend([act_belonging or "", context])
+    return select_context(_scope("plot", plot_outline.get("id")), "events", events, " ".join(parts),
+                          settings.CONTEXT_RETRIEVAL_CHAPTER_EVENTS, EVENT_FIELDS, keep_order=True)
@@ -6,7 +6,10 @@ import asyncio
 from typing import Any, Dict, List, Optional, Type, Union
 from enum import Enum
 
+from app.core.config import settings
 from app.utils import llm_client
+from app.utils.fuzzy_resolver import FuzzyEnumResolver
+from app.utils.keyword_matcher import KeywordMatcher
 from app.core.character.models import CultivationLevel, ElementType, Gender, GoalType, CharacterRoleType
 from app.core.world.models import CultivationLevel as WorldCultivationLevel, ElementType as WorldElementType
 
@@ -78,19 +81,79 @@ class DynamicParser:
             "其他": CharacterRoleType.OTHER,
             "特殊": CharacterRoleType.SPECIAL,
         }
+        
+        self.power_keywords = {
+            "极弱": 1, "很弱": 2, "弱": 3, "较弱": 4,
+            "中等": 5, "一般": 5, "普通": 5,
+            "较强": 6, "强": 7, "很强": 8, "极强": 9, "最强": 10,
+            "入门": 3, "初级": 4, "中级": 6, "高级": 8, "顶级": 10,
+            "练气": 3, "筑基": 4, "金丹": 5, "元婴": 6, "化神": 7, "合体": 8, "大乘": 9, "仙人": 10
+        }
+        
+        # 各关键词表的匹配器，按需构建，关键词表变化后重建
+        self._matchers: Dict[str, KeywordMatcher] = {}
+        # 关键词未命中时的本地模糊解析（归一化、同义词、相似度），仍未命中才调用LLM
+        self.fuzzy_resolver = FuzzyEnumResolver()
+        self.resolution_stats = {"direct": 0, "normalized": 0, "synonym": 0, "fuzzy": 0, "llm": 0}
+    
+    def _matcher(self, table: str) -> KeywordMatcher:
+        """获取关键词表（如 cultivation_levels）对应的匹配器"""
+        mapping = getattr(self, table)
+        matcher = self._matchers.get(table)
+        if matcher is None or len(matcher) != len(mapping):
+            matcher = KeywordMatcher(mapping)
+            self._matchers[table] = matcher
+        return matcher
+    
+    def _resolve_local(self, table: str, text: str) -> Any:
+        """本地解析：关键词子串匹配，未命中时依次尝试归一化、同义词和相似度匹配，均未命中返回None"""
+        value, tier = self._matcher(table).first(text), "direct"
+        if value is None and settings.DYNAMIC_PARSER_FUZZY_ENABLED:
+            resolved = self.fuzzy_resolver.resolve(table, text, getattr(self, table))
+            if resolved:
+                value, tier, _ = resolved
+        if value is not None:
+            self.resolution_stats[tier] += 1
+        return value
+    
+    def _record_llm_fallback(self, input_str: str):
+        """记录一次LLM兜底解析并输出本地命中率"""
+        self.resolution_stats["llm"] += 1
+        stats = self.get_resolution_stats()
+        print(f"🔍 本地解析未命中，使用LLM解析「{input_str}」"
+              f"（本地命中率 {stats['local_hit_rate']:.0%}，共{stats['total']}次）")
+    
+    def get_resolution_stats(self) -> Dict[str, Any]:
+        """各解析层级的命中次数和本地命中率"""
+        total = sum(self.resolution_stats.values())
+        local = total - self.resolution_stats["llm"]
+        return {**self.resolution_stats, "total": total, "local_hit_rate": round(local / total, 3) if total else 0.0}
+    
+    def match_many(self, table: str, texts: List[str]) -> List[Any]:
+        """
+        批量按关键词表匹配（不调用LLM）
+        
+        Args:
+            table: 关键词表名称，如 cultivation_levels、element_types、genders、goal_types、role_types、power_keywords
+            texts: 待匹配文本列表
+        
+        Returns:
+            与texts等长的列表，未命中关键词的位置为None
+        """
+        return self._matcher(table).first_many([(text or "").strip() for text in texts])
     
     async def parse_cultivation_level(self, level_str: str) -> CultivationLevel:
         """动态解析修炼境界"""
         if not level_str or level_str.strip() == "":
             return CultivationLevel.QI_REFINING
         
-        # 首先尝试直接匹配
+        # 首先尝试本地匹配
         level_str = level_str.strip()
-        for key, value in self.cultivation_levels.items():
-            if key in level_str:
-                return value
+        value = self._resolve_local("cultivation_levels", level_str)
+        if value is not None:
+            return value
         
-        # 如果直接匹配失败，使用LLM解析
+        # 如果本地匹配失败，使用LLM解析
         try:
             return await self._llm_parse_enum(level_str, self.cultivation_levels, CultivationLevel.QI_REFINING)
         except:
@@ -102,9 +165,9 @@ class DynamicParser:
             return ElementType.GOLD
         
         element_str = element_str.strip()
-        for key, value in self.element_types.items():
-            if key in element_str:
-                return value
+        value = self._resolve_local("element_types", element_str)
+        if value is not None:
+            return value
         
         try:
             return await self._llm_parse_enum(element_str, self.element_types, ElementType.GOLD)
@@ -117,9 +180,9 @@ class DynamicParser:
             return Gender.MALE
         
         gender_str = gender_str.strip()
-        for key, value in self.genders.items():
-            if key in gender_str:
-                return value
+        value = self._resolve_local("genders", gender_str)
+        if value is not None:
+            return value
         
         try:
             return await self._llm_parse_enum(gender_str, self.genders, Gender.MALE)
@@ -132,9 +195,9 @@ class DynamicParser:
             return GoalType.POWER
         
         goal_str = goal_str.strip()
-        for key, value in self.goal_types.items():
-            if key in goal_str:
-                return value
+        value = self._resolve_local("goal_types", goal_str)
+        if value is not None:
+            return value
         
         try:
             return await self._llm_parse_enum(goal_str, self.goal_types, GoalType.POWER)
@@ -147,9 +210,9 @@ class DynamicParser:
             return CharacterRoleType.JUSTICE_COMPANION
         
         role_str = role_str.strip()
-        for key, value in self.role_types.items():
-            if key in role_str:
-                return value
+        value = self._resolve_local("role_types", role_str)
+        if value is not None:
+            return value
         
         try:
             return await self._llm_parse_enum(role_str, self.role_types, CharacterRoleType.JUSTICE_COMPANION)
@@ -172,17 +235,9 @@ class DynamicParser:
             pass
         
         # 关键词匹配
-        power_keywords = {
-            "极弱": 1, "很弱": 2, "弱": 3, "较弱": 4,
-            "中等": 5, "一般": 5, "普通": 5,
-            "较强": 6, "强": 7, "很强": 8, "极强": 9, "最强": 10,
-            "入门": 3, "初级": 4, "中级": 6, "高级": 8, "顶级": 10,
-            "练气": 3, "筑基": 4, "金丹": 5, "元婴": 6, "化神": 7, "合体": 8, "大乘": 9, "仙人": 10
-        }
-        
-        for keyword, level in power_keywords.items():
-            if keyword in power_str:
-                return level
+        level = self._resolve_local("power_keywords", power_str)
+        if level is not None:
+            return level
         
         # 使用LLM解析
         try:
@@ -192,6 +247,7 @@ class DynamicParser:
     
     async def _llm_parse_enum(self, input_str: str, enum_mapping: Dict[str, Any], default_value: Any) -> Any:
         """使用LLM解析枚举值"""
+        self._record_llm_fallback(input_str)
         prompt = f"""
 请根据以下输入字符串，从给定的选项中选择最匹配的枚举值。
 
@@ -216,6 +272,7 @@ class DynamicParser:
     
     async def _llm_parse_power_level(self, power_str: str) -> int:
         """使用LLM解析力量等级"""
+        self._record_llm_fallback(power_str)
         prompt = f"""
 请根据以下描述，评估力量等级（1-10分）。
 
@@ -242,18 +299,26 @@ class DynamicParser:
     def add_cultivation_level(self, key: str, value: CultivationLevel):
         """动态添加修炼境界"""
         self.cultivation_levels[key] = value
+        self._matchers.pop("cultivation_levels", None)
+        self.fuzzy_resolver.invalidate("cultivation_levels")
     
     def add_element_type(self, key: str, value: ElementType):
         """动态添加元素类型"""
         self.element_types[key] = value
+        self._matchers.pop("element_types", None)
+        self.fuzzy_resolver.invalidate("element_types")
     
     def add_gender(self, key: str, value: Gender):
         """动态添加性别"""
         self.genders[key] = value
+        self._matchers.pop("genders", None)
+        self.fuzzy_resolver.invalidate("genders")
     
     def add_goal_type(self, key: str, value: GoalType):
         """动态添加目标类型"""
         self.goal_types[key] = value
+        self._matchers.pop("goal_types", None)
+        self.fuzzy_resolver.invalidate("goal_types")
     
     def parse_json(self, text: str) -> Optional[Dict[str, Any]]:
         """解析JSON文本"""
@@ -0,0 +1,232 @@
+"""
+请求级实体加载器（DataLoader / Identity Map）
+
+同一请求内对同类实体的按ID加载会在一个事件循环tick内合并为一次
+`WHERE id = ANY(...)` 查询（在线程中执行，不阻塞事件循环），并对重复的ID进行去重缓存。
+数据库写操作通过 invalidate_entity 清除当前作用域中对应实体的缓存。
+"""
+import asyncio
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+
+class DataLoader:
+    """按键批量加载并缓存结果的加载器"""
+    
+    def __init__(self, batch_fn: Callable[[List[Hashable]], Dict[Hashable, Any]], name: str = "loader"):
+        """
+        Args:
+            batch_fn: 批量加载函数，接收键列表，返回 {键: 值} 字典，缺失的键视为None
+            name: 加载器名称（用于日志）
+        """
+        self.batch_fn = batch_fn
+        self.name = name
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        # 待加载的 (键, Future)；加载期间键被clear时仍能完成已发出的Future
+        self._pending: List[Tuple[Hashable, asyncio.Future]] = []
+        self._batches: set = set()
+        self.batch_count = 0
+        self.load_count = 0
+    
+    async def load(self, key: Hashable) -> Any:
+        """加载单个键，同一tick内的加载会被合并"""
+        return await asyncio.shield(self._get_future(key))
+    
+    async def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """加载多个键，保持输入顺序"""
+        futures = [self._get_future(key) for key in keys]
+        return list(await asyncio.gather(*(asyncio.shield(future) for future in futures)))
+    
+    def _get_future(self, key: Hashable) -> asyncio.Future:
+        """获取键对应的Future，未缓存时加入待加载队列"""
+        self.load_count += 1
+        future = self._cache.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._cache[key] = future
+            self._pending.append((key, future))
+            if len(self._pending) == 1:
+                loop.call_soon(self._dispatch)
+        return future
+    
+    def prime(self, key: Hashable, value: Any):
+        """预填充缓存（已经持有实体时避免再次查询）"""
+        if key in self._cache and not self._cache[key].done():
+            return
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(value)
+        self._cache[key] = future
+    
+    def clear(self, key: Optional[Hashable] = None):
+        """清除单个键或全部缓存（写操作之后调用）"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+    
+    def _dispatch(self):
+        """收集本tick内的键，在后台执行一次批量加载"""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        self.batch_count += 1
+        batch = asyncio.get_running_loop().create_task(self._load_batch(pending))
+        self._batches.add(batch)
+        batch.add_done_callback(self._batches.discard)
+    
+    async def _load_batch(self, pending: List[Tuple[Hashable, asyncio.Future]]):
+        """在线程中执行同步的批量查询，并设置各键的结果"""
+        try:
+            results = await asyncio.to_thread(self.batch_fn, [key for key, _ in pending]) or {}
+        except Exception as e:
+            for key, future in pending:
+                # 失败的结果不缓存，下次加载重新查询
+                if self._cache.get(key) is future:
+                    del self._cache[key]
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        for key, future in pending:
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+class EntityLoader:
+    """聚合各类实体的请求级加载器"""
+    
+    def __init__(self):
+        self._chapter_database = None
+        self._plot_database = None
+        self._world_database = None
+        self._character_database = None
+        self._event_database = None
+        
+        self.chapter_outlines = DataLoader(
+            lambda ids: self.chapter_database.get_chapter_outlines_by_ids(ids), "chapter_outlines"
+        )
+        self.plot_outlines = DataLoader(
+            lambda ids: self.plot_database.get_plot_outlines_by_ids(ids), "plot_outlines"
+        )
+        self.worldviews = DataLoader(
+            lambda ids: self.world_database.get_worldviews_by_ids(ids), "worldviews"
+        )
+        self.characters_by_worldview = DataLoader(
+            lambda ids: self.character_database.get_characters_by_worldview_ids(ids), "characters_by_worldview"
+        )
+        self.events = DataLoader(
+            lambda ids: self.event_database.get_events_by_ids(ids), "events"
+        )
+    
+    @property
+    def chapter_database(self):
+        if self._chapter_database is None:
+            from app.core.chapter_engine.chapter_database import ChapterOutlineDatabase
+            self._chapter_database = ChapterOutlineDatabase()
+        return self._chapter_database
+    
+    @property
+    def plot_database(self):
+        if self._plot_database is None:
+            from app.core.plot_engine.plot_database import PlotOutlineDatabase
+            self._plot_database = PlotOutlineDatabase()
+        return self._plot_database
+    
+    @property
+    def world_database(self):
+        if self._world_database is None:
+            from app.core.world.database import WorldViewDatabase
+            self._world_database = WorldViewDatabase()
+        return self._world_database
+    
+    @property
+    def character_database(self):
+        if self._character_database is None:
+            from app.core.character.database import CharacterDatabase
+            self._character_database = CharacterDatabase()
+        return self._character_database
+    
+    @property
+    def event_database(self):
+        if self._event_database is None:
+            from app.core.event_generator.event_database import EventDatabase
+            self._event_database = EventDatabase()
+        return self._event_database
+    
+    async def get_chapter_outline(self, chapter_id: str):
+        return await self.chapter_outlines.load(chapter_id)
+    
+    async def get_plot_outline(self, plot_id: str):
+        return await self.plot_outlines.load(plot_id)
+    
+    async def get_worldview(self, worldview_id: str) -> Optional[Dict[str, Any]]:
+        return await self.worldviews.load(worldview_id)
+    
+    async def get_characters_by_worldview(self, worldview_id: str) -> List[Dict[str, Any]]:
+        return await self.characters_by_worldview.load(worldview_id) or []
+    
+    async def get_event(self, event_id: str):
+        return await self.events.load(event_id)
+    
+    async def get_events(self, event_ids: Iterable[str]) -> List[Any]:
+        """批量获取事件，过滤不存在的ID"""
+        events = await self.events.load_many(list(dict.fromkeys(event_ids)))
+        return [event for event in events if event is not None]
+    
+    def clear(self):
+        """清空所有缓存"""
+        for loader in (self.chapter_outlines, self.plot_outlines, self.worldviews,
+                       self.characters_by_worldview, self.events):
+            loader.clear()
+    
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取各加载器的调用统计"""
+        return {
+            loader.name: {'loads': loader.load_count, 'batches': loader.batch_count}
+            for loader in (self.chapter_outlines, self.plot_outlines, self.worldviews,
+                           self.characters_by_worldview, self.events)
+        }
+
+
+_current_loader: contextvars.ContextVar[Optional[EntityLoader]] = contextvars.ContextVar(
+    "entity_loader", default=None
+)
+
+
+@contextmanager
+def entity_loader_scope():
+    """在当前上下文内开启一个请求级加载器作用域"""
+    loader = EntityLoader()
+    token = _current_loader.set(loader)
+    try:
+        yield loader
+    finally:
+        _current_loader.reset(token)
+
+
+def invalidate_entity(kind: str, key: Optional[Hashable] = None):
+    """
+    写操作之后清除当前作用域中某类实体的缓存
+    
+    Args:
+        kind: 加载器属性名，如 "chapter_outlines"、"events"
+        key: 实体键，None表示清除该类全部缓存
+    """
+    loader = _current_loader.get()
+    if loader is not None:
+        getattr(loader, kind).clear(key)
+
+
+def get_entity_loader() -> EntityLoader:
+    """
+    获取当前作用域的加载器
+    
+    没有开启作用域时（如脚本或长时间运行的生成流程）返回一个新的加载器，
+    不会跨调用共享缓存，避免读到过期数据。
+    """
+    loader = _current_loader.get()
+    if loader is None:
+        return EntityLoader()
+    return loader
@@ -0,0 +1,232 @@
+"""
+枚举值本地模糊解析
+
+DynamicParser 关键词子串匹配未命中时，在调用LLM之前依次尝试：
+1. 归一化：全角转半角、繁体转简体、去除空白和标点后再做关键词匹配；
+2. 同义词：境界、属性、性别、目标、角色类型的常见别称及拼音写法，同义词须覆盖输入的大部分，
+   不同枚举值的同义词同时出现时不做判断；
+3. 相似度：与关键词逐窗口、与同义词整体比较编辑距离，置信度达到阈值且结果唯一时采用。
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.keyword_matcher import KeywordMatcher
+
+
+# 繁体→简体（覆盖境界、属性、角色等设定用字，非完整繁简转换表），每两个字符为一组
+TRADITIONAL_SIMPLIFIED_PAIRS = (
+    "練练煉炼氣气築筑嬰婴體体靈灵屬属風风電电復复讎仇權权長长護护愛爱創创毀毁滅灭"
+    "強强極极較较級级頂顶後后巔巅圓圆滿满結结無无實实戰战鬥斗師师傳传門门夥伙義义"
+    "與与為为進进變变輕轻歲岁聖圣劍剑陣阵寶宝彌弥虛虚陰阴陽阳雙双龍龙鳳凤獸兽藥药"
+    "術术訣诀經经脈脉識识惡恶親亲夢梦衛卫敵敌對对懷怀戀恋侶侣樂乐壽寿歸归飛飞昇升"
+    "證证緣缘僕仆將将軍军國国貴贵統统領领導导婦妇兒儿爺爷媽妈隱隐殺杀險险醫医錄录"
+    "屍尸雜杂區区東东剛刚鐵铁銀银銅铜錢钱財财熱热災灾禍祸雲云聯联團团隊队員员個个"
+    "們们這这說说會会時时過过還还從从開开關关問问題题點点當当學学動动種种樣样機机"
+    "處处應应誰谁邊边裡里麼么來来見见現现發发頭头習习壞坏懼惧勢势尋寻絕绝階阶別别並并"
+)
+TRADITIONAL_TO_SIMPLIFIED = str.maketrans(TRADITIONAL_SIMPLIFIED_PAIRS[0::2], TRADITIONAL_SIMPLIFIED_PAIRS[1::2])
+# 归一化时去除的空白和标点
+NOISE_PATTERN = re.compile(r'[\s\-_·•・.,，。、:：;；!！?？"\'“”‘’()（）\[\]【】<>《》/\\|]+')
+
+# 各关键词表的同义词 → 关键词表中的键；纯字母的同义词（拼音、英文）只做整体匹配
+DEFAULT_SYNONYMS: Dict[str, Dict[str, str]] = {
+    "cultivation_levels": {
+        "炼气": "练气", "引气": "练气", "结丹": "金丹", "凝丹": "金丹", "元神": "化神",
+        "飞升": "仙人", "散仙": "仙人", "地仙": "仙人", "普通人": "凡人",
+        "fanren": "凡人", "lianqi": "练气", "zhuji": "筑基", "jindan": "金丹", "yuanying": "元婴",
+        "huashen": "化神", "heti": "合体", "dacheng": "大乘", "dujie": "渡劫", "xianren": "仙人",
+        "mortal": "凡人", "immortal": "仙人"
+    },
+    "element_types": {
+        "闪电": "雷", "雷电": "雷", "冰雪": "冰", "冰霜": "冰", "火焰": "火", "烈焰": "火", "岩石": "土",
+        "植物": "木", "草木": "木", "雨水": "水", "黑暗": "暗", "阴影": "暗", "光明": "光", "神圣": "光",
+        "jin": "金", "mu": "木", "shui": "水", "huo": "火", "feng": "风", "lei": "雷", "bing": "冰",
+        "guang": "光", "gold": "金", "metal": "金", "wood": "木", "water": "水", "fire": "火",
+        "earth": "土", "wind": "风", "thunder": "雷", "lightning": "雷", "ice": "冰", "light": "光", "dark": "暗"
+    },
+    "genders": {
+        "雄": "男", "雌": "女", "乾修": "男", "坤修": "女", "少年": "男", "公子": "男", "姑娘": "女",
+        "双性": "非二元", "无性": "非二元", "中性": "非二元",
+        "nan": "男", "nv": "女", "male": "男", "female": "女", "man": "男", "woman": "女", "unknown": "未知"
+    },
+    "goal_types": {
+        "报仇": "复仇", "雪恨": "复仇", "报复": "复仇", "力量": "变强", "强大": "变强", "称霸": "权力",
+        "统治": "权力", "永生": "长生", "不死": "长生", "长寿": "长生", "成仙": "修炼", "得道": "修炼",
+        "守护": "保护", "冒险": "探索", "游历": "探索", "寻找": "探索", "恋爱": "爱情", "情缘": "爱情",
+        "真相": "求知", "真理": "求知", "知识": "求知", "破坏": "毁灭", "开创": "创造", "建立": "创造",
+        "revenge": "复仇", "power": "权力", "love": "爱情", "knowledge": "求知", "protection": "保护",
+        "exploration": "探索"
+    },
+    "role_types": {
+        "主人公": "主角", "男主": "主角", "女主": "主角", "次要": "配角", "龙套": "配角", "路人": "配角",
+        "伙伴": "正义伙伴", "同伴": "正义伙伴", "盟友": "正义伙伴", "队友": "正义伙伴", "反面": "反派",
+        "敌人": "反派", "对手": "反派", "大boss": "反派", "恋人": "情人", "爱人": "情人", "道侣": "情人",
+        "伴侣": "情人", "神秘": "特殊",
+        "protagonist": "主角", "supporting": "配角", "antagonist": "反派", "villain": "反派", "lover": "情人"
+    },
+    "power_keywords": {
+        "炼气": "练气", "结丹": "金丹", "无敌": "最强", "绝顶": "顶级", "登峰造极": "顶级", "平平": "一般",
+        "孱弱": "很弱", "薄弱": "较弱"
+    }
+}
+
+# 相似度匹配只比较输入的前若干字符
+FUZZY_MAX_CHARS = 64
+# 非字母同义词按子串命中时，命中部分须占归一化输入的该比例以上（"炼气期"可命中"炼气"，"女主的宿敌"不命中"女主"）
+SYNONYM_MIN_COVERAGE = 0.6
+
+
+def normalize_text(text: str) -> str:
+    """全角转半角、繁体转简体、转小写并去除空白和标点"""
+    chars = []
+    for char in str(text or ""):
+        code = ord(char)
+        if code == 0x3000:
+            code = 0x20
+        elif 0xFF01 <= code <= 0xFF5E:
+            code -= 0xFEE0
+        chars.append(chr(code))
+    return NOISE_PATTERN.sub("", "".join(chars).translate(TRADITIONAL_TO_SIMPLIFIED).lower())
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Levenshtein编辑距离"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    """整体相似度：1 - 编辑距离/较长长度"""
+    if not a or not b:
+        return 0.0
+    return 1 - edit_distance(a, b) / max(len(a), len(b))
+
+
+def partial_similarity(candidate: str, text: str) -> float:
+    """候选词与文本中最接近的片段的相似度，片段长度取候选词长度±1"""
+    if not candidate or not text:
+        return 0.0
+    best = 0.0
+    for size in {len(candidate) - 1, len(candidate), len(candidate) + 1}:
+        if size <= 0:
+            continue
+        windows = [text] if len(text) <= size else [text[i:i + size] for i in range(len(text) - size + 1)]
+        for window in windows:
+            best = max(best, similarity(candidate, window))
+    return best
+
+
+class FuzzyEnumResolver:
+    """枚举值本地模糊解析器"""
+    
+    def __init__(self, synonyms: Optional[Dict[str, Dict[str, str]]] = None, threshold: Optional[float] = None):
+        """
+        Args:
+            synonyms: {关键词表名称: {同义词: 关键词}}，默认使用 DEFAULT_SYNONYMS
+            threshold: 相似度匹配的置信度阈值，默认取 DYNAMIC_PARSER_FUZZY_THRESHOLD
+        """
+        self.synonyms = {table: dict(items) for table, items in (synonyms or DEFAULT_SYNONYMS).items()}
+        if threshold is None:
+            from app.core.config import settings
+            threshold = settings.DYNAMIC_PARSER_FUZZY_THRESHOLD
+        self.threshold = threshold
+        self._indexes: Dict[str, Dict[str, Any]] = {}
+    
+    def add_synonym(self, table: str, synonym: str, key: str):
+        """添加同义词"""
+        self.synonyms.setdefault(table, {})[synonym] = key
+        self.invalidate(table)
+    
+    def invalidate(self, table: str):
+        """关键词表或同义词变化后清除对应索引"""
+        self._indexes.pop(table, None)
+    
+    def _index(self, table: str, mapping: Dict[str, Any]) -> Dict[str, Any]:
+        """构建关键词表的解析索引：归一化关键词匹配器、同义词匹配器和相似度候选（候选, 枚举值, 是否逐窗口比较）"""
+        index = self._indexes.get(table)
+        if index is not None and index["size"] == len(mapping):
+            return index
+        
+        keywords = [(normalize_text(key), value) for key, value in mapping.items()]
+        synonyms = [(normalize_text(synonym), mapping[key])
+                    for synonym, key in self.synonyms.get(table, {}).items() if key in mapping]
+        text_synonyms = [(synonym, value) for synonym, value in synonyms if synonym and not synonym.isascii()]
+        index = {
+            "size": len(mapping),
+            "keywords": KeywordMatcher(keywords),
+            "synonyms": KeywordMatcher(text_synonyms),
+            "synonym_values": dict(reversed(text_synonyms)),
+            "ascii_synonyms": dict(reversed([(synonym, value) for synonym, value in synonyms if synonym.isascii()])),
+            "candidates": [(candidate, value, True) for candidate, value in keywords if candidate] +
+                          [(candidate, value, False) for candidate, value in synonyms if candidate]
+        }
+        self._indexes[table] = index
+        return index
+    
+    def resolve(self, table: str, text: str, mapping: Dict[str, Any]) -> Optional[Tuple[Any, str, float]]:
+        """
+        本地解析枚举值
+        
+        Args:
+            table: 关键词表名称（用于选择同义词表和缓存索引）
+            text: 待解析文本
+            mapping: {关键词: 枚举值} 关键词表
+        
+        Returns:
+            (枚举值, 命中层级 normalized/synonym/fuzzy, 置信度)，置信度不足或结果不唯一时返回None
+        """
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        index = self._index(table, mapping)
+        
+        value = index["keywords"].first(normalized)
+        if value is not None:
+            return value, "normalized", 1.0
+        
+        if normalized.isascii():
+            value = index["ascii_synonyms"].get(re.sub(r'[^a-z]', '', normalized))
+        else:
+            hits = [(synonym, index["synonym_values"][synonym]) for synonym in index["synonyms"].find(normalized)]
+            if len({value for _, value in hits}) > 1:
+                # 不同枚举值的同义词同时出现（如"主人公的对手"），交给LLM判断
+                return None
+            covered = set()
+            for synonym, _ in hits:
+                start = normalized.find(synonym)
+                while start != -1:
+                    covered.update(range(start, start + len(synonym)))
+                    start = normalized.find(synonym, start + 1)
+            value = hits[0][1] if hits and len(covered) / len(normalized) >= SYNONYM_MIN_COVERAGE else None
+        if value is not None:
+            return value, "synonym", 1.0
+        
+        return self._resolve_fuzzy(normalized[:FUZZY_MAX_CHARS], index["candidates"])
+    
+    def _resolve_fuzzy(self, text: str, candidates: List[Tuple[str, Any, bool]]) -> Optional[Tuple[Any, str, float]]:
+        """
+        按相似度选择枚举值：只比较与输入同一书写系统的候选，最高分对应多个不同枚举值时放弃
+        
+        关键词与输入的各片段比较（容忍关键词前后的其他文字），同义词与整个输入比较。
+        """
+        scores: Dict[Any, float] = {}
+        for candidate, value, partial in candidates:
+            if candidate.isascii() != text.isascii():
+                continue
+            score = partial_similarity(candidate, text) if partial else similarity(candidate, text)
+            if score > scores.get(value, 0.0):
+                scores[value] = score
+        if not scores:
+            return None
+        best = max(scores.values())
+        winners = [value for value, score in scores.items() if score == best]
+        if best < self.threshold or len(winners) > 1:
+            return None
+        return winners[0], "fuzzy", round(best, 3)
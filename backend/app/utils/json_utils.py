@@ -0,0 +1,37 @@
+"""
+JSON序列化工具
+"""
+import json
+from datetime import datetime
+from typing import Any, Optional
+
+
+def json_default(value: Any):
+    """JSON序列化兜底：支持pydantic模型、dataclass、日期、集合等对象"""
+    if hasattr(value, 'dict') and callable(value.dict):
+        return value.dict()
+    if hasattr(value, '__dataclass_fields__'):
+        return {k: getattr(value, k) for k in value.__dataclass_fields__}
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if hasattr(value, 'value'):
+        return value.value
+    if hasattr(value, '__dict__'):
+        return vars(value)
+    return str(value)
+
+
+def dump_json(value: Any) -> Optional[str]:
+    """序列化为JSON字符串，None保持为None"""
+    if value is None:
+        return None
+    return json.dumps(value, ensure_ascii=False, default=json_default)
+
+
+def to_plain(value: Any) -> Any:
+    """转换为只包含dict/list/str/数字的纯数据结构"""
+    if value is None:
+        return None
+    return json.loads(dump_json(value))
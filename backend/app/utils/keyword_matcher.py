@@ -0,0 +1,125 @@
+"""
+多关键词匹配器
+
+关键词按给定顺序确定优先级，命中多个关键词时取优先级最高者，与逐个 `keyword in text` 的
+字典遍历语义一致。关键词数较少时逐个做C层子串查找（CPython下短关键词表最快）；
+关键词数达到 AUTOMATON_MIN_KEYWORDS 时编译为 Aho–Corasick 自动机，每个文本只扫描一遍。
+阈值依据见项目根目录 benchmark_keyword_matching.py。
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+
+# 关键词数达到该值时使用自动机匹配
+AUTOMATON_MIN_KEYWORDS = 100
+
+
+class KeywordMatcher:
+    """按优先级匹配关键词的多模式匹配器"""
+    
+    def __init__(self, keywords: Union[Dict[str, Any], Iterable[Tuple[str, Any]], Iterable[str]],
+                 use_automaton: Optional[bool] = None):
+        """
+        Args:
+            keywords: {关键词: 值} 字典、(关键词, 值) 序列或关键词序列，顺序即优先级；重复关键词保留第一个
+            use_automaton: 是否使用自动机，None时按关键词数自动选择
+        """
+        items = keywords.items() if isinstance(keywords, dict) else keywords
+        self.keywords: List[str] = []
+        self.values: List[Any] = []
+        seen = set()
+        for item in items:
+            keyword, value = item if isinstance(item, tuple) else (item, item)
+            if not keyword or keyword in seen:
+                continue
+            seen.add(keyword)
+            self.keywords.append(keyword)
+            self.values.append(value)
+        
+        if use_automaton is None:
+            use_automaton = len(self.keywords) >= AUTOMATON_MIN_KEYWORDS
+        self.use_automaton = use_automaton
+        if use_automaton:
+            self._build_automaton()
+    
+    def __len__(self) -> int:
+        return len(self.keywords)
+    
+    def _build_automaton(self):
+        """构建Aho–Corasick自动机：goto转移表、失败指针和各状态的输出（关键词序号）"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+        
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] += (index,)
+        
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail_target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail_target if fail_target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+    
+    def _scan(self, text: str) -> set:
+        """自动机单遍扫描，返回命中的关键词序号集合"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state, hits = 0, set()
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                hits.update(output[state])
+        return hits
+    
+    def find(self, text: str) -> List[str]:
+        """返回文本命中的全部关键词（按优先级排序）"""
+        if not text:
+            return []
+        if self.use_automaton:
+            return [self.keywords[index] for index in sorted(self._scan(text))]
+        return [keyword for keyword in self.keywords if keyword in text]
+    
+    def first(self, text: str, default: Any = None) -> Any:
+        """返回优先级最高的命中关键词对应的值，未命中时返回default"""
+        if not text:
+            return default
+        if self.use_automaton:
+            hits = self._scan(text)
+            return self.values[min(hits)] if hits else default
+        for keyword, value in zip(self.keywords, self.values):
+            if keyword in text:
+                return value
+        return default
+    
+    def contains_any(self, text: str) -> bool:
+        """文本是否命中任一关键词"""
+        if not text:
+            return False
+        if self.use_automaton:
+            return bool(self._scan(text))
+        return any(keyword in text for keyword in self.keywords)
+    
+    def find_many(self, texts: Sequence[str]) -> List[List[str]]:
+        """批量匹配，每个文本扫描一遍"""
+        return [self.find(text) for text in texts]
+    
+    def first_many(self, texts: Sequence[str], default: Any = None) -> List[Any]:
+        """批量取优先级最高的命中值，每个文本扫描一遍"""
+        return [self.first(text, default) for text in texts]
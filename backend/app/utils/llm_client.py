@@ -3,12 +3,146 @@ LLM客户端工具类
 """
 import json
 import asyncio
-from typing import Dict, List, Any, Optional
+import contextvars
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Any, Optional, Tuple
 from abc import ABC, abstractmethod
 
 from app.core.config import settings
 
 
+class LLMConcurrencyLimiter:
+    """LLM并发限制器
+    
+    可在多个事件循环（API主循环、任务队列循环）之间共享同一个上限。名额用尽时按先来先到排队，
+    释放名额时直接转交给最早的等待者（通过其所在事件循环唤醒），不轮询也不占用线程。
+    """
+    
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max(1, max_concurrency)
+        self._lock = threading.Lock()
+        self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self.active = 0
+    
+    async def __aenter__(self):
+        with self._lock:
+            if self.active < self.max_concurrency and not self._waiters:
+                self.active += 1
+                return self
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if waiter[1].done() and not waiter[1].cancelled():
+                # 名额已转交但任务被取消，继续转交给下一个等待者
+                self._release()
+            raise
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self._release()
+        return False
+    
+    def _release(self):
+        """释放名额：有等待者时转交给最早的等待者，否则归还"""
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                if loop.is_closed():
+                    continue
+                loop.call_soon_threadsafe(self._hand_over, future)
+                return
+            self.active -= 1
+    
+    def _hand_over(self, future: asyncio.Future):
+        """在等待者的事件循环中唤醒它；等待者已取消时继续转交"""
+        if future.cancelled():
+            self._release()
+        else:
+            future.set_result(None)
+
+
+# 全局LLM并发限制器
+llm_limiter = LLMConcurrencyLimiter(settings.LLM_MAX_CONCURRENCY)
+
+
+class LLMUsage:
+    """LLM调用次数与token用量统计"""
+    
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+    
+    def add(self, prompt_tokens: int, completion_tokens: int):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+    
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+    
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            'calls': self.calls,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens
+        }
+
+
+# 进程级累计用量
+global_llm_usage = LLMUsage()
+_usage_scopes: contextvars.ContextVar[tuple] = contextvars.ContextVar("llm_usage_scopes", default=())
+
+
+@contextmanager
+def llm_usage_scope():
+    """
+    统计当前上下文（含其中创建的异步任务）内的LLM用量，可嵌套
+    
+    用法:
+        with llm_usage_scope() as usage:
+            await generator.generate_novel(...)
+        print(usage.total_tokens)
+    """
+    usage = LLMUsage()
+    token = _usage_scopes.set(_usage_scopes.get() + (usage,))
+    try:
+        yield usage
+    finally:
+        _usage_scopes.reset(token)
+
+
+def record_llm_usage(usage: Any):
+    """记录一次LLM调用的token用量（兼容OpenAI与DashScope的usage字段）"""
+    def read(*names) -> int:
+        for name in names:
+            value = getattr(usage, name, None)
+            if value is None and isinstance(usage, dict):
+                value = usage.get(name)
+            if value is not None:
+                return int(value)
+        return 0
+    
+    prompt_tokens = read('prompt_tokens', 'input_tokens') if usage is not None else 0
+    completion_tokens = read('completion_tokens', 'output_tokens') if usage is not None else 0
+    global_llm_usage.add(prompt_tokens, completion_tokens)
+    for scope in _usage_scopes.get():
+        scope.add(prompt_tokens, completion_tokens)
+
+
 class BaseLLMClient(ABC):
     """LLM客户端基类"""
     
@@ -36,22 +170,26 @@ class AzureOpenAIClient(BaseLLMClient):
     
     async def generate_text(self, prompt: str, **kwargs) -> str:
         """生成文本"""
-        response = await self.client.chat.completions.create(
-            model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=kwargs.get('temperature', settings.AZURE_OPENAI_TEMPERATURE),
-            max_tokens=kwargs.get('max_tokens', settings.AZURE_OPENAI_MAX_TOKENS)
-        )
+        async with llm_limiter:
+            response = await self.client.chat.completions.create(
+                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=kwargs.get('temperature', settings.AZURE_OPENAI_TEMPERATURE),
+                max_tokens=kwargs.get('max_tokens', settings.AZURE_OPENAI_MAX_TOKENS)
+            )
+        record_llm_usage(getattr(response, 'usage', None))
         return response.choices[0].message.content
     
     async def generate_chat(self, messages: list, **kwargs) -> str:
         """生成对话"""
-        response = await self.client.chat.completions.create(
-            model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
-            messages=messages,
-            temperature=kwargs.get('temperature', settings.AZURE_OPENAI_TEMPERATURE),
-            max_tokens=kwargs.get('max_tokens', settings.AZURE_OPENAI_MAX_TOKENS)
-        )
+        async with llm_limiter:
+            response = await self.client.chat.completions.create(
+                model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
+                messages=messages,
+                temperature=kwargs.get('temperature', settings.AZURE_OPENAI_TEMPERATURE),
+                max_tokens=kwargs.get('max_tokens', settings.AZURE_OPENAI_MAX_TOKENS)
+            )
+        record_llm_usage(getattr(response, 'usage', None))
         return response.choices[0].message.content
 
 
@@ -83,14 +221,18 @@ class AlibabaQwenClient(BaseLLMClient):
         from dashscope import Generation
         
         try:
-            response = Generation.call(
-                model=settings.ALIBABA_QWEN_MODEL,
-                prompt=prompt,
-                temperature=kwargs.get('temperature', settings.ALIBABA_QWEN_TEMPERATURE),
-                max_tokens=kwargs.get('max_tokens', settings.ALIBABA_QWEN_MAX_TOKENS)
-            )
+            # dashscope为同步SDK，放到线程中执行，避免阻塞事件循环
+            async with llm_limiter:
+                response = await asyncio.to_thread(
+                    Generation.call,
+                    model=settings.ALIBABA_QWEN_MODEL,
+                    prompt=prompt,
+                    temperature=kwargs.get('temperature', settings.ALIBABA_QWEN_TEMPERATURE),
+                    max_tokens=kwargs.get('max_tokens', settings.ALIBABA_QWEN_MAX_TOKENS)
+                )
             
             if response.status_code == 200:
+                record_llm_usage(getattr(response, 'usage', None))
                 if hasattr(response.output, 'choices') and response.output.choices:
                     return response.output.choices[0].message.content
                 elif hasattr(response.output, 'text') and response.output.text:
@@ -117,14 +259,18 @@ class AlibabaQwenClient(BaseLLMClient):
             # 将messages转换为阿里云格式
             prompt = self._convert_messages_to_prompt(messages)
             
-            response = Generation.call(
-                model=settings.ALIBABA_QWEN_MODEL,
-                prompt=prompt,
-                temperature=kwargs.get('temperature', settings.ALIBABA_QWEN_TEMPERATURE),
-                max_tokens=kwargs.get('max_tokens', settings.ALIBABA_QWEN_MAX_TOKENS)
-            )
+            # dashscope为同步SDK，放到线程中执行，避免阻塞事件循环
+            async with llm_limiter:
+                response = await asyncio.to_thread(
+                    Generation.call,
+                    model=settings.ALIBABA_QWEN_MODEL,
+                    prompt=prompt,
+                    temperature=kwargs.get('temperature', settings.ALIBABA_QWEN_TEMPERATURE),
+                    max_tokens=kwargs.get('max_tokens', settings.ALIBABA_QWEN_MAX_TOKENS)
+                )
             
             if response.status_code == 200:
+                record_llm_usage(getattr(response, 'usage', None))
                 if hasattr(response.output, 'choices') and response.output.choices:
                     return response.output.choices[0].message.content
                 elif hasattr(response.output, 'text') and response.output.text:
@@ -0,0 +1,146 @@
+"""
+进度事件总线
+
+任务处理器和自动生成流程发布结构化的进度事件（阶段、百分比、部分输出），
+客户端通过SSE订阅一次即可收到实时更新，不再轮询任务状态或进度文件。
+发布可以在任意线程、任意事件循环中进行，事件投递到订阅者所在的事件循环。
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+
+# 结束事件：订阅流收到后关闭
+TERMINAL_EVENTS = ("completed", "failed")
+
+
+def task_topic(task_id: str) -> str:
+    """任务进度主题"""
+    return f"task:{task_id}"
+
+
+def session_topic(session_id: str) -> str:
+    """生成会话进度主题"""
+    return f"session:{session_id}"
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """将事件编码为SSE消息"""
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {event.get('event', 'progress')}\ndata: {data}\n\n"
+
+
+class ProgressEventBus:
+    """按主题分发进度事件的发布/订阅总线"""
+    
+    def __init__(self, queue_size: Optional[int] = None, retained_topics: Optional[int] = None):
+        self.queue_size = queue_size or settings.PROGRESS_SUBSCRIBER_QUEUE_SIZE
+        self.retained_topics = retained_topics or settings.PROGRESS_RETAINED_TOPICS
+        self._subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        # 每个主题的最近一次事件，晚到的订阅者先收到当前状态
+        self._last_events: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def publish(self, topic: str, event: str = "progress", stage: Optional[str] = None,
+                percent: Optional[float] = None, message: Optional[str] = None,
+                partial: Any = None, **extra) -> Dict[str, Any]:
+        """
+        发布进度事件（可从任意线程调用）
+        
+        Args:
+            topic: 主题，如 task_topic(task_id) / session_topic(session_id)
+            event: 事件类型，progress / completed / failed
+            stage: 当前阶段
+            percent: 进度百分比（0-100）
+            message: 进度说明
+            partial: 部分输出（如刚生成的角色名、章节标题）
+        """
+        payload = {
+            'topic': topic,
+            'event': event,
+            'stage': stage,
+            'percent': percent,
+            'message': message,
+            'partial': partial,
+            'timestamp': time.time()
+        }
+        payload.update(extra)
+        
+        with self._lock:
+            self._last_events[topic] = payload
+            self._last_events.move_to_end(topic)
+            while len(self._last_events) > self.retained_topics:
+                self._last_events.popitem(last=False)
+            subscribers = list(self._subscribers.get(topic, ()))
+        
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, payload)
+            except RuntimeError:
+                # 订阅者的事件循环已关闭
+                pass
+        return payload
+    
+    def get_last_event(self, topic: str) -> Optional[Dict[str, Any]]:
+        """获取主题的最近一次事件"""
+        with self._lock:
+            return self._last_events.get(topic)
+    
+    def subscriber_count(self, topic: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(topic, ()))
+    
+    def _deliver(self, queue: asyncio.Queue, payload: Dict[str, Any]):
+        """投递事件（在订阅者的事件循环中执行），缓冲已满时丢弃最旧的事件"""
+        if queue.full():
+            try:
+                queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(payload)
+    
+    async def subscribe(self, topic: str, timeout: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        订阅主题，逐个产出事件，收到结束事件后停止
+        
+        Args:
+            topic: 主题
+            timeout: 等待超时秒数，超时产出None（用于发送保活消息）
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        entry = (loop, queue)
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(entry)
+            last_event = self._last_events.get(topic)
+        
+        try:
+            if last_event is not None:
+                yield last_event
+                if last_event['event'] in TERMINAL_EVENTS:
+                    return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                yield event
+                if event['event'] in TERMINAL_EVENTS:
+                    return
+        finally:
+            with self._lock:
+                entries = self._subscribers.get(topic, [])
+                if entry in entries:
+                    entries.remove(entry)
+                if not entries:
+                    self._subscribers.pop(topic, None)
+
+
+# 全局进度事件总线
+progress_bus = ProgressEventBus()
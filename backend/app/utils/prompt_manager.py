@@ -272,11 +272,12 @@ class PromptManager:
         else:
             return prompt_func.format(content=content, dimension=dimension)
     
-    def get_logic_check_prompt(self, content: str = "") -> str:
+    def get_logic_check_prompt(self, content: str = "", context: str = "", chunk_note: str = "",
+                               hints: str = "") -> str:
         """获取逻辑检查prompt"""
         prompt_func = self.load_prompt("logic_check")
         if callable(prompt_func):
-            return prompt_func(content)
+            return prompt_func(content, context, chunk_note, hints)
         else:
             return prompt_func.format(content=content)
     
@@ -354,9 +355,11 @@ class PromptManager:
     
     def get_event_scoring_prompt(self, event, characters: List[Dict[str, Any]], 
                                 world_info: Dict[str, Any], plot_info: Dict[str, Any]) -> str:
-        """获取事件评分prompt"""
+        """获取事件评分prompt，角色按与事件的相关度选取"""
         prompt_func = self.load_prompt("event_scoring")
         if callable(prompt_func):
+            from app.utils.context_retrieval import select_event_scoring_characters
+            characters = select_event_scoring_characters(event, characters, world_info)
             return prompt_func(event, characters, world_info, plot_info)
         else:
             return prompt_func
@@ -393,11 +396,17 @@ class PromptManager:
     
     def get_detailed_plot_prompt(self, chapter_outline: Any, plot_outline: Any, 
                                 world_view: Dict[str, Any], characters: List[Dict[str, Any]], 
-                                events: List[Dict[str, Any]] = None, additional_requirements: str = None) -> str:
-        """获取详细剧情生成prompt - 简化版（基于事件驱动）"""
+                                events: List[Dict[str, Any]] = None, additional_requirements: str = None,
+                                story_so_far: str = "", chapter_summaries: List[Dict[str, Any]] = None) -> str:
+        """获取详细剧情生成prompt - 简化版（基于事件驱动），角色、地点、事件和较早章节摘要按与章节的相关度选取"""
         prompt_func = self.load_prompt("detailed_plot_generation")
         if callable(prompt_func):
-            return prompt_func(chapter_outline, plot_outline, world_view, characters, events, additional_requirements)
+            from app.utils.context_retrieval import select_detailed_plot_context
+            characters, locations, events, related_chapters = select_detailed_plot_context(
+                chapter_outline, plot_outline, world_view, characters, events, chapter_summaries
+            )
+            return prompt_func(chapter_outline, plot_outline, world_view, characters, events,
+                               additional_requirements, locations, story_so_far, related_chapters)
         else:
             return prompt_func
     
@@ -484,6 +493,17 @@ class PromptManager:
         else:
             return prompt_func.format(content=content, issues=issues or [], user_prompt=user_prompt)
     
+    def get_correction_patch_prompt(self, paragraphs: list = None, issues: list = None, user_prompt: str = "") -> str:
+        """获取补丁模式修正prompt"""
+        prompt_func = self.load_prompt("correction_patch")
+        return prompt_func(paragraphs or [], issues or [], user_prompt)
+    
+    def get_story_summary_prompt(self, level: str, material: str, previous_summary: str = "",
+                                 max_chars: int = 300) -> str:
+        """获取分层故事摘要prompt（章节/幕次/全书）"""
+        prompt_func = self.load_prompt("story_summary")
+        return prompt_func(level, material, previous_summary, max_chars)
+    
     def build_prompt(self, prompt_name: str, **kwargs) -> str:
         """构建带参数的prompt"""
         base_prompt = self.load_prompt(prompt_name)
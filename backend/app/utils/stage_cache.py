@@ -0,0 +1,169 @@
+"""
+阶段输入哈希缓存（增量重新生成）
+
+每个生成阶段以"影响prompt的输入字段 + prompt模板版本"计算内容哈希，
+输入未变化时直接返回上次的输出，不再调用LLM；dry-run可在不执行任何生成的
+情况下预估哪些阶段需要重新生成。
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.utils.json_utils import dump_json, to_plain
+
+
+# 项目根目录（backend的上一级）
+PROJECT_ROOT = Path(__file__).resolve().parents[3]
+
+# 各阶段prompt模板的来源文件（相对项目根目录），文件内容的哈希作为模板版本
+STAGE_TEMPLATES = {
+    "world_view": ["prompts/world_generation.py"],
+    "characters": ["prompts/character_generation.py"],
+    "plot_outline": ["prompts/plot_outline_generation.py"],
+    "chapters": ["prompts/chapter_outline_generation.py", "backend/app/utils/context_retrieval.py"],
+    "events": ["prompts/event_generation.py"],
+    "foreshadowing_network": ["prompts/foreshadowing_network_creation.py"],
+    "detailed_plot": ["prompts/detailed_plot_generation.py", "backend/app/utils/context_retrieval.py"],
+    "scoring": ["backend/app/core/scoring/service.py"],
+    "logic_check": ["prompts/logic_check.py"],
+    "story_summary": ["prompts/story_summary.py"]
+}
+
+# 不影响prompt的易变字段，计算哈希前剔除
+VOLATILE_FIELDS = {
+    "id", "created_at", "updated_at", "generation_time", "timestamp",
+    "file_path", "created_by", "updated_by", "stage_report", "batch_info"
+}
+
+
+def normalize_inputs(value: Any) -> Any:
+    """转换为纯数据结构并剔除易变字段"""
+    def strip(item):
+        if isinstance(item, dict):
+            return {k: strip(v) for k, v in item.items() if k not in VOLATILE_FIELDS}
+        if isinstance(item, list):
+            return [strip(v) for v in item]
+        return item
+    return strip(to_plain(value))
+
+
+class StageCache:
+    """按输入哈希缓存阶段输出（本地文件存储）"""
+    
+    def __init__(self, cache_dir: Optional[str] = None, enabled: Optional[bool] = None):
+        self.cache_dir = Path(cache_dir or settings.STAGE_CACHE_DIR)
+        self.enabled = settings.STAGE_CACHE_ENABLED if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._template_versions: Dict[str, tuple] = {}
+    
+    def template_version(self, stage: str) -> str:
+        """阶段prompt模板版本（模板文件内容哈希，按修改时间缓存）"""
+        digest = hashlib.sha256()
+        for relative_path in STAGE_TEMPLATES.get(stage, []):
+            path = PROJECT_ROOT / relative_path
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                digest.update(f"{relative_path}:missing".encode('utf-8'))
+                continue
+            cached = self._template_versions.get(relative_path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, hashlib.sha256(path.read_bytes()).hexdigest())
+                self._template_versions[relative_path] = cached
+            digest.update(f"{relative_path}:{cached[1]}".encode('utf-8'))
+        return digest.hexdigest()[:16]
+    
+    def compute_input_hash(self, stage: str, inputs: Any) -> str:
+        """计算阶段输入哈希"""
+        payload = json.dumps(
+            {"stage": stage, "template": self.template_version(stage), "inputs": normalize_inputs(inputs)},
+            ensure_ascii=False, sort_keys=True, separators=(',', ':')
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _entry_path(self, stage: str, input_hash: str) -> Path:
+        return self.cache_dir / stage / f"{input_hash}.json"
+    
+    def get(self, stage: str, input_hash: str) -> Optional[Dict[str, Any]]:
+        """读取缓存条目，不存在时返回None"""
+        path = self._entry_path(stage, input_hash)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ 读取阶段缓存失败 {path}: {e}")
+            return None
+    
+    def put(self, stage: str, input_hash: str, output: Any):
+        """写入缓存条目（先写临时文件再替换，避免读到半个文件）"""
+        path = self._entry_path(stage, input_hash)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            entry = {
+                "stage": stage,
+                "input_hash": input_hash,
+                "template_version": self.template_version(stage),
+                "created_at": time.time(),
+                "output": output
+            }
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(dump_json(entry))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ 写入阶段缓存失败 {path}: {e}")
+    
+    async def memoize(self, stage: str, inputs: Any, compute: Callable[[], Awaitable[Any]],
+                      force: bool = False, cacheable: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        输入未变化时返回缓存输出，否则执行compute并缓存结果
+        
+        Args:
+            stage: 阶段名称（见 STAGE_TEMPLATES）
+            inputs: 影响prompt的输入
+            compute: 生成函数，返回值需可JSON序列化（会被转换为纯数据结构）
+            force: 忽略缓存强制重新生成
+            cacheable: 判断输出是否可缓存（如解析失败的输出不缓存），默认全部缓存
+        """
+        if not self.enabled:
+            return to_plain(await compute())
+        
+        input_hash = self.compute_input_hash(stage, inputs)
+        if not force:
+            entry = self.get(stage, input_hash)
+            if entry is not None:
+                self.hits += 1
+                print(f"♻️ 阶段 {stage} 输入未变化，复用缓存结果 ({input_hash[:12]})")
+                return entry["output"]
+        
+        self.misses += 1
+        output = to_plain(await compute())
+        if cacheable is None or cacheable(output):
+            self.put(stage, input_hash, output)
+        return output
+    
+    def lookup(self, stage: str, inputs: Any) -> Dict[str, Any]:
+        """dry-run：判断阶段是否需要重新生成"""
+        input_hash = self.compute_input_hash(stage, inputs)
+        entry = self.get(stage, input_hash) if self.enabled else None
+        return {
+            "stage": stage,
+            "input_hash": input_hash,
+            "would_regenerate": entry is None,
+            "cached_at": entry["created_at"] if entry else None,
+            "output": entry["output"] if entry else None
+        }
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+# 全局阶段缓存
+stage_cache = StageCache()
@@ -0,0 +1,342 @@
+"""
+分层滚动摘要记忆（章节 → 幕次 → 全书）
+
+保存详细剧情时只生成该章的章节摘要。幕次和全书摘要按章节顺序滚动：每章记录"本幕截至该章"的摘要快照，
+每幕记录"全书截至该幕"的摘要快照。快照带有由前序内容链式计算的依据哈希，前文修改后，后续快照的依据随之失效，
+在构建前情提要时才按需重新摘要，且只重建该章节提要实际用到的前缀部分；顺序生成时每章只需一次章节摘要和一次滚动摘要。
+
+构建prompt时按章节编号取"前情提要"：此前各幕的全书快照、上一幕摘要、本幕较早章节的滚动快照和最近几章的章节摘要，
+每部分都有字数上限，篇幅不随小说章节数增长。
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import weakref
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+
+
+SENTENCE_PATTERN = re.compile(r'[^。！？!?\n]+[。！？!?]?')
+DEFAULT_ACT = "未分幕"
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def clip(text: str, max_chars: int) -> str:
+    """截断到max_chars字以内"""
+    text = (text or "").strip()
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def extract_summary(text: str, max_chars: int) -> str:
+    """抽取式摘要：在全文中均匀选取句子（保持原顺序），直到达到字数上限"""
+    sentences = [sentence.strip() for sentence in SENTENCE_PATTERN.findall(text or "") if sentence.strip()]
+    if not sentences:
+        return ""
+    if sum(len(sentence) for sentence in sentences) <= max_chars:
+        return "".join(sentences)
+    average_length = sum(len(sentence) for sentence in sentences) / len(sentences)
+    step = math.ceil(len(sentences) / max(1, int(max_chars // average_length)))
+    chosen, size = [], 0
+    # 结尾句通常交代本章结束时的状态，始终作为候选
+    for index in sorted(set(range(0, len(sentences), step)) | {len(sentences) - 1}):
+        if size + len(sentences[index]) <= max_chars:
+            chosen.append(sentences[index])
+            size += len(sentences[index])
+    return "".join(chosen) or clip(sentences[0], max_chars)
+
+
+def _field(item: Any, name: str, default: Any = None) -> Any:
+    if isinstance(item, dict):
+        return item.get(name, default)
+    return getattr(item, name, default)
+
+
+class StoryMemory:
+    """按剧情大纲保存分层摘要（本地文件存储）"""
+    
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.STORY_MEMORY_DIR)
+        # asyncio.Lock 不能跨事件循环使用，按事件循环分别保存各剧情大纲的锁
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Lock]]" = \
+            weakref.WeakKeyDictionary()
+        self._llm_client = None
+        self._prompt_manager = None
+    
+    @property
+    def llm_client(self):
+        if self._llm_client is None:
+            from app.utils.llm_client import get_llm_client
+            self._llm_client = get_llm_client()
+        return self._llm_client
+    
+    @property
+    def prompt_manager(self):
+        if self._prompt_manager is None:
+            from app.utils.prompt_manager import PromptManager
+            self._prompt_manager = PromptManager()
+        return self._prompt_manager
+    
+    def _lock(self, plot_outline_id: str) -> asyncio.Lock:
+        """当前事件循环中该剧情大纲的锁"""
+        loop = asyncio.get_running_loop()
+        locks = self._locks.get(loop)
+        if locks is None:
+            locks = self._locks[loop] = {}
+        return locks.setdefault(plot_outline_id, asyncio.Lock())
+    
+    def _path(self, plot_outline_id: str) -> Path:
+        safe_id = re.sub(r'[^\w\-]', '_', str(plot_outline_id))
+        return self.root / f"{safe_id}.json"
+    
+    def load(self, plot_outline_id: str) -> Dict[str, Any]:
+        """读取剧情大纲的摘要记忆，不存在或读取失败时返回空记忆"""
+        path = self._path(plot_outline_id)
+        empty = {"plot_outline_id": plot_outline_id, "chapters": {}, "acts": {}}
+        if not path.exists():
+            return empty
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ 读取故事摘要记忆失败 {plot_outline_id}: {e}")
+            return empty
+    
+    def _save(self, plot_outline_id: str, memory: Dict[str, Any]):
+        path = self._path(plot_outline_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(memory, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    
+    async def _summarize(self, level: str, material: str, previous: str = "") -> str:
+        """生成摘要：LLM模式按输入缓存摘要结果，失败或extract模式时使用抽取式摘要"""
+        max_chars = {
+            "chapter": settings.STORY_MEMORY_CHAPTER_CHARS,
+            "act": settings.STORY_MEMORY_ACT_CHARS,
+            "book": settings.STORY_MEMORY_BOOK_CHARS
+        }[level]
+        if settings.STORY_MEMORY_SUMMARIZER == "llm":
+            from app.utils.stage_cache import stage_cache
+            prompt = self.prompt_manager.get_story_summary_prompt(level, material, previous, max_chars)
+            
+            async def compute() -> str:
+                response = await self.llm_client.generate_text(
+                    prompt=prompt,
+                    temperature=0.3,
+                    max_tokens=settings.STORY_MEMORY_MAX_TOKENS
+                )
+                return (response or "").strip()
+            
+            try:
+                summary = await stage_cache.memoize(
+                    "story_summary",
+                    {"level": level, "material": material, "previous": previous, "max_chars": max_chars},
+                    compute,
+                    cacheable=bool
+                )
+                if summary:
+                    return clip(summary, max_chars)
+            except Exception as e:
+                print(f"⚠️ {level}摘要生成失败，使用抽取式摘要: {e}")
+        return extract_summary(f"{previous}\n{material}" if previous else material, max_chars)
+    
+    async def record_chapter(self, plot_outline_id: str, chapter_outline: Any, content: str):
+        """
+        记录章节内容并更新章节摘要
+        
+        只摘要本章（内容未变化时不做任何摘要），依赖本章的幕次/全书快照在下次获取前情提要时按需重建；
+        失败时只打印警告，不影响调用方。
+        """
+        if not settings.STORY_MEMORY_ENABLED or not plot_outline_id or not content or chapter_outline is None:
+            return
+        async with self._lock(plot_outline_id):
+            try:
+                memory = self.load(plot_outline_id)
+                number = int(_field(chapter_outline, "chapter_number", 0) or 0)
+                content_hash = _hash(content)
+                chapter = memory["chapters"].get(str(number), {})
+                if chapter.get("content_hash") != content_hash:
+                    chapter = {
+                        "chapter_number": number,
+                        "chapter_outline_id": _field(chapter_outline, "id"),
+                        "title": _field(chapter_outline, "title", "") or "",
+                        "act": _field(chapter_outline, "act_belonging") or DEFAULT_ACT,
+                        "content_hash": content_hash,
+                        "summary": await self._summarize("chapter", content),
+                        "updated_at": datetime.now().isoformat()
+                    }
+                    memory["chapters"][str(number)] = chapter
+                    print(f"🧠 已更新第{number}章摘要（{len(chapter['summary'])}字）")
+                    self._save(plot_outline_id, memory)
+            except Exception as e:
+                print(f"⚠️ 更新故事摘要记忆失败 {plot_outline_id}: {e}")
+    
+    async def record_detailed_plot(self, detailed_plot: Any, content: Optional[str] = None):
+        """按详细剧情（含所属章节大纲ID）记录章节内容，content为空时使用详细剧情当前内容"""
+        if not settings.STORY_MEMORY_ENABLED:
+            return
+        try:
+            from app.utils.entity_loader import get_entity_loader
+            chapter_outline = await get_entity_loader().get_chapter_outline(_field(detailed_plot, "chapter_outline_id"))
+        except Exception as e:
+            print(f"⚠️ 加载章节大纲失败，跳过故事摘要更新: {e}")
+            return
+        await self.record_chapter(_field(detailed_plot, "plot_outline_id"), chapter_outline,
+                                  content if content is not None else _field(detailed_plot, "content", ""))
+    
+    def _ordered_acts(self, chapters: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """按章节顺序把章节分组为幕次，幕次按首章编号排序"""
+        acts: Dict[str, List[Dict[str, Any]]] = {}
+        for chapter in sorted(chapters, key=lambda item: item["chapter_number"]):
+            acts.setdefault(chapter["act"], []).append(chapter)
+        return list(acts.values())
+    
+    async def _refresh(self, memory: Dict[str, Any], chapters: List[Dict[str, Any]]) -> bool:
+        """
+        重新计算依据已变化的幕次滚动快照和全书快照，返回是否有快照被更新
+        
+        chapters为按编号排列的章节前缀；只有最后一幕之前的幕次是完整的，才计算全书快照。
+        """
+        acts = self._ordered_acts(chapters)
+        book_summary, book_basis = "", ""
+        changed = False
+        for position, chapters in enumerate(acts):
+            snapshot, basis = "", ""
+            for chapter in chapters:
+                basis = _hash(basis, chapter["content_hash"])
+                if chapter.get("act_basis") != basis:
+                    if snapshot:
+                        chapter["act_summary"] = await self._summarize("act", chapter["summary"], snapshot)
+                    else:
+                        chapter["act_summary"] = clip(chapter["summary"], settings.STORY_MEMORY_ACT_CHARS)
+                    chapter["act_basis"] = basis
+                    changed = True
+                snapshot = chapter["act_summary"]
+            
+            act_name = chapters[0]["act"]
+            if position == len(acts) - 1:
+                # 最后一幕可能尚未写完，不计算全书快照
+                continue
+            book_basis = _hash(book_basis, basis)
+            entry = memory["acts"].get(act_name) or {}
+            if entry.get("book_basis") != book_basis:
+                if book_summary:
+                    entry["book_summary"] = await self._summarize("book", snapshot, book_summary)
+                else:
+                    entry["book_summary"] = clip(snapshot, settings.STORY_MEMORY_BOOK_CHARS)
+                entry["book_basis"] = book_basis
+                memory["acts"][act_name] = entry
+                changed = True
+            book_summary = entry["book_summary"]
+        return changed
+    
+    def chapter_summaries(self, plot_outline_id: str, before_chapter: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        较早章节的章节摘要（不含前情提要中逐章列出的最近几章），供按相关度检索前文章节
+        
+        Args:
+            plot_outline_id: 剧情大纲ID
+            before_chapter: 只使用编号小于该值的章节，None表示全部已记录章节
+        """
+        if not settings.STORY_MEMORY_ENABLED or not plot_outline_id:
+            return []
+        chapters = sorted(
+            (chapter for chapter in self.load(plot_outline_id)["chapters"].values()
+             if before_chapter is None or chapter["chapter_number"] < before_chapter),
+            key=lambda item: item["chapter_number"]
+        )
+        earlier = chapters[:max(0, len(chapters) - max(0, settings.STORY_MEMORY_RECENT_CHAPTERS))]
+        return [
+            {
+                "id": chapter.get("chapter_outline_id") or f"chapter-{chapter['chapter_number']}",
+                "chapter_number": chapter["chapter_number"],
+                "title": chapter.get("title", ""),
+                "summary": chapter.get("summary", "")
+            }
+            for chapter in earlier
+        ]
+    
+    async def story_so_far(self, plot_outline_id: str, before_chapter: Optional[int] = None,
+                           act: Optional[str] = None) -> str:
+        """
+        获取前情提要
+        
+        提要用到的幕次/全书快照依据已失效时（前文被修改），先重建这部分快照并保存。
+        
+        Args:
+            plot_outline_id: 剧情大纲ID
+            before_chapter: 只使用编号小于该值的章节，None表示全部已记录章节
+            act: 当前章节所属幕次，None时取最后一个已记录章节的幕次
+        """
+        if not settings.STORY_MEMORY_ENABLED or not plot_outline_id:
+            return ""
+        async with self._lock(plot_outline_id):
+            memory = self.load(plot_outline_id)
+            try:
+                return await self._build_story_so_far(plot_outline_id, memory, before_chapter, act)
+            except Exception as e:
+                print(f"⚠️ 获取前情提要失败 {plot_outline_id}: {e}")
+                return ""
+    
+    async def _build_story_so_far(self, plot_outline_id: str, memory: Dict[str, Any],
+                                  before_chapter: Optional[int], act: Optional[str]) -> str:
+        chapters = sorted(
+            (chapter for chapter in memory["chapters"].values()
+             if before_chapter is None or chapter["chapter_number"] < before_chapter),
+            key=lambda item: item["chapter_number"]
+        )
+        if not chapters:
+            return ""
+        act = act or chapters[-1]["act"]
+        recent_count = settings.STORY_MEMORY_RECENT_CHAPTERS
+        recent = chapters[-recent_count:] if recent_count > 0 else []
+        earlier = chapters[:len(chapters) - len(recent)]
+        
+        # 只有较早章节使用幕次/全书快照，按需重建其中依据已失效的部分
+        if await self._refresh(memory, earlier):
+            self._save(plot_outline_id, memory)
+        
+        # 此前各幕：倒数第二个前序幕次的全书快照 + 上一幕的滚动快照
+        previous_acts: List[List[Dict[str, Any]]] = []
+        for chapter in earlier:
+            if chapter["act"] == act:
+                continue
+            if previous_acts and previous_acts[-1][-1]["act"] == chapter["act"]:
+                previous_acts[-1].append(chapter)
+            else:
+                previous_acts.append([chapter])
+        
+        sections = []
+        if len(previous_acts) >= 2:
+            book_summary = (memory["acts"].get(previous_acts[-2][-1]["act"]) or {}).get("book_summary")
+            if book_summary:
+                sections.append(f"【此前各幕】{clip(book_summary, settings.STORY_MEMORY_BOOK_CHARS)}")
+        if previous_acts:
+            last_act = previous_acts[-1][-1]
+            if last_act.get("act_summary"):
+                sections.append(f"【{last_act['act']}（截至第{last_act['chapter_number']}章）】"
+                                f"{clip(last_act['act_summary'], settings.STORY_MEMORY_ACT_CHARS)}")
+        
+        current_act_earlier = [chapter for chapter in earlier if chapter["act"] == act]
+        if current_act_earlier and current_act_earlier[-1].get("act_summary"):
+            sections.append(f"【{act}前情（截至第{current_act_earlier[-1]['chapter_number']}章）】"
+                            f"{clip(current_act_earlier[-1]['act_summary'], settings.STORY_MEMORY_ACT_CHARS)}")
+        
+        for chapter in recent:
+            sections.append(f"【第{chapter['chapter_number']}章 {chapter['title']}】"
+                            f"{clip(chapter['summary'], settings.STORY_MEMORY_CHAPTER_CHARS)}")
+        return "\n".join(sections)
+
+
+# 全局故事摘要记忆实例
+story_memory = StoryMemory()
@@ -0,0 +1,226 @@
+"""
+持久化任务队列数据库操作
+基于PostgreSQL的 FOR UPDATE SKIP LOCKED 实现多节点安全的任务领取
+"""
+from typing import Dict, List, Any, Optional
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+from app.utils.logger import error_log
+from app.utils.json_utils import dump_json
+
+
+class TaskQueueDatabase:
+    """任务队列数据库操作类"""
+    
+    def __init__(self):
+        self.connection_string = settings.DATABASE_URL
+    
+    def get_connection(self):
+        """获取数据库连接"""
+        return psycopg2.connect(self.connection_string, cursor_factory=RealDictCursor)
+    
+    def enqueue_task(self, task_id: str, task_type: str, payload: Dict[str, Any],
+                     max_attempts: int) -> bool:
+        """插入新任务"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO task_queue (id, task_type, payload, max_attempts)
+                        VALUES (%s, %s, %s::jsonb, %s)
+                    """, (task_id, task_type, dump_json(payload), max_attempts))
+                    conn.commit()
+                    return True
+        except Exception as e:
+            error_log("任务入队失败", e)
+            raise
+    
+    def claim_task(self, worker_id: str, task_types: List[str], lease_seconds: int) -> Optional[Dict[str, Any]]:
+        """
+        领取一个可执行的任务
+        
+        使用 FOR UPDATE SKIP LOCKED，多个节点并发领取时互不阻塞，也不会重复领取同一任务。
+        
+        Returns:
+            任务记录字典，没有可执行任务时返回None
+        """
+        if not task_types:
+            return None
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE task_queue
+                        SET status = 'processing',
+                            worker_id = %s,
+                            attempts = attempts + 1,
+                            progress = 10,
+                            error = NULL,
+                            started_at = COALESCE(started_at, NOW()),
+                            heartbeat_at = NOW(),
+                            lease_expires_at = NOW() + make_interval(secs => %s),
+                            updated_at = NOW()
+                        WHERE id = (
+                            SELECT id FROM task_queue
+                            WHERE status = 'queued'
+                              AND available_at <= NOW()
+                              AND task_type = ANY(%s)
+                            ORDER BY available_at, created_at
+                            FOR UPDATE SKIP LOCKED
+                            LIMIT 1
+                        )
+                        RETURNING *
+                    """, (worker_id, lease_seconds, list(task_types)))
+                    row = cursor.fetchone()
+                    conn.commit()
+                    return dict(row) if row else None
+        except Exception as e:
+            error_log("领取任务失败", e)
+            return None
+    
+    def heartbeat(self, worker_id: str, task_ids: List[str], lease_seconds: int) -> int:
+        """为本节点正在执行的任务续约，返回续约成功的任务数"""
+        if not task_ids:
+            return 0
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE task_queue
+                        SET heartbeat_at = NOW(),
+                            lease_expires_at = NOW() + make_interval(secs => %s)
+                        WHERE id = ANY(%s) AND worker_id = %s AND status = 'processing'
+                    """, (lease_seconds, list(task_ids), worker_id))
+                    conn.commit()
+                    return cursor.rowcount
+        except Exception as e:
+            error_log("任务心跳失败", e)
+            return 0
+    
+    def requeue_expired_tasks(self) -> int:
+        """
+        回收租约过期的任务（执行节点崩溃或失联）
+        
+        未超过最大重试次数的任务重新排队，否则标记为失败。
+        """
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE task_queue
+                        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                            error = '执行节点租约过期: ' || COALESCE(worker_id, ''),
+                            worker_id = NULL,
+                            progress = 0,
+                            available_at = NOW(),
+                            completed_at = CASE WHEN attempts >= max_attempts THEN NOW() ELSE NULL END,
+                            lease_expires_at = NULL,
+                            updated_at = NOW()
+                        WHERE id IN (
+                            SELECT id FROM task_queue
+                            WHERE status = 'processing' AND lease_expires_at < NOW()
+                            FOR UPDATE SKIP LOCKED
+                        )
+                    """)
+                    conn.commit()
+                    return cursor.rowcount
+        except Exception as e:
+            error_log("回收过期任务失败", e)
+            return 0
+    
+    def complete_task(self, task_id: str, worker_id: str, result: Any) -> bool:
+        """标记任务完成"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE task_queue
+                        SET status = 'completed',
+                            progress = 100,
+                            result = %s::jsonb,
+                            error = NULL,
+                            completed_at = NOW(),
+                            lease_expires_at = NULL,
+                            updated_at = NOW()
+                        WHERE id = %s AND worker_id = %s
+                    """, (dump_json(result), task_id, worker_id))
+                    conn.commit()
+                    return cursor.rowcount > 0
+        except Exception as e:
+            error_log("标记任务完成失败", e)
+            return False
+    
+    def fail_task(self, task_id: str, worker_id: Optional[str], error: str, retry_delay_seconds: int) -> Optional[str]:
+        """
+        标记任务执行失败
+        
+        未超过最大重试次数时延迟重新排队，否则标记为最终失败。
+        
+        Returns:
+            更新后的任务状态，任务不存在或不属于该节点时返回None
+        """
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE task_queue
+                        SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END,
+                            progress = 0,
+                            error = %s,
+                            worker_id = NULL,
+                            available_at = NOW() + make_interval(secs => %s * attempts),
+                            completed_at = CASE WHEN attempts >= max_attempts THEN NOW() ELSE NULL END,
+                            lease_expires_at = NULL,
+                            updated_at = NOW()
+                        WHERE id = %s AND (%s::varchar IS NULL OR worker_id = %s)
+                        RETURNING status
+                    """, (error, retry_delay_seconds, task_id, worker_id, worker_id))
+                    row = cursor.fetchone()
+                    conn.commit()
+                    return row['status'] if row else None
+        except Exception as e:
+            error_log("标记任务失败失败", e)
+            return None
+    
+    def update_progress(self, task_id: str, progress: int) -> bool:
+        """更新任务进度"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        UPDATE task_queue SET progress = %s, updated_at = NOW()
+                        WHERE id = %s AND status = 'processing'
+                    """, (progress, task_id))
+                    conn.commit()
+                    return cursor.rowcount > 0
+        except Exception as e:
+            error_log("更新任务进度失败", e)
+            return False
+    
+    def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务记录"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT * FROM task_queue WHERE id = %s", (task_id,))
+                    row = cursor.fetchone()
+                    return dict(row) if row else None
+        except Exception as e:
+            error_log("获取任务失败", e)
+            return None
+    
+    def get_status_counts(self) -> Dict[str, int]:
+        """按状态统计任务数量"""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        SELECT status, COUNT(*) AS count FROM task_queue GROUP BY status
+                    """)
+                    return {row['status']: row['count'] for row in cursor.fetchall()}
+        except Exception as e:
+            error_log("统计任务状态失败", e)
+            return {}
@@ -0,0 +1,160 @@
+"""
+事件分片生成基准测试脚本
+
+在50个事件的剧情上对比单次生成与分片生成的耗时和失败率。使用模拟LLM客户端：
+耗时与输出token数成正比，每个事件有固定概率输出损坏的JSON（整个响应无法解析），
+输出超过max_tokens时响应被截断。
+
+用法:
+    python benchmark_event_sharding.py
+    python benchmark_event_sharding.py --runs 50 --event-error-rate 0.02 --seconds-per-1k-tokens 0.25
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path('.')
+sys.path.insert(0, str(project_root / 'backend'))
+
+from app.core.config import settings
+from app.core.event_generator.event_generator import EventGenerator
+from app.utils import llm_client
+from app.utils.llm_client import llm_limiter, record_llm_usage
+
+
+PLOT_OUTLINE = {
+    "id": "benchmark_plot",
+    "title": "青云问道",
+    "acts": [
+        {"act_number": 1, "act_name": "第一幕 初入仙途", "core_mission": "拜入宗门"},
+        {"act_number": 2, "act_name": "第二幕 正魔之争", "core_mission": "卷入宗门大战"},
+        {"act_number": 3, "act_name": "第三幕 灵气真相", "core_mission": "揭开灵气复苏的真相"}
+    ]
+}
+IMPORTANCE_DISTRIBUTION = {"重大事件": 6, "重要事件": 14, "普通事件": 24, "特殊事件": 6}
+
+
+class SimulatedEventLLMClient:
+    """模拟事件生成的LLM客户端：耗时与输出token成正比，按事件数累积JSON损坏概率"""
+    
+    def __init__(self, seconds_per_1k_tokens: float, tokens_per_event: int, event_error_rate: float,
+                 max_tokens: int = 20000):
+        self.seconds_per_1k_tokens = seconds_per_1k_tokens
+        self.tokens_per_event = tokens_per_event
+        self.event_error_rate = event_error_rate
+        self.max_tokens = max_tokens
+        self.calls = 0
+    
+    async def generate_chat(self, messages: list, **kwargs) -> str:
+        request = json.loads(messages[-1]["content"])
+        count = sum(request["importance_distribution"].values())
+        output_tokens = min(count * self.tokens_per_event, self.max_tokens)
+        async with llm_limiter:
+            self.calls += 1
+            await asyncio.sleep(output_tokens / 1000 * self.seconds_per_1k_tokens)
+        record_llm_usage({"input_tokens": 1500, "output_tokens": output_tokens})
+        
+        truncated = count * self.tokens_per_event > self.max_tokens
+        corrupted = any(random.random() < self.event_error_rate for _ in range(count))
+        if truncated or corrupted:
+            return '{"events": [{"title": "未闭合的事件'
+        
+        events = []
+        for tier, tier_count in request["importance_distribution"].items():
+            for i in range(tier_count):
+                events.append({
+                    "title": f"{request.get('act') or '全书'}·{tier}{i + 1}",
+                    "event_type": tier,
+                    "description": "模拟事件",
+                    "story_position": random.random()
+                })
+        return json.dumps({"events": events}, ensure_ascii=False)
+
+
+class BenchmarkEventGenerator(EventGenerator):
+    """prompt只携带分片参数、不访问数据库的事件生成器"""
+    
+    def __init__(self):
+        super().__init__()
+        self.event_database = type("NoDatabase", (), {"get_next_sequence_order": lambda self, plot_id: 1})()
+    
+    def _build_enhanced_event_prompt(self, world_view, characters, plot_outline, importance_distribution,
+                                     event_requirements, generate_chapter_integration, selected_act=None,
+                                     story_tone="", narrative_structure="") -> str:
+        return json.dumps({
+            "importance_distribution": importance_distribution,
+            "act": (selected_act or {}).get("act_name")
+        }, ensure_ascii=False)
+
+
+async def run_mode(sharded: bool, runs: int, client: SimulatedEventLLMClient) -> dict:
+    """运行指定模式并统计耗时、失败率和事件丢失率"""
+    generator = BenchmarkEventGenerator()
+    expected = sum(IMPORTANCE_DISTRIBUTION.values())
+    durations, failures, lost = [], 0, 0
+    client.calls = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            events = await generator.generate_enhanced_events(
+                PLOT_OUTLINE, {}, [], IMPORTANCE_DISTRIBUTION,
+                save_to_database=False, sharded=sharded
+            )
+        except Exception:
+            events = []
+        durations.append(time.perf_counter() - start)
+        if len(events) < expected:
+            failures += 1
+            lost += expected - len(events)
+    return {
+        "avg_seconds": round(sum(durations) / runs, 3),
+        "failure_rate": round(failures / runs, 3),
+        "event_loss_rate": round(lost / (expected * runs), 3),
+        "llm_calls_per_run": round(client.calls / runs, 1)
+    }
+
+
+async def run_benchmark(runs: int, seconds_per_1k_tokens: float, tokens_per_event: int, event_error_rate: float):
+    client = SimulatedEventLLMClient(seconds_per_1k_tokens, tokens_per_event, event_error_rate)
+    llm_client._client = client
+    
+    results = {
+        "single": await run_mode(False, runs, client),
+        "sharded": await run_mode(True, runs, client)
+    }
+    
+    total = sum(IMPORTANCE_DISTRIBUTION.values())
+    print(f"\n📊 事件分片生成基准（{total}个事件，{runs}轮，每事件{tokens_per_event}token，"
+          f"单事件JSON损坏率{event_error_rate}，分片大小{settings.EVENT_SHARD_SIZE}，"
+          f"重试{settings.EVENT_SHARD_MAX_RETRIES}次，LLM并发{settings.LLM_MAX_CONCURRENCY}）")
+    print(f"{'模式':<10}{'平均耗时(s)':<14}{'失败率':<10}{'事件丢失率':<12}{'LLM调用/轮':<12}")
+    for mode, item in results.items():
+        print(f"{mode:<10}{item['avg_seconds']:<14}{item['failure_rate']:<10}"
+              f"{item['event_loss_rate']:<12}{item['llm_calls_per_run']:<12}")
+    single, sharded = results["single"], results["sharded"]
+    if sharded["avg_seconds"]:
+        print(f"⏱️ 耗时加速比: {single['avg_seconds'] / sharded['avg_seconds']:.2f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="事件分片生成基准测试")
+    parser.add_argument("--runs", type=int, default=20, help="每种模式的运行轮数")
+    parser.add_argument("--seconds-per-1k-tokens", type=float, default=0.25,
+                        help="模拟每千个输出token的耗时（秒）")
+    parser.add_argument("--tokens-per-event", type=int, default=350, help="每个事件的输出token数")
+    parser.add_argument("--event-error-rate", type=float, default=0.01,
+                        help="每个事件导致整个JSON损坏的概率")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    asyncio.run(run_benchmark(args.runs, args.seconds_per_1k_tokens, args.tokens_per_event, args.event_error_rate))
+
+
+if __name__ == "__main__":
+    main()
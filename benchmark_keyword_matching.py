@@ -0,0 +1,111 @@
+"""
+关键词匹配基准测试脚本
+
+对比逐个 `keyword in text` 的字典遍历、KeywordMatcher 逐关键词模式和自动机模式的耗时：
+1. 逻辑问题分类器和动态解析器的实际关键词表；
+2. 不同规模的随机关键词表（用于确定 AUTOMATON_MIN_KEYWORDS 阈值）。随机关键词取自常用汉字区，
+   与文本很少命中，字典遍历无法提前返回，对应大关键词表（如角色名表）的常见情况。
+
+用法:
+    python benchmark_keyword_matching.py
+    python benchmark_keyword_matching.py --texts 2000 --text-length 120 --sizes 16 64 256 1024
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path('.')
+sys.path.insert(0, str(project_root / 'backend'))
+
+from app.core.logic.engine import LogicIssueClassifier
+from app.utils.dynamic_parser import DynamicParser
+from app.utils.keyword_matcher import AUTOMATON_MIN_KEYWORDS, KeywordMatcher
+
+
+CHARSET = "天地玄黄宇宙洪荒日月盈昃辰宿列张寒来暑往秋收冬藏金木水火土境界功法灵根修炼突破门派规则角色剧情矛盾问题建议"
+KEYWORD_CHARSET = "".join(chr(0x4e00 + i) for i in range(3000))
+
+
+def dict_loop_first(pairs, text, default=None):
+    """原实现：按顺序逐个子串查找"""
+    for keyword, value in pairs:
+        if keyword in text:
+            return value
+    return default
+
+
+def random_text(length: int, charset: str = CHARSET) -> str:
+    return "".join(random.choice(charset) for _ in range(length))
+
+
+def time_it(func, texts, repeat: int) -> float:
+    """返回每个文本的平均耗时（微秒），取repeat次中的最小值"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(texts)
+        best = min(best, time.perf_counter() - start)
+    return best / len(texts) * 1e6
+
+
+def compare(name: str, pairs, texts, repeat: int) -> dict:
+    """对比三种方式，并校验结果一致"""
+    direct = KeywordMatcher(pairs, use_automaton=False)
+    automaton = KeywordMatcher(pairs, use_automaton=True)
+    expected = [dict_loop_first(pairs, text) for text in texts]
+    assert direct.first_many(texts) == expected and automaton.first_many(texts) == expected, f"{name} 匹配结果不一致"
+    
+    return {
+        "name": name,
+        "keywords": len(direct),
+        "dict_loop": time_it(lambda items: [dict_loop_first(pairs, text) for text in items], texts, repeat),
+        "direct": time_it(direct.first_many, texts, repeat),
+        "automaton": time_it(automaton.first_many, texts, repeat)
+    }
+
+
+def run_benchmark(text_count: int, text_length: int, sizes, repeat: int):
+    texts = [random_text(text_length) for _ in range(text_count)]
+    classifier = LogicIssueClassifier()
+    parser = DynamicParser()
+    
+    results = [
+        compare("问题分类", [(keyword, category) for category, keywords in classifier.category_keywords.items()
+                             for keyword in keywords], texts, repeat),
+        compare("严重程度", [(keyword, severity) for severity, keywords in classifier.severity_keywords.items()
+                             for keyword in keywords], texts, repeat),
+        compare("修炼境界", list(parser.cultivation_levels.items()), texts, repeat),
+        compare("实力等级", list(parser.power_keywords.items()), texts, repeat)
+    ]
+    for size in sizes:
+        keywords = list(dict.fromkeys(random_text(random.randint(2, 4), KEYWORD_CHARSET) for _ in range(size * 2)))[:size]
+        results.append(compare(f"随机{size}", [(keyword, i) for i, keyword in enumerate(keywords)], texts, repeat))
+    
+    print(f"\n📊 关键词匹配基准（{text_count}个文本，每个{text_length}字，单位：微秒/文本，"
+          f"自动机阈值{AUTOMATON_MIN_KEYWORDS}个关键词）")
+    print(f"{'关键词表':<10}{'关键词数':<10}{'字典遍历':<12}{'逐词匹配':<12}{'自动机':<12}{'自动选择':<10}")
+    for item in results:
+        chosen = "自动机" if item["keywords"] >= AUTOMATON_MIN_KEYWORDS else "逐词"
+        print(f"{item['name']:<10}{item['keywords']:<12}{item['dict_loop']:<14.2f}"
+              f"{item['direct']:<14.2f}{item['automaton']:<14.2f}{chosen:<10}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="关键词匹配基准测试")
+    parser.add_argument("--texts", type=int, default=1000, help="文本数量")
+    parser.add_argument("--text-length", type=int, default=80, help="每个文本的字数")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[16, 32, 64, 128, 256, 1024],
+                        help="随机关键词表的规模")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数（取最小值）")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    run_benchmark(args.texts, args.text_length, args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+评分模式基准测试脚本
+
+对比 sequential / parallel / fused 三种评分模式的耗时和LLM调用量。
+
+用法:
+    python benchmark_scoring.py                       # 使用真实LLM
+    python benchmark_scoring.py --simulated-latency 2 # 使用固定延迟的模拟客户端（不消耗token）
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目路径
+project_root = Path('.')
+sys.path.insert(0, str(project_root / 'backend'))
+
+from app.core.scoring.service import ScoringService, SCORING_MODES, SCORING_DIMENSIONS
+from app.utils.llm_client import llm_usage_scope, record_llm_usage
+from app.utils.stage_cache import stage_cache
+
+
+SAMPLE_CONTENT = {
+    "world_view": {"name": "青云界", "description": "灵气复苏后的修仙世界，宗门林立"},
+    "characters": [
+        {"name": "林风", "role_type": "主角", "personality_traits": "坚毅、重情义"},
+        {"name": "玄冥老祖", "role_type": "反派", "personality_traits": "阴狠、城府极深"}
+    ],
+    "plot_outline": {
+        "title": "青云问道",
+        "summary": "少年林风意外获得上古传承，卷入正魔两道之争，最终揭开灵气复苏的真相"
+    }
+}
+
+
+class SimulatedLLMClient:
+    """固定延迟的模拟LLM客户端"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+    
+    async def generate_chat(self, messages: list, **kwargs) -> str:
+        await asyncio.sleep(self.latency)
+        prompt = messages[-1]["content"]
+        record_llm_usage({"input_tokens": len(prompt), "output_tokens": 20})
+        if "JSON" in prompt:
+            return json.dumps({dimension: random.randint(5, 9) for dimension in SCORING_DIMENSIONS})
+        return str(random.randint(5, 9))
+
+
+async def run_benchmark(rounds: int, simulated_latency: float = None):
+    """逐个模式运行评分并输出耗时对比"""
+    # 每轮评分相同内容，关闭阶段缓存以测量真实调用耗时
+    stage_cache.enabled = False
+    results = {}
+    for mode in SCORING_MODES:
+        service = ScoringService(mode=mode)
+        if simulated_latency is not None:
+            service.llm_client = SimulatedLLMClient(simulated_latency)
+        
+        durations = []
+        with llm_usage_scope() as usage:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                score = await service.score_content(SAMPLE_CONTENT)
+                durations.append(time.perf_counter() - start)
+                if "error" in score:
+                    print(f"❌ {mode} 评分失败: {score['error']}")
+        
+        results[mode] = {
+            "avg_seconds": round(sum(durations) / len(durations), 3),
+            "min_seconds": round(min(durations), 3),
+            "llm_calls_per_round": round(usage.calls / rounds, 1),
+            "tokens_per_round": round(usage.total_tokens / rounds)
+        }
+    
+    baseline = results["sequential"]["avg_seconds"]
+    print(f"\n📊 评分模式基准（{rounds}轮{'，模拟延迟 %.1fs' % simulated_latency if simulated_latency is not None else ''}）")
+    print(f"{'模式':<12}{'平均耗时(s)':<14}{'最短耗时(s)':<14}{'LLM调用/轮':<12}{'token/轮':<10}{'加速比':<8}")
+    for mode, item in results.items():
+        speedup = baseline / item["avg_seconds"] if item["avg_seconds"] else 0
+        print(f"{mode:<12}{item['avg_seconds']:<14}{item['min_seconds']:<14}"
+              f"{item['llm_calls_per_round']:<12}{item['tokens_per_round']:<10}{speedup:.2f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="评分模式基准测试")
+    parser.add_argument("--rounds", type=int, default=3, help="每种模式的评分轮数")
+    parser.add_argument("--simulated-latency", type=float, default=None,
+                        help="使用模拟LLM客户端，每次调用的固定延迟（秒）")
+    args = parser.parse_args()
+    asyncio.run(run_benchmark(args.rounds, args.simulated_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -2514,6 +2514,28 @@ CREATE TABLE IF NOT EXISTS story_arc_points (
     PRIMARY KEY (id)
 );
 
+-- 表: task_queue
+CREATE TABLE IF NOT EXISTS task_queue (
+    id character varying(64) NOT NULL,
+    task_type character varying(100) NOT NULL,
+    payload jsonb NOT NULL DEFAULT '{}'::jsonb,
+    status character varying(20) NOT NULL DEFAULT 'queued'::character varying,
+    progress integer NOT NULL DEFAULT 0,
+    attempts integer NOT NULL DEFAULT 0,
+    max_attempts integer NOT NULL DEFAULT 3,
+    worker_id character varying(255),
+    result jsonb,
+    error text,
+    available_at timestamp with time zone NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    heartbeat_at timestamp with time zone,
+    lease_expires_at timestamp with time zone,
+    created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    started_at timestamp with time zone,
+    completed_at timestamp with time zone,
+    updated_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id)
+);
+
 -- 表: worldview_metadata
 CREATE TABLE IF NOT EXISTS worldview_metadata (
     id integer NOT NULL DEFAULT nextval('worldview_metadata_id_seq'::regclass),
@@ -2813,6 +2835,10 @@ CREATE UNIQUE INDEX societies_worldview_id_key ON public.societies USING btree (
 
 CREATE INDEX IF NOT EXISTS idx_story_arc_points_plot_id ON public.story_arc_points USING btree (plot_outline_id);
 
+CREATE INDEX IF NOT EXISTS idx_task_queue_claim ON public.task_queue USING btree (status, available_at, created_at);
+
+CREATE INDEX IF NOT EXISTS idx_task_queue_lease ON public.task_queue USING btree (status, lease_expires_at);
+
 CREATE INDEX IF NOT EXISTS idx_worldview_metadata_value ON public.worldview_metadata USING gin (metadata_value);
 
 CREATE INDEX IF NOT EXISTS idx_worldview_metadata_worldview_id ON public.worldview_metadata USING btree (worldview_id);
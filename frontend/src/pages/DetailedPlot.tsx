@@ -192,7 +192,9 @@ const DetailedPlot: React.FC = () => {
           chapter_outline_id: values.chapter_outline_id,
           plot_outline_id: selectedPlotOutline,
           title: selectedChapter.title, // 使用章节标题
-          additional_requirements: values.additional_requirements || ''
+          additional_requirements: values.additional_requirements || '',
+          // 章节已有详细剧情时视为重新生成，跳过后端阶段缓存
+          force_regenerate: detailedPlots.some(plot => plot.chapter_outline_id === values.chapter_outline_id)
         }),
       });
 
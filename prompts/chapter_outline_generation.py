@@ -8,10 +8,12 @@ def get_chapter_outline_prompt(
     chapter_count: int,
     start_chapter: int,
     act_belonging: str = None,
-    additional_requirements: str = ""
+    additional_requirements: str = "",
+    continuity: str = "",
+    story_so_far: str = ""
 ) -> str:
     """
-    生成事件驱动的章节大纲prompt
+    生成事件驱动的章节大纲prompt，story_so_far为已写出章节的前情提要
     """
     
     # 构建事件信息（简化版，只包含名称和描述）
@@ -33,6 +35,8 @@ def get_chapter_outline_prompt(
 """
     else:
         events_info = "### 可用事件列表\n暂无可用事件，请根据剧情需要自行编造事件。"
+    
+    story_info = f"### 前情提要（已写出的章节，新章节须承接其后）\n{story_so_far}\n" if story_so_far else ""
 
     prompt = f"""
 你是一位专业的小说章节大纲生成师，擅长基于事件驱动生成连贯的章节大纲。
@@ -59,8 +63,10 @@ def get_chapter_outline_prompt(
 叙事结构: {plot_outline.get('narrative_structure', '未知')}
 故事结构: {plot_outline.get('story_structure', '未知')}
 
+{story_info}
 ### 额外要求
 {additional_requirements if additional_requirements else "无特殊要求"}
+{continuity}
 
 ## 生成要求
 
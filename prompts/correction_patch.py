@@ -0,0 +1,86 @@
+"""
+修正智能体Prompt模板 - 补丁模式
+只输出针对问题的局部修改（锚定查找替换或按段落替换），由程序在本地应用
+"""
+
+def get_correction_patch_prompt(paragraphs: list, issues: list, user_prompt: str = "") -> str:
+    """
+    获取补丁模式修正prompt
+    
+    Args:
+        paragraphs: 带编号的段落列表（按顺序，编号从1开始）
+        issues: 问题清单列表
+        user_prompt: 用户修正要求
+    
+    Returns:
+        格式化的prompt字符串
+    """
+    
+    # 带编号的原文
+    numbered_content = "\n".join(f"[P{i}] {paragraph}" for i, paragraph in enumerate(paragraphs, 1))
+    
+    # 构建问题列表
+    issues_text = ""
+    if issues:
+        for i, issue in enumerate(issues, 1):
+            issues_text += f"""
+问题 {i}:
+- 分类: {issue.get('category', '未知')}
+- 严重程度: {issue.get('severity', '未知')}
+- 问题描述: {issue.get('description', '无描述')}
+- 问题位置: {issue.get('location', '未知位置')}
+- 修改建议: {issue.get('suggestion', '无建议')}
+"""
+    else:
+        issues_text = "无问题"
+    
+    # 构建用户修正要求
+    user_requirements = ""
+    if user_prompt.strip():
+        user_requirements = f"""
+## 用户修正要求：
+{user_prompt.strip()}
+
+请特别注意用户的修正要求，在修正过程中优先考虑用户的具体需求。
+"""
+
+    return f"""你是一位专业的修仙小说修正专家，专门负责修正剧情中的逻辑问题。
+
+## 原始详细剧情内容（每段前的 [P编号] 为段落编号，不属于正文）：
+{numbered_content}
+
+## 需要修正的问题：
+{issues_text}
+{user_requirements}
+## 修正要求：
+1. **精准修正**：只修改与上述问题相关的句子，其余内容保持不变
+2. **保持风格**：修改后的内容必须保持原文的写作风格和语调
+3. **逻辑严密**：修改后的内容必须逻辑严密，无任何漏洞
+4. **自然流畅**：修改后的内容要与上下文自然衔接
+5. **角色一致**：角色行为必须与其设定完全匹配
+
+## 输出格式：
+不要输出完整正文，只输出修改操作，严格按照以下JSON格式：
+{{
+    "edits": [
+        {{
+            "type": "replace",
+            "paragraph": 3,
+            "find": "需要修改的原文片段（必须从该段原文中逐字复制，足够长以保证在段内唯一）",
+            "replace": "修改后的片段",
+            "issue": 1
+        }},
+        {{
+            "type": "replace_paragraph",
+            "paragraph": 5,
+            "content": "整段改写后的内容（仅当一段需要大幅修改时使用）",
+            "issue": 2
+        }}
+    ]
+}}
+
+注意：
+1. find 字段必须与原文完全一致（不要包含段落编号），不要改写或省略
+2. 一个问题可以对应多个修改操作，issue 为对应的问题编号
+3. 优先使用 replace 做句子级修改，只有整段都需要改写时才使用 replace_paragraph
+4. 只输出JSON，不要包含任何其他说明文字"""
@@ -10,9 +10,13 @@ def get_detailed_plot_generation_prompt(
     world_view: Dict[str, Any],
     characters: List[Dict[str, Any]],
     events: List[Dict[str, Any]] = None,
-    additional_requirements: Optional[str] = None
+    additional_requirements: Optional[str] = None,
+    locations: Optional[List[Any]] = None,
+    story_so_far: str = "",
+    related_chapters: Optional[List[Dict[str, Any]]] = None
 ) -> str:
-    """获取详细剧情生成提示词 - 简化版（基于事件驱动）"""
+    """获取详细剧情生成提示词 - 简化版（基于事件驱动），提供locations时用相关地点代替截断的地理设定，
+    提供story_so_far时加入前情提要，提供related_chapters时加入与本章相关的较早章节摘要"""
     
     # 格式化角色信息
     characters_info = ""
@@ -94,13 +98,28 @@ def get_detailed_plot_generation_prompt(
         
         characters_info = "\n\n".join(character_details)
     
+    # 格式化地理信息：优先使用按章节相关度选取的地点
+    if locations:
+        location_lines = []
+        for location in locations:
+            if isinstance(location, dict):
+                location_name = location.get('name', '未知地点')
+                location_desc = str(location.get('description', '') or '')
+                location_lines.append(f"{location_name}: {location_desc[:80]}{'...' if len(location_desc) > 80 else ''}"
+                                      if location_desc else location_name)
+            else:
+                location_lines.append(str(location))
+        geography_info = "；".join(location_lines)
+    else:
+        geography_info = f"{str(world_view.get('geography', {}))[:200]}..."
+    
     # 格式化世界观信息
     world_info = f"""
 世界观名称: {world_view.get('name', '未知世界观')}
 世界观描述: {world_view.get('description', '暂无描述')}
 核心概念: {world_view.get('core_concept', '无核心概念')}
 力量体系: {world_view.get('power_system', {}).get('name', '未知力量体系') if isinstance(world_view.get('power_system'), dict) else str(world_view.get('power_system', '未知力量体系'))}
-地理设定: {str(world_view.get('geography', {}))[:200]}...
+地理设定: {geography_info}
 """
     
     # 格式化剧情大纲信息
@@ -161,6 +180,13 @@ def get_detailed_plot_generation_prompt(
    结果: {event_outcome[:150]}{'...' if len(event_outcome) > 150 else ''}
 """
     
+    # 前情提要（分层滚动摘要，篇幅固定）
+    story_info = f"前情提要：\n{story_so_far}\n" if story_so_far else ""
+    if related_chapters:
+        chapter_lines = [f"【第{chapter.get('chapter_number')}章 {chapter.get('title', '')}】{chapter.get('summary', '')}"
+                         for chapter in related_chapters]
+        story_info += "相关前文章节：\n" + "\n".join(chapter_lines) + "\n"
+    
     prompt = f"""你是一个专业的小说创作助手。请基于以下信息生成详细的章节剧情内容：
 
 重要提醒：生成的剧情内容必须达到5000字以上，这是硬性要求！
@@ -169,6 +195,7 @@ def get_detailed_plot_generation_prompt(
 
 {plot_info}
 
+{story_info}
 {chapter_info}
 
 {scenes_info}
@@ -190,7 +217,7 @@ def get_detailed_plot_generation_prompt(
 6. 要遵循写作指导：{getattr(chapter_outline, 'writing_notes', '暂无指导')}
 7. 语言要流畅自然，符合小说写作风格
 8. 要符合世界观设定，保持逻辑一致性
-9. 要推进剧情发展，但需要平缓，不能过快或偏离主线
+9. 要推进剧情发展，但需要平缓，不能过快或偏离主线，并与前情提要中的情节和角色状态保持衔接
 10. **严格按照角色的基本信息、性格特质、当前目标和关系来塑造角色**
 11. **角色的对话和行为必须与其性格特质完全匹配**
 12. **角色的修炼境界和修炼属性要影响其战斗能力和表现**
@@ -31,6 +31,23 @@ def get_event_scoring_prompt(event, characters, world_info, plot_info):
         print(f"处理世界观信息失败: {e}")
         world_text = "世界观信息处理失败"
     
+    # 格式化相关角色信息
+    characters_text = ""
+    try:
+        character_lines = []
+        for char in characters or []:
+            if not isinstance(char, dict):
+                char = getattr(char, '__dict__', {})
+            background = str(char.get('background', '') or '')
+            character_lines.append(
+                f"- {char.get('name', '未知角色')}（{char.get('role_type', '未知类型')}，"
+                f"{char.get('cultivation_level', '未知境界')}）: {background[:80]}{'...' if len(background) > 80 else ''}"
+            )
+        characters_text = "\n".join(character_lines) if character_lines else "暂无角色信息"
+    except Exception as e:
+        print(f"处理角色信息失败: {e}")
+        characters_text = "角色信息处理失败"
+    
     # 格式化剧情大纲信息
     plot_text = ""
     try:
@@ -70,6 +87,9 @@ def get_event_scoring_prompt(event, characters, world_info, plot_info):
 ## 剧情大纲
 {plot_text}
 
+## 相关角色
+{characters_text}
+
 ## 评分要求
 请从以下5个维度对事件进行严格评分（0-10分，10分为满分）：
 
@@ -2,19 +2,43 @@
 逻辑检查Prompt模板
 """
 
-def get_logic_check_prompt(content: str) -> str:
+def get_logic_check_prompt(content: str, context: str = "", chunk_note: str = "", hints: str = "") -> str:
     """
     获取详细剧情逻辑检查prompt
     
     Args:
-        content: 待检查的详细剧情内容
+        content: 待检查的详细剧情内容（每段开头带 [P编号] 段落编号）
+        context: 世界观、角色等设定背景（分块检查时各块共享，放在正文之前）
+        chunk_note: 分块检查时本块的范围说明
+        hints: 本地规则预检发现的疑似问题
     
     Returns:
         格式化的prompt字符串
     """
+    context_section = ""
+    if context.strip():
+        context_section = f"""
+## 设定背景（检查时以此为准）：
+{context.strip()}
+"""
+    
+    chunk_section = ""
+    if chunk_note.strip():
+        chunk_section = f"""
+## 分块检查说明：
+{chunk_note.strip()}
+"""
+    
+    hints_section = ""
+    if hints.strip():
+        hints_section = f"""
+## 规则预检提示（本地规则自动发现的疑似问题，请逐条核实：属实的按输出格式报告，误报的忽略）：
+{hints.strip()}
+"""
+    
     return f"""你是一位极其苛刻的修仙小说逻辑检查专家，拥有20年的编辑经验，以发现逻辑漏洞和细节错误而闻名。你的座右铭是"逻辑至上，细节决定成败"。请以最严格的标准检查以下详细剧情内容，不放过任何逻辑问题、细节错误或设定矛盾。
-
-## 待检查的详细剧情内容：
+{context_section}{chunk_section}{hints_section}
+## 待检查的详细剧情内容（每段开头的 [P编号] 是全文段落编号，不属于正文）：
 {content}
 
 ## 检查原则
@@ -165,7 +189,7 @@ def get_logic_check_prompt(content: str) -> str:
       "category": "问题分类",
       "severity": "严重程度",
       "description": "问题描述",
-      "location": "问题位置",
+      "location": "问题位置（必须以段落编号开头，如 \"P12：主角突破处\"，跨段写作 \"P12-P13：……\"）",
       "suggestion": "修改建议"
     }}
   ],
@@ -0,0 +1,46 @@
+"""
+故事摘要Prompt模板
+用于分层滚动摘要：章节摘要、幕次摘要（逐章滚动）和全书摘要（逐幕滚动）
+"""
+
+LEVEL_DESCRIPTIONS = {
+    "chapter": ("章节正文", "本章摘要"),
+    "act": ("本幕新增章节的摘要", "本幕截至目前的摘要"),
+    "book": ("新完成一幕的摘要", "全书截至目前的摘要")
+}
+
+
+def get_story_summary_prompt(level: str, material: str, previous_summary: str = "", max_chars: int = 300) -> str:
+    """
+    获取故事摘要prompt
+    
+    Args:
+        level: 摘要层级（chapter/act/book）
+        material: 待摘要的新内容（章节正文、章节摘要或幕次摘要）
+        previous_summary: 同层级已有的滚动摘要，为空时只摘要新内容
+        max_chars: 摘要字数上限
+    
+    Returns:
+        格式化的prompt字符串
+    """
+    material_name, summary_name = LEVEL_DESCRIPTIONS.get(level, LEVEL_DESCRIPTIONS["chapter"])
+    
+    previous_section = ""
+    if previous_summary:
+        previous_section = f"""
+## 已有摘要
+{previous_summary}
+
+请把新内容合并进已有摘要，较早的情节可以进一步压缩，保留对后续剧情仍有影响的信息。
+"""
+
+    return f"""你是一位小说编辑，请为长篇小说的连续创作撰写"{summary_name}"，供后续章节保持剧情连贯。
+{previous_section}
+## {material_name}
+{material}
+
+## 要求
+1. 不超过{max_chars}字，使用简洁的陈述句
+2. 保留关键事件及其结果、主要角色的状态变化（境界、伤势、位置、关系、目标）、未解决的冲突和伏笔
+3. 省略环境描写、对话细节和修辞
+4. 只输出摘要正文，不要添加标题、解释或格式标记"""
@@ -16,22 +16,16 @@ from app.core.automation.progress_manager import ProgressManager, GenerationStag
 
 async def list_available_sessions():
     """列出可用的会话"""
-    from app.core.config import settings
-    import glob
+    session_ids = ProgressManager.list_sessions()
     
-    progress_dir = Path(settings.NOVEL_OUTPUT_DIR)
-    progress_files = glob.glob(str(progress_dir / "progress_*.json"))
-    
-    if not progress_files:
+    if not session_ids:
         print("❌ 没有找到可恢复的会话")
         return []
     
     sessions = []
-    for file_path in progress_files:
+    for session_id in session_ids:
         try:
-            manager = ProgressManager()
-            manager.progress_file = Path(file_path)
-            manager.progress_data = manager._load_progress()
+            manager = ProgressManager(session_id)
             
             if manager.can_resume():
                 sessions.append({
@@ -39,10 +33,10 @@ async def list_available_sessions():
                     'progress': manager.get_progress_percentage(),
                     'current_stage': manager.get_current_stage(),
                     'core_concept': manager.progress_data.get('core_concept', '未知'),
-                    'file_path': file_path
+                    'file_path': str(manager.journal_file)
                 })
         except Exception as e:
-            print(f"⚠️ 无法读取会话文件 {file_path}: {e}")
+            print(f"⚠️ 无法读取会话 {session_id}: {e}")
     
     return sessions
 